@@ -0,0 +1,26 @@
+"""
+WSGI entry point for the retrieval server, e.g.
+
+    flask --app app run --with-threads
+"""
+from Reasona.config.config_manager import ConfigurationManager
+from Reasona.inference.local_server import create_app, load_retriever
+from Reasona.utils.logger import configure_logging, install_signal_handlers
+from Reasona.utils.metrics import start_reporter
+
+_cfg = ConfigurationManager()
+_retrieval_cfg = _cfg.get_retrieval_config()
+
+_logging_cfg = _cfg.get_logging_config()
+configure_logging(_logging_cfg.rate_per_s, _logging_cfg.burst)
+install_signal_handlers()
+
+_metrics_cfg = _cfg.get_metrics_config()
+if _metrics_cfg.enabled:
+    start_reporter(_metrics_cfg.interval_s)
+
+app = create_app(
+    load_retriever(_retrieval_cfg),
+    _cfg.get_server_config(),
+    default_k=_retrieval_cfg.top_k,
+)
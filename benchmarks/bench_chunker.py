@@ -0,0 +1,60 @@
+"""
+Microbenchmark: word-join chunking vs offset-based chunking on long documents.
+
+    PYTHONPATH=src python benchmarks/bench_chunker.py --docs 20 --words 20000
+    PYTHONPATH=src python benchmarks/bench_chunker.py --tokenizer sentence-transformers/all-MiniLM-L6-v2
+"""
+import argparse
+import json
+import random
+import time
+
+from Reasona.data.chunker import TextChunker
+
+
+def make_docs(n_docs: int, n_words: int, seed: int):
+    rng = random.Random(seed)
+    vocab = ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(2, 10))) for _ in range(5000)]
+    return [" ".join(rng.choices(vocab, k=n_words)) for _ in range(n_docs)]
+
+
+def bench(chunker: TextChunker, docs, repeats: int):
+    best = float("inf")
+    n_chunks = 0
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        out = chunker.chunk_many(docs)
+        best = min(best, time.perf_counter() - t0)
+        n_chunks = sum(len(c) for c in out)
+    return {"mode": chunker.mode, "seconds": round(best, 4), "chunks": n_chunks}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--words", type=int, default=20000)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--overlaps", type=int, nargs="+", default=[32, 128, 200])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tokenizer", default=None, help="also time chunk_mode=tokens")
+    args = parser.parse_args()
+
+    docs = make_docs(args.docs, args.words, args.seed)
+
+    for overlap in args.overlaps:
+        modes = ["words", "offsets"] + (["tokens"] if args.tokenizer else [])
+        for mode in modes:
+            chunker = TextChunker(
+                chunk_size=args.chunk_size,
+                chunk_overlap=overlap,
+                mode=mode,
+                tokenizer_name=args.tokenizer,
+            )
+            row = bench(chunker, docs, args.repeats)
+            row["overlap"] = overlap
+            print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
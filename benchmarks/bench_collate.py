@@ -0,0 +1,123 @@
+"""
+Padding ratio and training throughput: random vs length-bucketed vs packed batches.
+
+    PYTHONPATH=src python benchmarks/bench_collate.py --examples 5000
+    PYTHONPATH=src python benchmarks/bench_collate.py --model sshleifer/tiny-gpt2 --steps 30
+
+Example lengths follow SYNTH's long-tailed reasoning traces (exponential
+around --mean-tokens). Without --model only the collation side is
+measured; with one, each strategy also runs --steps forward/backward
+passes of that (small, CPU-sized) model and reports real tokens/sec.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from Reasona.training.collate import (
+    BatchStats,
+    LengthBucketSampler,
+    PackedCollator,
+    PaddedCollator,
+    pack_examples,
+)
+
+
+def make_examples(n: int, mean_tokens: int, max_tokens: int, vocab: int, seed: int):
+    rng = np.random.default_rng(seed)
+    lengths = np.clip(rng.exponential(mean_tokens, n).astype(int) + 16, 16, max_tokens)
+    return [
+        {
+            "input_ids": rng.integers(3, vocab, length),
+            "prompt_length": int(rng.integers(4, 16)),
+        }
+        for length in lengths
+    ]
+
+
+def batches(strategy: str, examples, batch_size: int, seq_length: int, stats: BatchStats):
+    lengths = [len(e["input_ids"]) for e in examples]
+    if strategy == "packed":
+        rows = pack_examples(lengths, seq_length)
+        collator = PackedCollator(0, seq_length, stats=stats)
+        for start in range(0, len(rows), batch_size):
+            yield collator([[examples[i] for i in row] for row in rows[start:start + batch_size]])
+        return
+
+    collator = PaddedCollator(0, stats=stats)
+    if strategy == "bucketed":
+        order = LengthBucketSampler(lengths, batch_size)
+    else:
+        perm = np.random.default_rng(0).permutation(len(examples))
+        order = (perm[i:i + batch_size].tolist() for i in range(0, len(perm), batch_size))
+    for indices in order:
+        yield collator([examples[i] for i in indices])
+
+
+def train_steps(model, optimizer, batch_iter, steps: int, device):
+    from Reasona.training.train_lora import to_model_inputs
+
+    tokens, t0 = 0, time.perf_counter()
+    for step, batch in enumerate(batch_iter):
+        if step >= steps:
+            break
+        loss = model(**to_model_inputs(batch, model, device)).loss
+        loss.backward()
+        optimizer.step()
+        optimizer.zero_grad(set_to_none=True)
+        tokens += int(batch["attention_mask"].sum())
+    return tokens / (time.perf_counter() - t0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--examples", type=int, default=5000)
+    parser.add_argument("--mean-tokens", type=int, default=300)
+    parser.add_argument("--seq-length", type=int, default=1024)
+    parser.add_argument("--batch-size", type=int, default=2)
+    parser.add_argument("--model", default=None, help="small causal LM for real tokens/sec")
+    parser.add_argument("--steps", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vocab = 1000
+    model = optimizer = device = None
+    if args.model:
+        import torch
+        from transformers import AutoModelForCausalLM
+
+        device = "cpu"
+        model = AutoModelForCausalLM.from_pretrained(args.model)
+        model.train()
+        optimizer = torch.optim.AdamW(model.parameters(), lr=1e-5)
+        vocab = model.config.vocab_size
+        args.seq_length = min(args.seq_length, getattr(model.config, "n_positions", None)
+                              or model.config.max_position_embeddings)
+
+    examples = make_examples(args.examples, args.mean_tokens, args.seq_length, vocab, args.seed)
+
+    for strategy in ("random", "bucketed", "packed"):
+        stats = BatchStats()
+        t0 = time.perf_counter()
+        for _ in batches(strategy, examples, args.batch_size, args.seq_length, stats):
+            pass
+        row = {
+            "strategy": strategy,
+            "collate_seconds": round(time.perf_counter() - t0, 3),
+            **stats.report(),
+        }
+        if model is not None:
+            row["train_tokens_per_sec"] = round(
+                train_steps(
+                    model, optimizer,
+                    batches(strategy, examples, args.batch_size, args.seq_length, BatchStats()),
+                    args.steps, device,
+                ),
+                1,
+            )
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
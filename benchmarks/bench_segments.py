@@ -0,0 +1,144 @@
+"""
+Peak RSS and query latency: one in-memory FaissStore vs a SegmentedStore.
+
+    PYTHONPATH=src python benchmarks/bench_segments.py --vectors 500000 --budget-mb 64
+
+Both stores index the same synthetic stream (vectors, metadata and BM25
+text generated batch by batch, nothing retained by the driver), each in
+its own process so ru_maxrss is per build. Reports build time, peak RSS
+(total, and heap-only sampled per batch), query latency
+and whether the top-k IDs of both stores are identical.
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+WORDS = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu".split()
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1 << 20) if sys.platform == "darwin" else rss / 1024
+
+
+def anon_rss_mb() -> float:
+    """
+    Current anonymous (heap) RSS; file pages of mapped segments are
+    excluded since the kernel can drop them at will. Linux only.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def stream(n: int, dim: int, batch: int, seed: int):
+    for lo in range(0, n, batch):
+        rng = np.random.default_rng(seed + lo)
+        size = min(batch, n - lo)
+        texts = [" ".join(rng.choice(WORDS, rng.integers(20, 80))) for _ in range(size)]
+        metadata = [
+            {"text": t, "lang": "en" if (lo + i) % 3 else "de", "source": "synthetic"}
+            for i, t in enumerate(texts)
+        ]
+        yield rng.random((size, dim), dtype=np.float32), metadata, texts
+
+
+def build(args) -> None:
+    from Reasona.vectorstore.faiss_store import FaissStore
+    from Reasona.vectorstore.segmented_store import SegmentedStore
+
+    fields = dict(filter_fields=("lang", "source"), keyword_index=True)
+    if args.mode == "segmented":
+        store = SegmentedStore(
+            args.dim,
+            work_dir=Path(args.work_dir),
+            memory_budget_mb=args.budget_mb,
+            **fields,
+        )
+    else:
+        store = FaissStore(args.dim, **fields)
+
+    t0 = time.perf_counter()
+    peak_anon = 0.0
+    for vectors, metadata, texts in stream(args.vectors, args.dim, args.batch, args.seed):
+        store.add(vectors, metadata, texts)
+        peak_anon = max(peak_anon, anon_rss_mb())
+    if args.mode == "segmented":
+        store.flush()
+        store.close()
+    build_s = time.perf_counter() - t0
+    build_rss = peak_rss_mb()
+
+    queries = np.random.default_rng(args.seed - 1).random((32, args.dim), dtype=np.float32)
+    t0 = time.perf_counter()
+    _, ids = store.search(queries, 10)
+    dense_ms = (time.perf_counter() - t0) * 1000.0 / len(queries)
+    t0 = time.perf_counter()
+    _, keyword_ids = store.search_keywords(["alpha beta", "kappa mu", "zeta"], 10)
+    sparse_ms = (time.perf_counter() - t0) * 1000.0 / 3
+
+    print(json.dumps({
+        "mode": args.mode,
+        "vectors": len(store),
+        "segments": len(store.segments) if args.mode == "segmented" else 1,
+        "build_seconds": round(build_s, 2),
+        "build_peak_rss_mb": round(build_rss, 1),
+        "build_peak_anon_mb": round(peak_anon, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "dense_ms_per_query": round(dense_ms, 3),
+        "sparse_ms_per_query": round(sparse_ms, 3),
+        "ids": ids.tolist(),
+        "keyword_ids": keyword_ids.tolist(),
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--batch", type=int, default=2048)
+    parser.add_argument("--budget-mb", type=float, default=64)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mode", choices=("monolithic", "segmented"), default=None)
+    parser.add_argument("--work-dir", default=None)
+    args = parser.parse_args()
+
+    if args.mode:
+        build(args)
+        return
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("monolithic", "segmented"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--work-dir", tmp,
+                 "--vectors", str(args.vectors), "--dim", str(args.dim),
+                 "--batch", str(args.batch), "--budget-mb", str(args.budget_mb),
+                 "--seed", str(args.seed)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            rows.append(json.loads(out.strip().splitlines()[-1]))
+
+    identical = (
+        rows[0]["ids"] == rows[1]["ids"] and rows[0]["keyword_ids"] == rows[1]["keyword_ids"]
+    )
+    for row in rows:
+        row.pop("ids"), row.pop("keyword_ids")
+        print(json.dumps(row))
+    print(json.dumps({"identical_results": identical}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+"""
+Offline stage-level throughput benchmarks on synthetic SYNTH-shaped data.
+
+    PYTHONPATH=src:benchmarks python benchmarks/run.py --samples 2000 --output bench.json
+    PYTHONPATH=src:benchmarks python benchmarks/run.py --baseline bench.json
+
+Each stage is timed in isolation (on the previous stage's materialised
+output) and once end to end as a streaming pass. Per stage: items/sec,
+per-call latency percentiles, the peak RSS sampled while the stage ran
+and its growth over the RSS the stage started at.
+With --baseline the run is compared against a stored result and the
+exit code is 1 if any metric regressed beyond --tolerance.
+"""
+import argparse
+import json
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from Reasona.data.chunker import CHUNK_MODES, TextChunker
+from Reasona.data.formatter import DataFormatter
+from Reasona.data.local_loader import LocalShardedDatasetProcessor
+from Reasona.vectorstore.faiss_store import FaissStore
+from Reasona.vectorstore.retriever import Retriever
+
+from synthetic import StubEmbedder, make_samples, write_shards
+
+# metric -> True if higher is better
+COMPARED_METRICS = {
+    "items_per_sec": True,
+    "latency_ms_p50": False,
+    "latency_ms_p99": False,
+    "peak_rss_mb": False,
+}
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return rss / (1 << 20) if sys.platform == "darwin" else rss / 1024
+
+
+def current_rss_mb() -> float:
+    """
+    Resident set size right now (Linux); elsewhere the process peak so far.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except OSError:
+        return peak_rss_mb()
+    return pages * resource.getpagesize() / (1 << 20)
+
+
+class RssSampler:
+    """
+    Polls the current RSS on a background thread and keeps the maximum.
+    """
+
+    def __init__(self, interval_s: float = 0.01):
+        self.interval_s = interval_s
+        self.start_mb = self.peak_mb = current_rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="rss-sampler", daemon=True)
+        self._thread.start()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+
+class StageTimer:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: List[float] = []
+        self.items = 0
+        self._elapsed = 0.0
+        self._rss = RssSampler()
+
+    def call(self, fn: Callable, *args, items: int = 1, **kwargs):
+        t0 = time.perf_counter()
+        result = fn(*args, **kwargs)
+        dt = time.perf_counter() - t0
+        self.latencies.append(dt)
+        self._elapsed += dt
+        self.items += items
+        return result
+
+    def report(self) -> Dict[str, Any]:
+        self._rss.stop()
+        lat = np.asarray(self.latencies) * 1000.0
+        p50, p95, p99 = np.percentile(lat, [50, 95, 99]) if lat.size else (0.0, 0.0, 0.0)
+        return {
+            "items": self.items,
+            "calls": len(self.latencies),
+            "seconds": round(self._elapsed, 4),
+            "items_per_sec": round(self.items / self._elapsed, 2) if self._elapsed else 0.0,
+            "latency_ms_p50": round(float(p50), 3),
+            "latency_ms_p95": round(float(p95), 3),
+            "latency_ms_p99": round(float(p99), 3),
+            "peak_rss_mb": round(self._rss.peak_mb, 1),
+            "rss_growth_mb": round(self._rss.peak_mb - self._rss.start_mb, 1),
+        }
+
+
+def build_embedder(args):
+    if args.model:
+        from Reasona.data.embedder import Embedder
+
+        return Embedder(model_name=args.model)
+    return StubEmbedder(dim=args.dim, cost_us_per_text=args.stub_cost_us)
+
+
+def _batches(items: List[Any], size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# ----------------------------------------------------------------------
+# Suite
+# ----------------------------------------------------------------------
+def run_suite(args) -> Dict[str, Any]:
+    stages: Dict[str, Dict[str, Any]] = {}
+    samples = make_samples(args.samples, seed=args.seed, reasoning_words=args.reasoning_words)
+    embedder = build_embedder(args)
+    formatter = DataFormatter(args.schema)
+    chunker = TextChunker(
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        mode=args.chunk_mode,
+        tokenizer_name=args.model,
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_shards(samples, tmp / "data", num_shards=args.shards)
+        loader = LocalShardedDatasetProcessor(
+            tmp / "data",
+            columns=["synth_id"] + formatter.input_columns,
+            batch_size=args.batch_size,
+        )
+
+        # ---- load ----
+        timer = StageTimer("load")
+        raw_batches = []
+        stream = loader.stream_sample_batches("train")
+        while True:
+            batch = timer.call(next, stream, None, items=0)
+            if batch is None:
+                timer.latencies.pop()
+                break
+            timer.items += batch.num_rows
+            raw_batches.append(batch)
+        stages["load"] = timer.report()
+
+        # ---- format ----
+        timer = StageTimer("format")
+        formatted = [
+            timer.call(formatter.format_batch, b, items=b.num_rows) for b in raw_batches
+        ]
+        stages["format"] = timer.report()
+
+        # ---- chunk ----
+        timer = StageTimer("chunk")
+        chunks: List[Dict] = []
+        for batch in formatted:
+            per_sample = timer.call(
+                chunker.chunk_many, batch["text"], batch["metadata"], items=len(batch["text"])
+            )
+            for sample_chunks in per_sample:
+                chunks.extend(sample_chunks)
+        stages["chunk"] = timer.report()
+        stages["chunk"]["chunks"] = len(chunks)
+
+        # ---- embed ----
+        timer = StageTimer("embed")
+        texts = [c["text"] for c in chunks]
+        vectors = [
+            timer.call(
+                embedder.embed, t, batch_size=args.embed_batch_size,
+                show_progress_bar=False, items=len(t),
+            )
+            for t in _batches(texts, args.embed_batch_size)
+        ]
+        stages["embed"] = timer.report()
+
+        # ---- store add / save / load ----
+        dim = vectors[0].shape[1]
+        metas = [c["metadata"] for c in chunks]
+        store = FaissStore(
+            dim, index_type=args.index_type, nlist=args.nlist,
+            filter_fields=("lang",), keyword_index=True,
+        )
+        timer = StageTimer("store_add")
+        for vecs, meta, text in zip(
+            vectors, _batches(metas, args.embed_batch_size), _batches(texts, args.embed_batch_size)
+        ):
+            timer.call(store.add, vecs, meta, text, items=len(meta))
+        timer.call(store.train, items=0)
+        stages["store_add"] = timer.report()
+
+        timer = StageTimer("store_save")
+        (tmp / "store").mkdir()
+        timer.call(store.save, tmp / "store", items=len(store))
+        stages["store_save"] = timer.report()
+
+        timer = StageTimer("store_load")
+        loaded = FaissStore(dim=1)
+        timer.call(loaded.load, tmp / "store", items=len(store))
+        stages["store_load"] = timer.report()
+
+        # ---- retrieve ----
+        rng = np.random.default_rng(args.seed)
+        queries = [samples[i]["query"] for i in rng.integers(0, len(samples), args.queries)]
+        retriever = Retriever(loaded, embedder, nprobe=args.nprobe, query_cache_size=0)
+        timer = StageTimer("retrieve")
+        for query in queries:
+            timer.call(retriever.retrieve, query, k=args.k)
+        stages["retrieve"] = timer.report()
+
+        for mode in ("sparse", "hybrid"):
+            retriever = Retriever(loaded, embedder, nprobe=args.nprobe, query_cache_size=0, mode=mode)
+            timer = StageTimer(f"retrieve_{mode}")
+            for query in queries:
+                timer.call(retriever.retrieve, query, k=args.k)
+            stages[f"retrieve_{mode}"] = timer.report()
+
+        # ---- end to end (streaming, like IndexingPipeline serial mode) ----
+        timer = StageTimer("end_to_end")
+
+        def index_stream():
+            e2e = FaissStore(dim, index_type=args.index_type, nlist=args.nlist, filter_fields=("lang",))
+            pending: List[Dict] = []
+            for raw in loader.stream_sample_batches("train"):
+                batch = formatter.format_batch(raw)
+                for sample_chunks in chunker.chunk_many(batch["text"], batch["metadata"]):
+                    pending.extend(sample_chunks)
+                while len(pending) >= args.embed_batch_size:
+                    part, pending = pending[:args.embed_batch_size], pending[args.embed_batch_size:]
+                    e2e.add(embedder.embed([c["text"] for c in part], show_progress_bar=False),
+                            [c["metadata"] for c in part])
+            if pending:
+                e2e.add(embedder.embed([c["text"] for c in pending], show_progress_bar=False),
+                        [c["metadata"] for c in pending])
+            (tmp / "e2e").mkdir()
+            e2e.save(tmp / "e2e")
+
+        timer.call(index_stream, items=len(samples))
+        stages["end_to_end"] = timer.report()
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "embedder": getattr(embedder, "model_name", type(embedder).__name__),
+            "params": {
+                k: v for k, v in vars(args).items()
+                if k not in ("output", "baseline", "tolerance")
+            },
+        },
+        "stages": stages,
+    }
+
+
+# ----------------------------------------------------------------------
+# Compare
+# ----------------------------------------------------------------------
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict]:
+    """
+    Relative change of every compared metric; entries worse than
+    `tolerance` are marked as regressions.
+    """
+    rows = []
+    for stage, metrics in current["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if base is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = base.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            rows.append(
+                {
+                    "stage": stage,
+                    "metric": metric,
+                    "baseline": old,
+                    "current": new,
+                    "change": round(change, 4),
+                    "regression": worse > tolerance,
+                }
+            )
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--reasoning-words", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=256, help="rows per record batch")
+    parser.add_argument("--schema", type=Path, default=Path("dataset_schema.yaml"))
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--chunk-overlap", type=int, default=32)
+    parser.add_argument("--chunk-mode", default="words", choices=CHUNK_MODES)
+    parser.add_argument("--model", default=None, help="real embedding model (default: stub)")
+    parser.add_argument("--dim", type=int, default=384, help="stub embedding dim")
+    parser.add_argument("--stub-cost-us", type=float, default=0.0, help="simulated encode cost per text")
+    parser.add_argument("--embed-batch-size", type=int, default=256)
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--nlist", type=int, default=256)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    parser.add_argument("--baseline", type=Path, help="stored results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    results = run_suite(args)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            rows = compare(results, json.load(f), args.tolerance)
+        results["comparison"] = {"baseline": str(args.baseline), "tolerance": args.tolerance, "rows": rows}
+
+    text = json.dumps(results, indent=2, default=str)
+    if args.output:
+        args.output.write_text(text)
+    print(text)
+
+    regressions = [r for r in results.get("comparison", {}).get("rows", []) if r["regression"]]
+    for r in regressions:
+        print(
+            f"REGRESSION {r['stage']}.{r['metric']}: {r['baseline']} -> {r['current']} "
+            f"({r['change']:+.1%})",
+            file=sys.stderr,
+        )
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
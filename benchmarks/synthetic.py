@@ -0,0 +1,99 @@
+"""
+Offline inputs for the benchmarks: SYNTH-shaped samples and a stub embedder.
+"""
+import hashlib
+import random
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+LANGS = ["en", "fr", "de", "es", "it"]
+EXERCISES = ["memorization", "math", "rag", "editing", "creative"]
+
+
+def _vocab(rng: random.Random, size: int = 8000) -> List[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choices(letters, k=rng.randint(2, 11))) for _ in range(size)]
+
+
+def make_samples(n: int, seed: int = 0, reasoning_words: int = 400) -> List[Dict[str, Any]]:
+    """
+    Rows with the PleIAs/SYNTH columns read by the formatter. Lengths vary
+    around `reasoning_words` so chunk counts differ per sample.
+    """
+    rng = random.Random(seed)
+    vocab = _vocab(rng)
+
+    def words(k: int) -> str:
+        return " ".join(rng.choices(vocab, k=max(1, k)))
+
+    samples = []
+    for i in range(n):
+        n_reason = int(rng.expovariate(1.0 / reasoning_words)) + 20
+        samples.append(
+            {
+                "synth_id": f"synth_{seed}_{i}",
+                "language": rng.choice(LANGS),
+                "exercise": rng.choice(EXERCISES),
+                "model": "stub",
+                "query": words(rng.randint(8, 40)),
+                "synthetic_reasoning": words(n_reason),
+                "synthetic_answer": words(rng.randint(20, 150)),
+                "words": n_reason,
+            }
+        )
+    return samples
+
+
+def write_shards(samples: List[Dict[str, Any]], directory: Path, num_shards: int = 4) -> List[Path]:
+    """
+    Split samples across `<directory>/train/part-*.parquet` for the local loader.
+    """
+    split_dir = Path(directory) / "train"
+    split_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    per_shard = (len(samples) + num_shards - 1) // num_shards
+    for shard in range(num_shards):
+        rows = samples[shard * per_shard:(shard + 1) * per_shard]
+        if not rows:
+            break
+        path = split_dir / f"part-{shard:05d}.parquet"
+        pq.write_table(pa.Table.from_pylist(rows), path)
+        paths.append(path)
+    return paths
+
+
+class StubEmbedder:
+    """
+    Drop-in for Embedder without a model: deterministic unit vectors
+    derived from a hash of each text, plus an optional per-text cost to
+    mimic encoder time.
+    """
+
+    def __init__(self, dim: int = 384, cost_us_per_text: float = 0.0):
+        self.dim = dim
+        self.model_name = f"stub-{dim}"
+        self.cost_us_per_text = cost_us_per_text
+
+    def embed(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None,
+        show_progress_bar: bool = False,
+    ) -> np.ndarray:
+        out = np.empty((len(texts), self.dim), dtype="float32")
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+            out[i] = np.random.default_rng(seed).standard_normal(self.dim)
+        out /= np.linalg.norm(out, axis=1, keepdims=True)
+
+        if self.cost_us_per_text:
+            # busy-wait: encoders hold the CPU, sleeping would not
+            deadline = time.perf_counter() + self.cost_us_per_text * len(texts) / 1e6
+            while time.perf_counter() < deadline:
+                pass
+        return out
@@ -0,0 +1,150 @@
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+
+def cmd_ann_report(args) -> None:
+    from Reasona.vectorstore.ann_report import recall_latency_report
+    from Reasona.vectorstore.segmented_store import SegmentedStore, load_store
+
+    rng = np.random.default_rng(args.seed)
+
+    if args.store:
+        from Reasona.vectorstore.snapshots import SnapshotManager
+
+        store = load_store(SnapshotManager(Path(args.store)).resolve(), mmap=True)
+        if store.index_type != "flat":
+            raise SystemExit("ann-report needs a flat store to recover exact vectors")
+        indexes = (
+            [s.store.index for s in store.segments]
+            if isinstance(store, SegmentedStore)
+            else [store.index]
+        )
+        vectors = np.concatenate([index.reconstruct_n(0, index.ntotal) for index in indexes])
+    else:
+        vectors = rng.standard_normal((args.synthetic, args.dim)).astype("float32")
+
+    # queries are perturbed corpus vectors, like paraphrased questions
+    picks = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    queries = vectors[picks] + 0.05 * rng.standard_normal(vectors[picks].shape).astype("float32")
+
+    rows = recall_latency_report(vectors, queries, k=args.k)
+
+    for row in rows:
+        print(json.dumps(row))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+def cmd_snapshots(args) -> None:
+    from Reasona.config.config_manager import ConfigurationManager
+    from Reasona.vectorstore.snapshots import SnapshotManager
+
+    if args.store:
+        root = Path(args.store)
+    else:
+        root = ConfigurationManager().get_indexing_config().vector_store_dir
+    manager = SnapshotManager(root)
+
+    if args.rollback is not None:
+        manager.rollback(args.rollback)
+    if args.gc is not None:
+        print(json.dumps({"deleted": manager.gc(keep=args.gc)}))
+
+    current = manager.current()
+    for version in manager.versions():
+        manifest = manager.manifest(version)
+        row = {
+            "version": version,
+            "current": version == current,
+            "created_at": manifest["created_at"],
+            "embedding_model": manifest["embedding_model"],
+            "dim": manifest["dim"],
+            "count": manifest["count"],
+            "index_type": manifest["index_type"],
+        }
+        if args.verify:
+            try:
+                manager.verify(version, checksums=True)
+                row["verified"] = True
+            except ValueError as exc:
+                row["verified"] = str(exc)
+        print(json.dumps(row))
+
+
+def cmd_serve(args) -> None:
+    from dataclasses import replace
+
+    from Reasona.config.config_manager import ConfigurationManager
+    from Reasona.inference.local_server import serve
+
+    cfg = ConfigurationManager()
+    retrieval_cfg = cfg.get_retrieval_config()
+    server_cfg = cfg.get_server_config()
+
+    overrides = {
+        name: getattr(args, name)
+        for name in ("host", "port", "max_batch_size", "max_wait_ms")
+        if getattr(args, name) is not None
+    }
+    server_cfg = replace(server_cfg, **overrides)
+    if args.store:
+        retrieval_cfg = replace(retrieval_cfg, vector_store_dir=Path(args.store))
+
+    from Reasona.utils.logger import configure_logging, install_signal_handlers
+
+    logging_cfg = cfg.get_logging_config()
+    configure_logging(logging_cfg.rate_per_s, logging_cfg.burst)
+    install_signal_handlers()
+
+    metrics_cfg = cfg.get_metrics_config()
+    if metrics_cfg.enabled:
+        from Reasona.utils.metrics import start_reporter
+
+        start_reporter(metrics_cfg.interval_s)
+
+    serve(retrieval_cfg, server_cfg)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="reasona", description="Reasona utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ann = sub.add_parser("ann-report", help="Recall@k vs latency of ANN index types")
+    ann.add_argument("--store", help="Saved flat FaissStore directory to sample vectors from")
+    ann.add_argument("--synthetic", type=int, default=100_000, help="Random vectors if no --store")
+    ann.add_argument("--dim", type=int, default=384)
+    ann.add_argument("--queries", type=int, default=200)
+    ann.add_argument("--k", type=int, default=10)
+    ann.add_argument("--seed", type=int, default=0)
+    ann.add_argument("--output", help="Write the report as JSON")
+    ann.set_defaults(func=cmd_ann_report)
+
+    snap = sub.add_parser("snapshots", help="List, verify, roll back or GC store snapshots")
+    snap.add_argument("--store", help="Snapshot root (default: indexing.vector_store_dir)")
+    snap.add_argument("--verify", action="store_true", help="Check every file's sha256")
+    snap.add_argument("--rollback", type=int, metavar="VERSION", help="Point CURRENT at VERSION")
+    snap.add_argument("--gc", type=int, metavar="KEEP", help="Delete all but the newest KEEP")
+    snap.set_defaults(func=cmd_snapshots)
+
+    srv = sub.add_parser("serve", help="HTTP retrieval server with request micro-batching")
+    srv.add_argument("--store", help="Override retrieval.vector_store_dir")
+    srv.add_argument("--host")
+    srv.add_argument("--port", type=int)
+    srv.add_argument("--max-batch-size", type=int)
+    srv.add_argument("--max-wait-ms", type=float)
+    srv.set_defaults(func=cmd_serve)
+
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
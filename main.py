@@ -1,24 +1,57 @@
+import argparse
+from dataclasses import replace
+
 from Reasona.config.config_manager import ConfigurationManager
 from Reasona.pipeline.indexing_pipeline import IndexingPipeline
-from Reasona.utils.logger import setup_logger
+from Reasona.utils.logger import configure_logging, install_signal_handlers, setup_logger
+from Reasona.utils.metrics import start_reporter
 
 logger = setup_logger("main_pipeline", "logs/pipeline/main_pipeline.log")
 
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the Reasona indexing pipeline")
+    parser.add_argument(
+        "--num-workers",
+        type=int,
+        default=None,
+        help="Override indexing.num_workers (>1 builds shards in parallel)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue from the last indexing checkpoint instead of starting over",
+    )
+    return parser.parse_args()
+
+
 def main():
+    args = parse_args()
     logger.info("===== PIPELINE STARTED =====")
 
     try:
         cfg = ConfigurationManager()
 
+        logging_cfg = cfg.get_logging_config()
+        configure_logging(logging_cfg.rate_per_s, logging_cfg.burst)
+        install_signal_handlers()
+
+        metrics_cfg = cfg.get_metrics_config()
+        if metrics_cfg.enabled:
+            start_reporter(metrics_cfg.interval_s)
+
         preprocess_cfg = cfg.get_preprocess_config()
         indexing_cfg = cfg.get_indexing_config()
 
+        if args.num_workers is not None:
+            indexing_cfg = replace(indexing_cfg, num_workers=args.num_workers)
+
         indexing_pipeline = IndexingPipeline(
             preprocess_cfg=preprocess_cfg,
             indexing_cfg=indexing_cfg,
         )
 
-        indexing_pipeline.run()
+        indexing_pipeline.run(resume=args.resume)
 
         logger.info("===== PIPELINE COMPLETED SUCCESSFULLY =====")
 
@@ -3,8 +3,13 @@ from Reasona.utils.helpers import read_yaml
 from Reasona.entities.config_entity import (
     PreprocessConfig,
     TrainingConfig,
+    LoraTrainingConfig,
     IndexingConfig,
+    RetrievalConfig,
     InferenceConfig,
+    ServerConfig,
+    MetricsConfig,
+    LoggingConfig,
 )
 from Reasona.config.validators import require
 
@@ -33,6 +38,16 @@ class ConfigurationManager:
             revision=cfg.get("revision", "main"),
             max_samples=cfg.get("max_samples"),
             batch_size=cfg.get("batch_size", 500),
+            source=cfg.get("source", "hub"),
+            local_dir=Path(cfg["local_dir"]) if cfg.get("local_dir") else None,
+            num_readers=int(cfg.get("num_readers", 4)),
+            read_batch_size=int(cfg.get("read_batch_size", 1024)),
+            schema_path=Path(cfg.get("schema_path", "dataset_schema.yaml")),
+            dedup=bool(cfg.get("dedup", False)),
+            dedup_threshold=float(cfg.get("dedup_threshold", 0.85)),
+            dedup_num_perm=int(cfg.get("dedup_num_perm", 128)),
+            dedup_shingle_size=int(cfg.get("dedup_shingle_size", 5)),
+            dedup_max_entries=int(cfg.get("dedup_max_entries", 1_000_000)),
         )
 
     # ---------- TRAINING ----------
@@ -41,10 +56,36 @@ class ConfigurationManager:
         if not cfg:
             raise ValueError("Missing 'training' section in config.yaml")
 
+        # configs written before the rename still use transformed_data_path
+        if cfg.get("dataset_path") is None and cfg.get("transformed_data_path"):
+            cfg = {**cfg, "dataset_path": cfg["transformed_data_path"]}
+
         return TrainingConfig(
             dataset_path=Path(require(cfg, "dataset_path", "training")),
             output_dir=Path(require(cfg, "output_dir", "training")),
             base_model=require(cfg, "base_model", "training"),
+            token_cache_dir=Path(cfg.get("token_cache_dir", "artifacts/training/token_cache")),
+            max_seq_length=int(cfg.get("max_seq_length", 2048)),
+            tokenize_batch_size=int(cfg.get("tokenize_batch_size", 1000)),
+            shard_tokens=int(cfg.get("shard_tokens", 50_000_000)),
+        )
+
+    # ---------- LORA (params.yaml) ----------
+    def get_lora_config(self) -> LoraTrainingConfig:
+        cfg = self.params.get("lora") or {}
+        target_modules = cfg.get("target_modules")
+
+        return LoraTrainingConfig(
+            r=int(cfg.get("r", 16)),
+            alpha=int(cfg.get("alpha", 32)),
+            dropout=float(cfg.get("dropout", 0.05)),
+            batch_size=int(cfg.get("batch_size", 2)),
+            epochs=int(cfg.get("epochs", 3)),
+            learning_rate=float(cfg.get("learning_rate", 2e-4)),
+            target_modules=tuple(target_modules) if target_modules else None,
+            packing=bool(cfg.get("packing", False)),
+            bucket_multiplier=int(cfg.get("bucket_multiplier", 50)),
+            log_every=int(cfg.get("log_every", 10)),
         )
 
     # ---------- INDEXING ----------
@@ -59,6 +100,110 @@ class ConfigurationManager:
             embedding_model=cfg.get("embedding_model", "all-MiniLM-L6-v2"),
             chunk_size=int(cfg.get("chunk_size", 256)),
             chunk_overlap=int(cfg.get("chunk_overlap", 32)),
+            chunk_mode=cfg.get("chunk_mode", "words"),
+            chunk_tokenizer=cfg.get("chunk_tokenizer"),
+            embed_batch_size=int(cfg.get("embed_batch_size", 256)),
+            embed_token_budget=(
+                int(cfg["embed_token_budget"]) if cfg.get("embed_token_budget") else None
+            ),
+            execution_mode=cfg.get("execution_mode", "serial"),
+            queue_size=int(cfg.get("queue_size", 8)),
+            num_chunk_workers=int(cfg.get("num_chunk_workers", 2)),
+            stage_batch_size=int(cfg.get("stage_batch_size", 64)),
+            num_workers=int(cfg.get("num_workers", 1)),
+            shard_by=cfg.get("shard_by", "index"),
+            embedding_cache_dir=(
+                Path(cfg["embedding_cache_dir"]) if cfg.get("embedding_cache_dir") else None
+            ),
+            embedding_cache_max_entries=int(
+                cfg.get("embedding_cache_max_entries", 1_000_000)
+            ),
+            checkpoint_every_samples=(
+                int(cfg["checkpoint_every_samples"])
+                if cfg.get("checkpoint_every_samples")
+                else None
+            ),
+            checkpoint_every_seconds=(
+                float(cfg["checkpoint_every_seconds"])
+                if cfg.get("checkpoint_every_seconds")
+                else None
+            ),
+            index_type=cfg.get("index_type", "flat"),
+            nlist=int(cfg.get("nlist", 1024)),
+            pq_m=int(cfg.get("pq_m", 16)),
+            pq_nbits=int(cfg.get("pq_nbits", 8)),
+            hnsw_m=int(cfg.get("hnsw_m", 32)),
+            hnsw_ef_construction=int(cfg.get("hnsw_ef_construction", 200)),
+            train_size=int(cfg["train_size"]) if cfg.get("train_size") else None,
+            filter_fields=tuple(cfg.get("filter_fields", ("lang", "source"))),
+            keyword_index=bool(cfg.get("keyword_index", True)),
+            keep_snapshots=int(cfg.get("keep_snapshots", 3)),
+            memory_budget_mb=int(cfg["memory_budget_mb"]) if cfg.get("memory_budget_mb") else None,
+            max_segment_mb=int(cfg["max_segment_mb"]) if cfg.get("max_segment_mb") else None,
+            compaction_min_segments=int(cfg.get("compaction_min_segments", 4)),
+        )
+
+    # ---------- RETRIEVAL ----------
+    def get_retrieval_config(self) -> RetrievalConfig:
+        cfg = self.config.get("retrieval")
+        if not cfg:
+            raise ValueError("Missing 'retrieval' section in config.yaml")
+
+        return RetrievalConfig(
+            vector_store_dir=Path(require(cfg, "vector_store_dir", "retrieval")),
+            top_k=int(cfg.get("top_k", 5)),
+            embedding_model=cfg.get("embedding_model", "all-MiniLM-L6-v2"),
+            engine=cfg.get("engine", "vector_search"),
+            nprobe=int(cfg["nprobe"]) if cfg.get("nprobe") else None,
+            ef_search=int(cfg["ef_search"]) if cfg.get("ef_search") else None,
+            query_cache_size=int(cfg.get("query_cache_size", 1024)),
+            mmap_index=bool(cfg.get("mmap_index", False)),
+            mode=cfg.get("mode", "dense"),
+            rrf_k=int(cfg.get("rrf_k", 60)),
+            hybrid_depth=int(cfg.get("hybrid_depth", 50)),
+            result_cache_size=int(cfg.get("result_cache_size", 1024)),
+            result_cache_ttl_s=(
+                float(cfg["result_cache_ttl_s"]) if cfg.get("result_cache_ttl_s") else None
+            ),
+            semantic_threshold=(
+                float(cfg["semantic_threshold"]) if cfg.get("semantic_threshold") else None
+            ),
+            reload_interval_s=(
+                float(cfg["reload_interval_s"]) if cfg.get("reload_interval_s") else None
+            ),
+            verify_checksums=bool(cfg.get("verify_checksums", False)),
+        )
+
+    # ---------- SERVER ----------
+    def get_server_config(self) -> ServerConfig:
+        cfg = self.config.get("server") or {}
+
+        return ServerConfig(
+            host=cfg.get("host", "127.0.0.1"),
+            port=int(cfg.get("port", 8000)),
+            max_batch_size=int(cfg.get("max_batch_size", 64)),
+            max_wait_ms=float(cfg.get("max_wait_ms", 5.0)),
+            max_queue_size=int(cfg.get("max_queue_size", 4096)),
+            max_k=int(cfg.get("max_k", 100)),
+            request_timeout_s=float(cfg.get("request_timeout_s", 30.0)),
+        )
+
+    # ---------- METRICS ----------
+    def get_metrics_config(self) -> MetricsConfig:
+        cfg = self.config.get("metrics") or {}
+
+        return MetricsConfig(
+            enabled=bool(cfg.get("enabled", True)),
+            interval_s=float(cfg.get("interval_s", 30.0)),
+        )
+
+    # ---------- LOGGING ----------
+    def get_logging_config(self) -> LoggingConfig:
+        cfg = self.config.get("logging") or {}
+
+        return LoggingConfig(
+            rate_per_s=float(cfg.get("rate_per_s", 10.0)),
+            burst=int(cfg.get("burst", 50)),
         )
 
     # ---------- INFERENCE ----------
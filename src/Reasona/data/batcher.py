@@ -0,0 +1,74 @@
+from typing import Dict, List, Optional, Tuple
+from Reasona.utils.logger import setup_logger
+
+logger = setup_logger(__name__, "logs/data/batcher.json")
+
+ChunkBatch = Tuple[List[str], List[Dict]]
+
+
+class ChunkBatcher:
+    """
+    Collects chunks from many samples into embedding batches.
+    - Fixed-size batches (batch_size chunks)
+    - Optional token budget (approximated by whitespace tokens)
+    - Preserves chunk -> metadata order across samples
+    """
+
+    def __init__(self, batch_size: int = 256, token_budget: Optional[int] = None):
+        if batch_size <= 0:
+            raise ValueError("batch_size must be positive")
+        if token_budget is not None and token_budget <= 0:
+            raise ValueError("token_budget must be positive")
+
+        self.batch_size = batch_size
+        self.token_budget = token_budget
+
+        self._texts: List[str] = []
+        self._metadatas: List[Dict] = []
+        self._tokens = 0
+
+        logger.info(
+            f"Initialized ChunkBatcher(batch_size={batch_size}, token_budget={token_budget})"
+        )
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def add(self, chunks: List[Dict]) -> List[ChunkBatch]:
+        """
+        Buffer chunks and return every batch that became full.
+        """
+        ready = []
+
+        for chunk in chunks:
+            text = chunk["text"]
+            n_tokens = len(text.split()) if self.token_budget else 0
+
+            if (
+                self.token_budget
+                and self._texts
+                and self._tokens + n_tokens > self.token_budget
+            ):
+                ready.append(self._take())
+
+            self._texts.append(text)
+            self._metadatas.append(chunk["metadata"])
+            self._tokens += n_tokens
+
+            if len(self._texts) >= self.batch_size:
+                ready.append(self._take())
+
+        return ready
+
+    def flush(self) -> Optional[ChunkBatch]:
+        """
+        Return the partially filled batch, if any.
+        """
+        if not self._texts:
+            return None
+        return self._take()
+
+    def _take(self) -> ChunkBatch:
+        batch = (self._texts, self._metadatas)
+        self._texts, self._metadatas, self._tokens = [], [], 0
+        return batch
@@ -1,23 +1,151 @@
 # Reasona/data/chunker.py
-from typing import List, Dict
+from typing import Any, List, Dict, Optional, Sequence
+
+import numpy as np
+
+from Reasona.model.registry import tokenizer as load_tokenizer
 from Reasona.utils.logger import setup_logger
+from Reasona.utils.metrics import registry
 
 logger = setup_logger(__name__, "logs/data/chunker.json")
 
+CHUNK_MODES = ("words", "offsets", "tokens")
+
+# code point -> is whitespace (str.split semantics); the last slot stands in
+# for every code point past the table, none of which are whitespace
+_WS_LIMIT = 0x3001
+_WHITESPACE = np.zeros(_WS_LIMIT + 1, dtype=bool)
+_WHITESPACE[[c for c in range(_WS_LIMIT) if chr(c).isspace()]] = True
+
+
+def word_offsets(text: str):
+    """
+    (starts, ends) character offsets of the whitespace-separated words
+    of `text`, the same words `text.split()` returns.
+    """
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    space = _WHITESPACE[np.minimum(codes, _WS_LIMIT)]
+    edges = np.diff(space.view(np.int8), prepend=1, append=1)
+    return np.flatnonzero(edges == -1), np.flatnonzero(edges == 1)
+
 
 class TextChunker:
-    def __init__(self, chunk_size: int = 512, chunk_overlap: int = 50):
+    """
+    Sliding-window chunker.
+
+    Modes:
+    - words:   window over `text.split()`, chunks re-joined with single spaces
+    - offsets: same word windows, located by character offsets computed
+               once per text; each chunk is one slice of the source text
+    - tokens:  window over the tokens of a fast tokenizer (batched), so
+               `chunk_size` is measured in the embedding model's tokens
+
+    offsets / tokens chunks carry their source span as `char_start` /
+    `char_end` in metadata.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 512,
+        chunk_overlap: int = 50,
+        mode: str = "words",
+        tokenizer_name: Optional[str] = None,
+    ):
         if chunk_overlap >= chunk_size:
             raise ValueError("chunk_overlap must be smaller than chunk_size")
+        if mode not in CHUNK_MODES:
+            raise ValueError(f"Unknown chunk mode '{mode}', expected one of {CHUNK_MODES}")
+        if mode == "tokens" and not tokenizer_name:
+            raise ValueError("chunk mode 'tokens' requires a tokenizer_name")
 
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.mode = mode
+        self.tokenizer_name = tokenizer_name
+        self._tokenizer = None
 
         logger.info(
-            f"Initialized TextChunker(chunk_size={chunk_size}, overlap={chunk_overlap})"
+            f"Initialized TextChunker(chunk_size={chunk_size}, overlap={chunk_overlap}, "
+            f"mode={mode})"
+        )
+
+    @classmethod
+    def from_config(cls, cfg) -> "TextChunker":
+        return cls(
+            chunk_size=cfg.chunk_size,
+            chunk_overlap=cfg.chunk_overlap,
+            mode=cfg.chunk_mode,
+            tokenizer_name=cfg.chunk_tokenizer or cfg.embedding_model,
         )
 
-    def chunk_text(self, text: str) -> List[str]:
+    # ------------------------------------------------------------------
+    # Tokenizer (tokens mode only)
+    # ------------------------------------------------------------------
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            tokenizer = load_tokenizer(self.tokenizer_name)
+            if not tokenizer.is_fast:
+                raise ValueError(
+                    f"Tokenizer '{self.tokenizer_name}' has no fast implementation; "
+                    "offset mapping is required for chunk mode 'tokens'"
+                )
+
+            # leave room for [CLS]/[SEP] so the encoder never truncates a chunk
+            limit = tokenizer.model_max_length - tokenizer.num_special_tokens_to_add()
+            if self.chunk_size > limit:
+                logger.warning(
+                    f"chunk_size={self.chunk_size} exceeds the encoder limit; using {limit}"
+                )
+                self.chunk_size = limit
+                self.chunk_overlap = min(self.chunk_overlap, limit - 1)
+            self._tokenizer = tokenizer
+        return self._tokenizer
+
+    def _token_offsets(self, texts: List[str]):
+        encoded = self.tokenizer(
+            texts,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+            verbose=False,
+        )
+        spans = []
+        for offsets in encoded["offset_mapping"]:
+            arr = np.asarray(offsets, dtype=np.int64).reshape(-1, 2)
+            spans.append((arr[:, 0], arr[:, 1]))
+        return spans
+
+    # ------------------------------------------------------------------
+    # Chunking
+    # ------------------------------------------------------------------
+    def _windows(self, n: int):
+        starts = np.arange(0, n, self.chunk_size - self.chunk_overlap)
+        return starts, np.minimum(starts + self.chunk_size, n) - 1
+
+    def _span_chunks(
+        self, text: str, starts: np.ndarray, ends: np.ndarray, metadata: Optional[Dict]
+    ) -> List[Dict]:
+        first, last = self._windows(len(starts))
+        chunks = []
+        for chunk_id, (a, b) in enumerate(
+            zip(starts[first].tolist(), ends[last].tolist())
+        ):
+            chunks.append(
+                {
+                    "text": text[a:b],
+                    "metadata": {
+                        **(metadata or {}),
+                        "chunk_id": chunk_id,
+                        "char_start": a,
+                        "char_end": b,
+                    },
+                }
+            )
+        return chunks
+
+    def _word_chunks(self, text: str, metadata: Optional[Dict]) -> List[Dict]:
         words = text.split()
         chunks = []
 
@@ -25,28 +153,60 @@ class TextChunker:
         while start < len(words):
             end = start + self.chunk_size
             chunk = words[start:end]
-            chunks.append(" ".join(chunk))
+            chunks.append(
+                {
+                    "text": " ".join(chunk),
+                    "metadata": {
+                        **(metadata or {}),
+                        "chunk_id": len(chunks),
+                    },
+                }
+            )
             start = end - self.chunk_overlap
 
         return chunks
 
+    def chunk_text(
+        self, text: str, metadata: Optional[Dict] = None
+    ) -> List[Dict]:
+        return self.chunk_many([text], [metadata])[0]
+
+    def chunk_many(
+        self,
+        texts: Sequence[str],
+        metadatas: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+    ) -> List[List[Dict]]:
+        """
+        Chunk several texts at once (one tokenizer call in tokens mode).
+        Returns one chunk list per input text.
+        """
+        metadatas = metadatas if metadatas is not None else [None] * len(texts)
+
+        with registry.timer("chunker.latency_ms"):
+            if self.mode == "words":
+                chunks = [self._word_chunks(t, m) for t, m in zip(texts, metadatas)]
+            else:
+                if self.mode == "offsets":
+                    spans = [word_offsets(t) for t in texts]
+                else:
+                    spans = self._token_offsets(list(texts))
+                chunks = [
+                    self._span_chunks(t, starts, ends, m)
+                    for t, (starts, ends), m in zip(texts, spans, metadatas)
+                ]
+
+        registry.counter("chunker.texts").inc(len(texts))
+        registry.counter("chunker.chunks").inc(sum(len(c) for c in chunks))
+        return chunks
+
     def chunk_dataset(self, dataset: List[Dict]) -> List[Dict]:
         all_chunks = []
 
         for item in dataset:
             base_text = f"{item['instruction']}\n{item['output']}"
-            chunks = self.chunk_text(base_text)
-
-            for i, chunk in enumerate(chunks):
-                all_chunks.append(
-                    {
-                        "text": chunk,
-                        "metadata": {
-                            **item.get("metadata", {}),
-                            "chunk_id": i,
-                        },
-                    }
-                )
+            all_chunks.extend(
+                self.chunk_text(base_text, metadata=item.get("metadata"))
+            )
 
         logger.info(f"Generated {len(all_chunks)} text chunks")
         return all_chunks
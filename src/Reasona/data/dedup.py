@@ -0,0 +1,265 @@
+import hashlib
+import json
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from Reasona.utils.logger import setup_logger
+
+logger = setup_logger(__name__, "logs/data/dedup.json")
+
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# most recent sample ids kept per LSH bucket (all are checked as candidates)
+BUCKET_SIZE = 8
+
+STATE_FILE = "dedup.json"
+ARRAYS_FILE = "dedup.npz"
+
+Fingerprint = Tuple[bytes, np.ndarray]
+
+
+def lsh_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    (bands, rows) with bands * rows <= num_perm minimising the sum of
+    false-positive and false-negative probability mass around `threshold`.
+    """
+    below = np.linspace(0.0, threshold, 101)
+    above = np.linspace(threshold, 1.0, 101)
+
+    best, best_err = (1, num_perm), float("inf")
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        fp = (1 - (1 - below ** rows) ** bands).mean() * threshold
+        fn = ((1 - above ** rows) ** bands).mean() * (1 - threshold)
+        if fp + fn < best_err:
+            best, best_err = (bands, rows), fp + fn
+    return best
+
+
+class StreamDeduplicator:
+    """
+    Single-pass near-duplicate filter for an unbounded text stream.
+    - Exact duplicates: 16-byte digest of the whitespace/case-normalised text
+    - Near duplicates: MinHash over word shingles, LSH banding for candidate
+      lookup, candidates confirmed by estimated Jaccard >= threshold. Each
+      bucket keeps its BUCKET_SIZE most recent samples, so a sample
+      sharing a band with an older one is still found after unrelated
+      samples hashed to the same bucket
+
+    Memory is bounded by `max_entries`: the oldest signatures (and their
+    digests) are evicted first, so duplicates further apart than that are
+    no longer caught.
+
+    `fingerprint` is pure and can run in worker processes; `seen` updates
+    the index and must be called in stream order from one thread.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        num_perm: int = 128,
+        shingle_size: int = 5,
+        max_entries: int = 1_000_000,
+        seed: int = 1,
+    ):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError("dedup threshold must be in (0, 1]")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.seed = seed
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 32, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=(num_perm, 1), dtype=np.uint64)
+
+        self.bands, self.rows = lsh_bands(threshold, num_perm)
+        self._reset()
+
+        logger.info(
+            f"Initialized StreamDeduplicator(threshold={threshold}, num_perm={num_perm}, "
+            f"bands={self.bands}, rows={self.rows}, max_entries={max_entries})"
+        )
+
+    @classmethod
+    def from_config(cls, cfg) -> "StreamDeduplicator":
+        return cls(
+            threshold=cfg.dedup_threshold,
+            num_perm=cfg.dedup_num_perm,
+            shingle_size=cfg.dedup_shingle_size,
+            max_entries=cfg.dedup_max_entries,
+        )
+
+    def _reset(self) -> None:
+        self._next_id = 0
+        self._exact: "OrderedDict[bytes, int]" = OrderedDict()
+        self._signatures: "OrderedDict[int, Tuple[bytes, np.ndarray]]" = OrderedDict()
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in range(self.bands)]
+
+        self.stats: Dict[str, int] = {
+            "samples_seen": 0,
+            "exact_duplicates": 0,
+            "near_duplicates": 0,
+            "samples_dropped": 0,
+            "chunks_dropped": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Fingerprints
+    # ------------------------------------------------------------------
+    def _shingle_hashes(self, words: List[str]) -> np.ndarray:
+        k = self.shingle_size
+        if len(words) <= k:
+            shingles = [" ".join(words)]
+        else:
+            shingles = [" ".join(words[i:i + k]) for i in range(len(words) - k + 1)]
+        return np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+
+    def fingerprint(self, text: str) -> Fingerprint:
+        words = (text or "").lower().split()
+        digest = hashlib.blake2b(" ".join(words).encode("utf-8"), digest_size=16).digest()
+
+        hashes = np.unique(self._shingle_hashes(words))
+        # a * h + b stays below 2**64 for 32-bit a, b and h
+        permuted = (self._a * hashes + self._b) % _PRIME & _MAX_HASH
+        signature = permuted.min(axis=1).astype(np.uint32)
+        return digest, signature
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        r = self.rows
+        return [hash(signature[i * r:(i + 1) * r].tobytes()) for i in range(self.bands)]
+
+    # ------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------
+    def _insert(self, digest: bytes, signature: np.ndarray, keys: List[int]) -> None:
+        sample_id = self._next_id
+        self._next_id += 1
+
+        self._exact[digest] = sample_id
+        self._signatures[sample_id] = (digest, signature)
+        for table, key in zip(self._tables, keys):
+            bucket = table.setdefault(key, [])
+            bucket.append(sample_id)
+            if len(bucket) > BUCKET_SIZE:
+                del bucket[0]
+
+        while len(self._signatures) > self.max_entries:
+            old_id, (old_digest, old_sig) = self._signatures.popitem(last=False)
+            if self._exact.get(old_digest) == old_id:
+                del self._exact[old_digest]
+            for table, key in zip(self._tables, self._band_keys(old_sig)):
+                # ids are appended in order, so the oldest is first
+                bucket = table.get(key)
+                if bucket and bucket[0] == old_id:
+                    del bucket[0]
+                    if not bucket:
+                        del table[key]
+
+    def seen(self, fp: Fingerprint) -> bool:
+        """
+        True if the fingerprint duplicates an indexed sample; otherwise
+        it is indexed and False is returned.
+        """
+        digest, signature = fp
+        self.stats["samples_seen"] += 1
+
+        if digest in self._exact:
+            self.stats["exact_duplicates"] += 1
+            self.stats["samples_dropped"] += 1
+            return True
+
+        keys = self._band_keys(signature)
+        checked = set()
+        for table, key in zip(self._tables, keys):
+            for candidate in table.get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                _, other = self._signatures[candidate]
+                if np.count_nonzero(other == signature) >= self.threshold * self.num_perm:
+                    self.stats["near_duplicates"] += 1
+                    self.stats["samples_dropped"] += 1
+                    return True
+
+        self._insert(digest, signature, keys)
+        return False
+
+    def mark(self, texts: Sequence[str]) -> List[bool]:
+        return [self.seen(self.fingerprint(t)) for t in texts]
+
+    def record_dropped_chunks(self, n: int) -> None:
+        self.stats["chunks_dropped"] += n
+
+    def report(self) -> Dict[str, Any]:
+        return {**self.stats, "index_entries": len(self._signatures)}
+
+    # ------------------------------------------------------------------
+    # Persistence (checkpoint / resume)
+    # ------------------------------------------------------------------
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        ids = np.fromiter(self._signatures, dtype=np.int64, count=len(self._signatures))
+        entries = list(self._signatures.values())
+        np.savez(
+            path / ARRAYS_FILE,
+            ids=ids,
+            digests=np.array([d for d, _ in entries], dtype="S16"),
+            signatures=(
+                np.stack([s for _, s in entries])
+                if entries else np.zeros((0, self.num_perm), dtype=np.uint32)
+            ),
+        )
+        with open(path / STATE_FILE, "w") as f:
+            json.dump(
+                {
+                    "threshold": self.threshold,
+                    "num_perm": self.num_perm,
+                    "shingle_size": self.shingle_size,
+                    "seed": self.seed,
+                    "next_id": self._next_id,
+                    "stats": self.stats,
+                },
+                f,
+            )
+
+    def load(self, path: Path) -> bool:
+        """
+        Restore a saved index into this (identically configured) instance.
+        Returns False if nothing was saved at `path`.
+        """
+        path = Path(path)
+        if not (path / STATE_FILE).exists():
+            return False
+
+        with open(path / STATE_FILE, "r") as f:
+            state = json.load(f)
+        for key in ("threshold", "num_perm", "shingle_size", "seed"):
+            if state[key] != getattr(self, key):
+                raise ValueError(
+                    f"Saved dedup index has {key}={state[key]}, expected {getattr(self, key)}"
+                )
+
+        arrays = np.load(path / ARRAYS_FILE)
+        self._reset()
+        for sample_id, digest, signature in zip(
+            arrays["ids"].tolist(), arrays["digests"], arrays["signatures"]
+        ):
+            self._next_id = sample_id
+            self._insert(bytes(digest).ljust(16, b"\0"), signature, self._band_keys(signature))
+        self._next_id = state["next_id"]
+        self.stats = state["stats"]
+        return True
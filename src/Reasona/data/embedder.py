@@ -1,14 +1,33 @@
-from sentence_transformers import SentenceTransformer
+from typing import Optional
+from Reasona.model.registry import sentence_transformer
 from Reasona.utils.logger import setup_logger
+from Reasona.utils.metrics import registry, SIZE_BUCKETS
 
 logger = setup_logger(__name__, "logs/data/embedder.json")
 
 
 class Embedder:
     def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
-        logger.info(f"Loading embedding model: {model_name}")
-        self.model = SentenceTransformer(model_name)
+        self.model_name = model_name
 
-    def embed(self, texts: list[str]):
+    @property
+    def model(self):
+        # loaded on first use, once per process
+        return sentence_transformer(self.model_name)
+
+    def embed(
+        self,
+        texts: list[str],
+        batch_size: Optional[int] = None,
+        show_progress_bar: bool = True,
+    ):
         logger.info(f"Embedding {len(texts)} chunks")
-        return self.model.encode(texts, show_progress_bar=True)
+        registry.counter("embedder.texts").inc(len(texts))
+        registry.histogram("embedder.batch_size", SIZE_BUCKETS).observe(len(texts))
+        with registry.timer("embedder.latency_ms"):
+            return self.model.encode(
+                texts,
+                batch_size=batch_size or 32,
+                show_progress_bar=show_progress_bar,
+                convert_to_numpy=True,
+            ).astype("float32", copy=False)
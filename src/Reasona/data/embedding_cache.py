@@ -0,0 +1,319 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from Reasona.utils.logger import setup_logger
+from Reasona.utils.metrics import registry
+
+logger = setup_logger(__name__, "logs/data/embedding_cache.json")
+
+KEY_BYTES = 16
+
+
+def cache_key(model_name: str, text: str) -> bytes:
+    h = hashlib.blake2b(digest_size=KEY_BYTES)
+    h.update(model_name.encode("utf-8"))
+    h.update(b"\0")
+    h.update(text.encode("utf-8"))
+    return h.digest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed, size-bounded on-disk embedding cache.
+    - Vectors live in a memory-mapped float32 file (one row per slot)
+    - A compact hash index maps blake2b(model, text) -> slot
+    - Least-recently-used slots are evicted once max_entries is reached
+    - Each slot also records the key it holds (memory-mapped next to the
+      vectors and written with them), and lookups check it: after a
+      crash the last saved index may point evicted keys at reused slots
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        model_name: str,
+        max_entries: int = 1_000_000,
+        read_only: bool = False,
+    ):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+
+        model_tag = hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:12]
+        self.dir = Path(cache_dir) / model_tag
+        self.model_name = model_name
+        self.capacity = max_entries
+        self.read_only = read_only
+
+        self.dim: Optional[int] = None
+        self.vectors: Optional[np.memmap] = None
+        self.slot_keys: Optional[np.memmap] = None
+        self.slots: Dict[bytes, int] = {}
+        self.free_slots: List[int] = []   # released below next_slot
+        self.next_slot = 0                # slots from here on were never written
+        self.ticks = np.zeros(self.capacity, dtype=np.int64)
+        self.clock = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._load()
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def _load(self) -> None:
+        meta_path = self.dir / "meta.json"
+        if not meta_path.exists():
+            return
+
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+
+        if meta["model_name"] != self.model_name:
+            logger.warning(f"Ignoring cache at {self.dir}: model mismatch")
+            return
+
+        self.dim = int(meta["dim"])
+        if int(meta["capacity"]) != self.capacity:
+            logger.info(f"Reusing cache capacity {meta['capacity']} (fixed at creation)")
+        self.capacity = int(meta["capacity"])
+        self.ticks = np.zeros(self.capacity, dtype=np.int64)
+
+        self.vectors = np.memmap(
+            self.dir / "vectors.f32",
+            dtype=np.float32,
+            mode="r" if self.read_only else "r+",
+            shape=(self.capacity, self.dim),
+        )
+
+        index = np.load(self.dir / "index.npz")
+        keys, slots, ticks = index["keys"], index["slots"], index["ticks"]
+
+        keys_path = self.dir / "keys.u8"
+        if not keys_path.exists() and not self.read_only:
+            # caches written before slot keys were recorded: trust the index
+            self._open_slot_keys("w+")
+            self.slot_keys[slots] = keys
+        elif keys_path.exists():
+            self._open_slot_keys("r" if self.read_only else "r+")
+
+        self.slots = {key.tobytes(): int(slot) for key, slot in zip(keys, slots)}
+        self.next_slot = int(slots.max()) + 1 if len(slots) else 0
+        unused = np.ones(self.next_slot, dtype=bool)
+        unused[slots] = False
+        self.free_slots = np.flatnonzero(unused).tolist()
+        self.ticks[slots] = ticks
+        self.clock = int(ticks.max()) if len(ticks) else 0
+
+        logger.info(f"Loaded embedding cache | entries={len(self.slots)}, dim={self.dim}")
+
+    def _create(self, dim: int) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.vectors = np.memmap(
+            self.dir / "vectors.f32",
+            dtype=np.float32,
+            mode="w+",
+            shape=(self.capacity, dim),
+        )
+        self._open_slot_keys("w+")
+
+    def _open_slot_keys(self, mode: str) -> None:
+        self.slot_keys = np.memmap(
+            self.dir / "keys.u8",
+            dtype=np.uint8,
+            mode=mode,
+            shape=(self.capacity, KEY_BYTES),
+        )
+
+    def save(self) -> None:
+        if self.read_only or self.vectors is None:
+            return
+
+        self.vectors.flush()
+        self.slot_keys.flush()
+
+        keys = np.frombuffer(b"".join(self.slots.keys()), dtype=np.uint8).reshape(
+            -1, KEY_BYTES
+        )
+        slots = np.fromiter(self.slots.values(), dtype=np.int64, count=len(self.slots))
+
+        tmp = self.dir / "index.tmp.npz"
+        np.savez(tmp, keys=keys, slots=slots, ticks=self.ticks[slots])
+        os.replace(tmp, self.dir / "index.npz")
+
+        meta = {
+            "model_name": self.model_name,
+            "dim": self.dim,
+            "capacity": int(self.vectors.shape[0]),
+        }
+        with open(self.dir / "meta.json", "w") as f:
+            json.dump(meta, f)
+
+        logger.info(f"Saved embedding cache | {self.stats()}")
+
+    # ------------------------------------------------------------------
+    # Lookup / insert
+    # ------------------------------------------------------------------
+    def get_many(self, keys: List[bytes]):
+        """
+        Return (vectors, hit_mask). Rows for misses are left as zeros.
+        """
+        hit = np.zeros(len(keys), dtype=bool)
+        out = None
+
+        if self.vectors is not None:
+            out = np.zeros((len(keys), self.dim), dtype=np.float32)
+            rows, slots = [], []
+            for i, key in enumerate(keys):
+                slot = self.slots.get(key)
+                if slot is not None:
+                    rows.append(i)
+                    slots.append(slot)
+
+            if rows and self.slot_keys is not None:
+                # drop index entries whose slot was since reused for another key
+                wanted = np.frombuffer(b"".join(keys[i] for i in rows), dtype=np.uint8)
+                valid = (self.slot_keys[slots] == wanted.reshape(-1, KEY_BYTES)).all(axis=1)
+                for i in np.flatnonzero(~valid):
+                    del self.slots[keys[rows[i]]]
+                    self.free_slots.append(slots[i])
+                rows = [r for r, ok in zip(rows, valid) if ok]
+                slots = [s for s, ok in zip(slots, valid) if ok]
+
+            if rows:
+                self.clock += 1
+                slots = np.asarray(slots)
+                out[rows] = self.vectors[slots]
+                self.ticks[slots] = self.clock
+                hit[rows] = True
+
+        n_hits = int(hit.sum())
+        self.hits += n_hits
+        self.misses += len(keys) - n_hits
+        return out, hit
+
+    def put_many(self, keys: List[bytes], vectors: np.ndarray) -> None:
+        if self.read_only or not keys:
+            return
+
+        if self.vectors is None:
+            self._create(vectors.shape[1])
+
+        keys = keys[-self.capacity:]
+        vectors = vectors[-self.capacity:]
+        for key in keys:
+            # re-inserted keys get a fresh row like any other
+            slot = self.slots.pop(key, None)
+            if slot is not None:
+                self.free_slots.append(slot)
+
+        slots = self._allocate(len(keys))
+        self.clock += 1
+        self.vectors[slots] = vectors
+        self.slot_keys[slots] = np.frombuffer(b"".join(keys), dtype=np.uint8).reshape(
+            -1, KEY_BYTES
+        )
+        self.ticks[slots] = self.clock
+        for key, slot in zip(keys, slots):
+            self.slots[key] = int(slot)
+
+    def _allocate(self, n: int) -> np.ndarray:
+        slots = self.free_slots[:n]
+        del self.free_slots[:n]
+
+        fresh = min(n - len(slots), self.capacity - self.next_slot)
+        slots.extend(range(self.next_slot, self.next_slot + fresh))
+        self.next_slot += fresh
+        n_evict = n - len(slots)
+
+        if n_evict > 0:
+            # evict the least recently used rows in one pass
+            occupied = np.fromiter(self.slots.values(), dtype=np.int64, count=len(self.slots))
+            lru = occupied[np.argpartition(self.ticks[occupied], n_evict - 1)[:n_evict]]
+            victims = set(int(s) for s in lru)
+            self.slots = {k: s for k, s in self.slots.items() if s not in victims}
+            self.evictions += n_evict
+            slots.extend(sorted(victims))
+
+        return np.asarray(slots, dtype=np.int64)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.slots),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class CachedEmbedder:
+    """
+    Drop-in wrapper around Embedder that only encodes texts that are
+    neither cached nor duplicated within the same call.
+
+    `on_miss(keys, vectors)` also receives every newly encoded entry,
+    for callers whose cache is read-only to hand them to a writer.
+    """
+
+    def __init__(
+        self,
+        embedder,
+        cache: EmbeddingCache,
+        on_miss: Optional[Callable[[List[bytes], np.ndarray], None]] = None,
+    ):
+        self.embedder = embedder
+        self.cache = cache
+        self.on_miss = on_miss
+        self.model_name = cache.model_name
+        self.duplicates = 0
+
+    def embed(
+        self,
+        texts: list[str],
+        batch_size: Optional[int] = None,
+        show_progress_bar: bool = True,
+    ):
+        positions: Dict[str, int] = {}
+        unique: List[str] = []
+        inverse = np.empty(len(texts), dtype=np.int64)
+        for i, text in enumerate(texts):
+            pos = positions.get(text)
+            if pos is None:
+                pos = positions[text] = len(unique)
+                unique.append(text)
+            inverse[i] = pos
+        self.duplicates += len(texts) - len(unique)
+
+        keys = [cache_key(self.model_name, t) for t in unique]
+        vectors, hit = self.cache.get_many(keys)
+
+        miss = np.flatnonzero(~hit)
+        registry.counter("embedding_cache.hits").inc(len(unique) - len(miss))
+        registry.counter("embedding_cache.misses").inc(len(miss))
+        if len(miss):
+            encoded = self.embedder.embed(
+                [unique[i] for i in miss],
+                batch_size=batch_size,
+                show_progress_bar=show_progress_bar,
+            )
+            if vectors is None:
+                vectors = np.zeros((len(unique), encoded.shape[1]), dtype=np.float32)
+            vectors[miss] = encoded
+            miss_keys = [keys[i] for i in miss]
+            self.cache.put_many(miss_keys, encoded)
+            if self.on_miss is not None:
+                self.on_miss(miss_keys, encoded)
+
+        return vectors[inverse]
+
+    def stats(self) -> Dict[str, float]:
+        return {**self.cache.stats(), "duplicates": self.duplicates}
@@ -1,26 +1,159 @@
-from typing import Dict, Any
+import functools
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Union
+
+from Reasona.utils.helpers import read_yaml
 from Reasona.utils.logger import setup_logger
 
+if TYPE_CHECKING:
+    import pyarrow as pa
+
 logger = setup_logger(__name__, "logs/data/formatter.json")
 
+# logical field -> raw columns, first non-empty wins
+DEFAULT_FIELD_MAPPING: Dict[str, List[str]] = {
+    "instruction": ["instruction", "prompt", "query"],
+    "input": ["input"],
+    "reasoning": ["synthetic_reasoning"],
+    "output": ["output", "completion", "synthetic_answer"],
+    "lang": ["lang", "language"],
+}
+
+# fields joined (in this order) into the text that gets chunked and embedded
+TEXT_FIELDS = ("instruction", "input", "reasoning", "output")
+
+SOURCE = "PleIAs/SYNTH"
+
+Batch = Union["pa.RecordBatch", "pa.Table", List[Dict[str, Any]]]
+
+
+def _as_text(value: Any) -> Optional[str]:
+    # the one rule for both paths: None and "" are missing, anything
+    # else that is not already a string is passed through str()
+    if value is None or value == "":
+        return None
+    return value if isinstance(value, str) else str(value)
+
+
+def load_field_mapping(schema_path: Optional[Path]) -> Dict[str, List[str]]:
+    """
+    Read the FORMAT section of dataset_schema.yaml, falling back to the
+    built-in mapping for missing fields or a missing file.
+    """
+    mapping = {k: list(v) for k, v in DEFAULT_FIELD_MAPPING.items()}
+    if schema_path is None or not Path(schema_path).exists():
+        return mapping
+
+    schema = read_yaml(schema_path) or {}
+    for field, columns in (schema.get("FORMAT") or {}).items():
+        mapping[field] = [columns] if isinstance(columns, str) else list(columns)
+
+    target = (schema.get("TARGET_COLUMN") or {}).get("name")
+    if target and target not in mapping["output"]:
+        mapping["output"].append(target)
+    return mapping
+
 
 class DataFormatter:
+    def __init__(self, schema_path: Optional[Path] = Path("dataset_schema.yaml")):
+        self.mapping = load_field_mapping(schema_path)
+
+    @property
+    def input_columns(self) -> List[str]:
+        """
+        Raw columns read by the formatter, for loader column projection.
+        """
+        return list(dict.fromkeys(c for cols in self.mapping.values() for c in cols))
+
+    # ------------------------------------------------------------------
+    # Row path
+    # ------------------------------------------------------------------
+    def _field(self, sample: Dict[str, Any], field: str):
+        for column in self.mapping[field]:
+            value = _as_text(sample.get(column))
+            if value is not None:
+                return value
+        return None
+
     def format_sample(self, sample: Dict[str, Any]) -> Dict[str, Any]:
-        instruction = sample.get("instruction") or sample.get("prompt")
-        input_text = sample.get("input", "")
-        output = sample.get("output") or sample.get("completion")
+        fields = {f: self._field(sample, f) for f in self.mapping}
+        fields["input"] = fields.get("input") or ""
 
         text = " ".join(
-            part for part in [instruction, input_text, output] if part
+            fields[f] for f in TEXT_FIELDS if fields.get(f)
         )
 
         return {
-            "text": text,                      
-            "instruction": instruction,
-            "input": input_text,
-            "output": output,
+            "text": text,
+            "instruction": fields["instruction"],
+            "input": fields["input"],
+            "reasoning": fields.get("reasoning"),
+            "output": fields["output"],
             "metadata": {
-                "source": "PleIAs/SYNTH",
-                "lang": sample.get("lang"),
+                "source": SOURCE,
+                "lang": fields.get("lang"),
             },
         }
+
+    # ------------------------------------------------------------------
+    # Columnar path
+    # ------------------------------------------------------------------
+    def _column(self, batch, field: str):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        present = []
+        for column in self.mapping.get(field, []):
+            if column not in batch.schema.names:
+                continue
+            arr = batch.column(column)
+            if not pa.types.is_string(arr.type) and not pa.types.is_large_string(arr.type):
+                # stringified in Python, as format_sample does; Arrow's own
+                # cast formats values differently and rejects nested types
+                arr = pa.array([_as_text(v) for v in arr.to_pylist()], pa.string())
+            # empty strings fall through to the next column, like `or`
+            present.append(pc.if_else(pc.equal(arr, ""), None, arr))
+
+        if not present:
+            return pa.nulls(batch.num_rows, pa.string())
+        if len(present) == 1:
+            return present[0]
+        return pc.coalesce(*present)
+
+    def format_batch(self, batch: Batch) -> Dict[str, List[Any]]:
+        """
+        Format a whole record batch column-wise. Returns a dict of
+        equal-length lists with the same keys and values as format_sample
+        applied to each row.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        if isinstance(batch, list):
+            # only the columns the formatter reads, built as strings: Arrow
+            # type inference over every raw column fails on mixed types
+            batch = pa.RecordBatch.from_pydict(
+                {
+                    column: pa.array([_as_text(row.get(column)) for row in batch], pa.string())
+                    for column in self.input_columns
+                }
+            )
+
+        columns = {f: self._column(batch, f) for f in self.mapping}
+
+        parts = [columns[f] for f in TEXT_FIELDS if f in columns]
+        # rows with every part null get an explicit "": pyarrow drops
+        # them from a skip-nulls join, misaligning every later row
+        has_text = functools.reduce(pc.or_, [pc.is_valid(p) for p in parts])
+        empty = pc.if_else(has_text, pa.scalar(None, pa.string()), "")
+        text = pc.binary_join_element_wise(*parts, empty, " ", null_handling="skip")
+        langs = columns["lang"].to_pylist() if "lang" in columns else [None] * batch.num_rows
+
+        return {
+            "text": text.to_pylist(),
+            "instruction": columns["instruction"].to_pylist(),
+            "input": pc.fill_null(columns["input"], "").to_pylist(),
+            "reasoning": columns["reasoning"].to_pylist(),
+            "output": columns["output"].to_pylist(),
+            "metadata": [{"source": SOURCE, "lang": lang} for lang in langs],
+        }
@@ -1,8 +1,8 @@
-from datasets import load_dataset
-from typing import Dict, Any, Iterator, Optional
+from typing import Dict, Any, Iterator, List, Optional
 import time
 
 from Reasona.utils.logger import setup_logger
+from Reasona.utils.metrics import registry
 
 logger = setup_logger(__name__, "logs/data/loader.json")
 
@@ -24,6 +24,8 @@ class StreamingDatasetProcessor:
         self.revision = revision
 
     def _load_stream(self, split: str):
+        from datasets import load_dataset
+
         logger.info(f"Starting stream | dataset={self.dataset_name}, split={split}")
         return load_dataset(
             self.dataset_name,
@@ -39,18 +41,34 @@ class StreamingDatasetProcessor:
         self,
         split: str = "train",
         max_samples: Optional[int] = None,
+        skip: int = 0,
     ) -> Iterator[Dict[str, Any]]:
         dataset = self._load_stream(split)
 
+        # resume support: max_samples still counts from the start of the split
+        if skip:
+            logger.info(f"Skipping first {skip} samples")
+            if max_samples is not None:
+                if skip >= max_samples:
+                    return
+                max_samples -= skip
+            dataset = dataset.skip(skip)
+
         started = False
         start_time = time.time()
+        samples = registry.counter("loader.samples")
+        fetch_ms = registry.histogram("loader.fetch_ms")
 
+        t0 = time.perf_counter()
         for idx, sample in enumerate(dataset):
+            fetch_ms.observe((time.perf_counter() - t0) * 1000.0)
+            samples.inc()
             if not started:
                 logger.info("Streaming started")
                 started = True
 
             yield sample
+            t0 = time.perf_counter()
 
             if max_samples is not None and idx + 1 >= max_samples:
                 break
@@ -59,3 +77,22 @@ class StreamingDatasetProcessor:
         logger.info(
             f"Streaming finished | samples={idx + 1 if started else 0}, time={elapsed:.1f}s"
         )
+
+    # ------------------------------------------------------------------
+    # BATCH STREAM (columnar formatting)
+    # ------------------------------------------------------------------
+    def stream_sample_batches(
+        self,
+        split: str = "train",
+        max_samples: Optional[int] = None,
+        skip: int = 0,
+        batch_size: int = 500,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        batch = []
+        for sample in self.stream_samples(split, max_samples=max_samples, skip=skip):
+            batch.append(sample)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
@@ -0,0 +1,245 @@
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence
+
+from Reasona.utils.helpers import read_yaml
+from Reasona.utils.logger import setup_logger
+from Reasona.utils.metrics import registry
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+logger = setup_logger(__name__, "logs/data/local_loader.json")
+
+SHARD_SUFFIXES = (".parquet", ".jsonl", ".json")
+
+_DONE = object()
+
+
+def projected_columns(
+    schema_path: Optional[Path], wanted: Sequence[str]
+) -> List[str]:
+    """
+    Columns declared in dataset_schema.yaml that are also in `wanted`.
+    Falls back to `wanted` when no schema file is available.
+    """
+    if schema_path is None or not Path(schema_path).exists():
+        return list(wanted)
+    declared = (read_yaml(schema_path) or {}).get("COLUMNS") or {}
+    return [c for c in wanted if c in declared] or list(wanted)
+
+
+class LocalShardedDatasetProcessor:
+    """
+    Offline processor over a directory of Parquet / JSONL shards.
+    - Column projection: only the requested columns are decoded
+    - Up to `num_readers` shards are read concurrently by threads
+    - Record batches are interleaved round-robin across the open shards,
+      so the sample order only depends on the files and batch size
+
+    Shards for a split live in `<data_dir>/<split>/` or are named
+    `<split>-*.parquet` / `<split>-*.jsonl` directly in `<data_dir>`.
+    """
+
+    def __init__(
+        self,
+        data_dir: Path,
+        columns: Optional[Sequence[str]] = None,
+        num_readers: int = 4,
+        batch_size: int = 1024,
+        prefetch: int = 4,
+    ):
+        self.data_dir = Path(data_dir)
+        self.columns = list(columns) if columns else None
+        self.num_readers = max(1, num_readers)
+        self.batch_size = batch_size
+        self.prefetch = prefetch
+
+    def list_shards(self, split: str) -> List[Path]:
+        split_dir = self.data_dir / split
+        if split_dir.is_dir():
+            candidates = split_dir.iterdir()
+        else:
+            candidates = (
+                p for p in self.data_dir.iterdir()
+                if p.name.startswith(f"{split}-") or p.name.startswith(f"{split}_")
+            )
+        shards = sorted(p for p in candidates if p.suffix in SHARD_SUFFIXES)
+        if not shards:
+            raise FileNotFoundError(f"No shards for split '{split}' under {self.data_dir}")
+        return shards
+
+    # ------------------------------------------------------------------
+    # Per-shard readers
+    # ------------------------------------------------------------------
+    def _project(self, batch: "pa.RecordBatch") -> "pa.RecordBatch":
+        if self.columns is None:
+            return batch
+        present = [c for c in self.columns if c in batch.schema.names]
+        return batch.select(present)
+
+    def _read_shard(self, path: Path) -> Iterator["pa.RecordBatch"]:
+        import pyarrow.json as pa_json
+        import pyarrow.parquet as pq
+
+        if path.suffix == ".parquet":
+            pf = pq.ParquetFile(path)
+            columns = None
+            if self.columns is not None:
+                columns = [c for c in self.columns if c in pf.schema_arrow.names]
+            yield from pf.iter_batches(batch_size=self.batch_size, columns=columns)
+            return
+
+        reader = pa_json.open_json(
+            path, read_options=pa_json.ReadOptions(block_size=1 << 22)
+        )
+        for batch in reader:
+            batch = self._project(batch)
+            for start in range(0, batch.num_rows, self.batch_size):
+                yield batch.slice(start, self.batch_size)
+
+    @staticmethod
+    def _put(out: "queue.Queue", item, stop: threading.Event) -> bool:
+        """
+        Blocking put that gives up once the consumer has stopped. Returns
+        False if the item was dropped.
+        """
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _reader_thread(self, path: Path, out: "queue.Queue", stop: threading.Event):
+        try:
+            for batch in self._read_shard(path):
+                if not self._put(out, batch, stop):
+                    return
+        except BaseException as exc:
+            self._put(out, exc, stop)
+            return
+        self._put(out, _DONE, stop)
+
+    # ------------------------------------------------------------------
+    # BATCH STREAM
+    # ------------------------------------------------------------------
+    def stream_batches(self, split: str = "train") -> Iterator["pa.RecordBatch"]:
+        shards = self.list_shards(split)
+        logger.info(
+            f"Starting local stream | dir={self.data_dir}, split={split}, "
+            f"shards={len(shards)}, readers={self.num_readers}"
+        )
+
+        stop = threading.Event()
+        pending = list(reversed(shards))
+        active: List["queue.Queue"] = []
+
+        def open_next() -> Optional["queue.Queue"]:
+            if not pending:
+                return None
+            q: "queue.Queue" = queue.Queue(maxsize=self.prefetch)
+            threading.Thread(
+                target=self._reader_thread,
+                args=(pending.pop(), q, stop),
+                daemon=True,
+            ).start()
+            return q
+
+        try:
+            for _ in range(self.num_readers):
+                q = open_next()
+                if q is not None:
+                    active.append(q)
+
+            queue_wait = registry.histogram("loader.queue_wait_ms")
+            batches = registry.counter("loader.batches")
+            samples = registry.counter("loader.samples")
+
+            slot = 0
+            while active:
+                t0 = time.perf_counter()
+                item = active[slot].get()
+                queue_wait.observe((time.perf_counter() - t0) * 1000.0)
+                if isinstance(item, BaseException):
+                    raise item
+                if item is _DONE:
+                    # refill the finished slot so the interleave stays fixed
+                    replacement = open_next()
+                    if replacement is None:
+                        active.pop(slot)
+                    else:
+                        active[slot] = replacement
+                        continue
+                else:
+                    batches.inc()
+                    samples.inc(item.num_rows)
+                    yield item
+                    slot += 1
+                if active:
+                    slot %= len(active)
+        finally:
+            stop.set()
+
+    def stream_sample_batches(
+        self,
+        split: str = "train",
+        max_samples: Optional[int] = None,
+        skip: int = 0,
+        batch_size: Optional[int] = None,
+    ) -> Iterator["pa.RecordBatch"]:
+        """
+        Record batches trimmed to the [skip, max_samples) window of the split.
+        Batch size follows the reader (`batch_size` is accepted for parity
+        with the hub processor).
+        """
+        position = 0
+        for batch in self.stream_batches(split):
+            start = position
+            position += batch.num_rows
+
+            # whole batches before the resume point are skipped undecoded
+            if position <= skip:
+                continue
+            if max_samples is not None and start >= max_samples:
+                break
+
+            lo = max(0, skip - start)
+            hi = batch.num_rows if max_samples is None else min(batch.num_rows, max_samples - start)
+            yield batch.slice(lo, hi - lo)
+
+            if max_samples is not None and position >= max_samples:
+                break
+
+    def _rows(self, split: str, skip: int) -> Iterator[Dict[str, Any]]:
+        for batch in self.stream_sample_batches(split, skip=skip):
+            yield from batch.to_pylist()
+
+    # ------------------------------------------------------------------
+    # SAMPLE STREAM (same contract as StreamingDatasetProcessor)
+    # ------------------------------------------------------------------
+    def stream_samples(
+        self,
+        split: str = "train",
+        max_samples: Optional[int] = None,
+        skip: int = 0,
+    ) -> Iterator[Dict[str, Any]]:
+        start_time = time.time()
+        emitted = 0
+
+        if max_samples is not None and skip >= max_samples:
+            return
+
+        for sample in self._rows(split, skip):
+            yield sample
+            emitted += 1
+            if max_samples is not None and skip + emitted >= max_samples:
+                break
+
+        elapsed = time.time() - start_time
+        logger.info(
+            f"Local streaming finished | samples={emitted}, time={elapsed:.1f}s"
+        )
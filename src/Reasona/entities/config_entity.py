@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
 
 
 # -----------------------------
@@ -14,6 +14,16 @@ class PreprocessConfig:
     max_samples: Optional[int] = None     # optional max samples to stream
     batch_size: int = 500                 # logging / flush batch size
     output_dir: Optional[Path] = None     # optional directory to save intermediate results
+    source: str = "hub"                   # "hub" (HF streaming) | "local" (Parquet/JSONL shards)
+    local_dir: Optional[Path] = None      # shard directory for source="local"
+    num_readers: int = 4                  # concurrent shard readers (local)
+    read_batch_size: int = 1024           # rows per Arrow record batch (local)
+    schema_path: Path = Path("dataset_schema.yaml")  # column projection source
+    dedup: bool = False                   # drop exact / near-duplicate samples (MinHash LSH)
+    dedup_threshold: float = 0.85         # estimated Jaccard similarity counted as duplicate
+    dedup_num_perm: int = 128             # MinHash permutations
+    dedup_shingle_size: int = 5           # words per shingle
+    dedup_max_entries: int = 1_000_000    # signatures kept (oldest evicted first)
 
 
 # -----------------------------
@@ -23,7 +33,28 @@ class PreprocessConfig:
 class TrainingConfig:
     dataset_path: Path                     # path to transformed dataset
     output_dir: Path                       # directory to save trained models
-    base_model: str                        # name of base model
+    base_model: str                        # name of base model (and of its tokenizer)
+    token_cache_dir: Path = Path("artifacts/training/token_cache")  # tokenized shards, keyed by tokenizer + settings + source
+    max_seq_length: int = 2048             # tokens per example (longer ones are truncated)
+    tokenize_batch_size: int = 1000        # records per tokenizer call
+    shard_tokens: int = 50_000_000         # tokens per memory-mapped shard
+
+
+# -----------------------------
+# LoRA fine-tuning (params.yaml)
+# -----------------------------
+@dataclass(frozen=True)
+class LoraTrainingConfig:
+    r: int = 16
+    alpha: int = 32
+    dropout: float = 0.05
+    batch_size: int = 2                    # rows per step (packed rows or padded examples)
+    epochs: int = 3
+    learning_rate: float = 2e-4
+    target_modules: Optional[Tuple[str, ...]] = None  # None: peft default for the architecture
+    packing: bool = False                  # pack examples into max_seq_length rows (else length buckets)
+    bucket_multiplier: int = 50            # length-bucketing pool, in batches (packing off)
+    log_every: int = 10                    # steps between throughput log lines
 
 
 # -----------------------------
@@ -36,6 +67,33 @@ class IndexingConfig:
     embedding_model: str = "all-MiniLM-L6-v2"
     chunk_size: int = 256
     chunk_overlap: int = 32
+    chunk_mode: str = "words"              # "words" | "offsets" | "tokens" (sized by tokenizer)
+    chunk_tokenizer: Optional[str] = None  # tokenizer for chunk_mode="tokens" (default: embedding_model)
+    embed_batch_size: int = 256            # chunks per encode call (across samples)
+    embed_token_budget: Optional[int] = None  # optional max whitespace tokens per batch
+    execution_mode: str = "serial"         # "serial" | "staged" (overlapped stages)
+    queue_size: int = 8                    # bounded queue length between stages
+    num_chunk_workers: int = 2             # process pool size for format + chunk
+    stage_batch_size: int = 64             # raw samples per fetch -> chunk hand-off
+    num_workers: int = 1                   # >1 builds shards in parallel processes
+    shard_by: str = "index"                # "index" | "hash" sample-to-shard assignment
+    embedding_cache_dir: Optional[Path] = None  # persistent embedding cache (disabled if None)
+    embedding_cache_max_entries: int = 1_000_000
+    checkpoint_every_samples: Optional[int] = None    # checkpoint cadence (serial mode)
+    checkpoint_every_seconds: Optional[float] = None
+    index_type: str = "flat"               # "flat" | "ivf_flat" | "ivf_pq" | "hnsw"
+    nlist: int = 1024                      # IVF centroids
+    pq_m: int = 16                         # PQ sub-quantizers (must divide dim)
+    pq_nbits: int = 8                      # bits per PQ code
+    hnsw_m: int = 32                       # HNSW graph degree
+    hnsw_ef_construction: int = 200
+    train_size: Optional[int] = None       # vectors sampled for IVF training (default 39 * nlist)
+    filter_fields: Tuple[str, ...] = ("lang", "source")  # metadata fields with search bitmaps
+    keyword_index: bool = True             # BM25 postings next to index.faiss (sparse / hybrid retrieval)
+    keep_snapshots: int = 3                # published snapshots kept by GC (the current one always is)
+    memory_budget_mb: Optional[int] = None # flush in-memory vectors to an on-disk segment past this (None: one in-memory index)
+    max_segment_mb: Optional[int] = None   # largest segment built by compaction (default 4 * memory_budget_mb)
+    compaction_min_segments: int = 4       # adjacent small segments merged at once
 
 
 # -----------------------------
@@ -47,6 +105,50 @@ class RetrievalConfig:
     top_k: int = 5                         # number of results to retrieve
     embedding_model: str = "all-MiniLM-L6-v2"
     engine: str = "vector_search"          # retrieval engine type
+    nprobe: Optional[int] = None           # IVF lists probed per query
+    ef_search: Optional[int] = None        # HNSW candidate list size per query
+    query_cache_size: int = 1024           # LRU of query embeddings (0 disables)
+    mmap_index: bool = False               # map the saved index read-only (shared page cache)
+    mode: str = "dense"                    # "dense" | "sparse" (BM25, no encoder) | "hybrid" (RRF)
+    rrf_k: int = 60                        # reciprocal rank fusion constant
+    hybrid_depth: int = 50                 # hits taken from each ranking before fusing
+    result_cache_size: int = 1024          # cached hit lists per normalized query (0 disables)
+    result_cache_ttl_s: Optional[float] = 300.0  # cached hits expire after this long
+    semantic_threshold: Optional[float] = None   # cosine sim to reuse a paraphrase's hits (None: exact only)
+    reload_interval_s: Optional[float] = 10.0    # poll CURRENT and hot-swap new snapshots (None disables)
+    verify_checksums: bool = False         # sha256-check snapshot files before serving them
+
+
+# -----------------------------
+# Logging configuration
+# -----------------------------
+@dataclass(frozen=True)
+class LoggingConfig:
+    rate_per_s: float = 10.0               # INFO records per call site per second (0 disables)
+    burst: int = 50                        # records a call site may emit at once
+
+
+# -----------------------------
+# Metrics configuration
+# -----------------------------
+@dataclass(frozen=True)
+class MetricsConfig:
+    enabled: bool = True                   # periodic JSON snapshots via the json logger
+    interval_s: float = 30.0               # seconds between snapshots
+
+
+# -----------------------------
+# Local HTTP server configuration
+# -----------------------------
+@dataclass(frozen=True)
+class ServerConfig:
+    host: str = "127.0.0.1"
+    port: int = 8000
+    max_batch_size: int = 64               # queries coalesced into one encode + search
+    max_wait_ms: float = 5.0               # how long the first query waits for company
+    max_queue_size: int = 4096             # pending queries before answering 503
+    max_k: int = 100                       # largest k a request may ask for (400 above)
+    request_timeout_s: float = 30.0
 
 
 @dataclass(frozen=True)
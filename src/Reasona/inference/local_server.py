@@ -0,0 +1,386 @@
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from flask import Flask, jsonify, request
+
+from Reasona.utils.logger import setup_logger
+from Reasona.utils.metrics import registry, SIZE_BUCKETS
+from Reasona.entities.config_entity import RetrievalConfig, ServerConfig
+from Reasona.vectorstore.retriever import MODES
+
+logger = setup_logger(__name__, "logs/inference/local_server.json")
+
+_STOP = object()
+
+
+@dataclass
+class _Pending:
+    query: str
+    k: int
+    filters: Optional[Dict[str, Any]]
+    mode: Optional[str] = None
+    future: Future = field(default_factory=Future)
+    enqueued: float = field(default_factory=time.perf_counter)
+
+
+class LatencyStats:
+    """
+    Rolling request latencies (last `window` requests) plus counters.
+    """
+
+    def __init__(self, window: int = 10_000):
+        self._lock = threading.Lock()
+        self._latencies: deque = deque(maxlen=window)
+        self._batch_sizes: deque = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.started = time.time()
+
+    def record_request(self, latency_s: float, ok: bool = True) -> None:
+        with self._lock:
+            self.requests += 1
+            self.errors += 0 if ok else 1
+            self._latencies.append(latency_s)
+
+    def record_batch(self, size: int) -> None:
+        with self._lock:
+            self.batches += 1
+            self._batch_sizes.append(size)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = np.asarray(self._latencies, dtype=np.float64) * 1000.0
+            batch_sizes = np.asarray(self._batch_sizes, dtype=np.float64)
+            report = {
+                "requests": self.requests,
+                "errors": self.errors,
+                "batches": self.batches,
+                "uptime_s": round(time.time() - self.started, 1),
+            }
+
+        if latencies.size:
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            report.update(
+                latency_ms_p50=round(float(p50), 3),
+                latency_ms_p95=round(float(p95), 3),
+                latency_ms_p99=round(float(p99), 3),
+                latency_ms_max=round(float(latencies.max()), 3),
+            )
+        if batch_sizes.size:
+            report.update(
+                batch_size_avg=round(float(batch_sizes.mean()), 2),
+                batch_size_max=int(batch_sizes.max()),
+            )
+        return report
+
+
+def _cancel(futures: List[Future]) -> None:
+    for future in futures:
+        future.cancel()
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent retrieval requests into micro-batches.
+
+    A single worker thread takes the first waiting request, then keeps
+    collecting until `max_batch_size` requests are in hand or `max_wait_ms`
+    has passed since that first one. Each batch shares one encode and one
+    FAISS search per distinct (filters, mode) pair; requests asking for fewer than
+    the batch's largest k get a prefix of the hits. Requests whose future
+    was cancelled while queued are dropped without being searched.
+    """
+
+    def __init__(
+        self,
+        retriever,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        max_queue_size: int = 4096,
+        stats: Optional[LatencyStats] = None,
+    ):
+        self.retriever = retriever
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000.0
+        self.stats = stats or LatencyStats()
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue_size)
+        self._thread = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Client side
+    # ------------------------------------------------------------------
+    def submit(
+        self,
+        query: str,
+        k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+        mode: Optional[str] = None,
+    ) -> Future:
+        item = _Pending(query=query, k=k, filters=filters or None, mode=mode)
+        # raises queue.Full when overloaded, surfaced to the client as 503
+        self._queue.put_nowait(item)
+        return item.future
+
+    def submit_many(
+        self,
+        queries: List[str],
+        k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+        mode: Optional[str] = None,
+    ) -> List[Future]:
+        """
+        All or nothing: if the queue fills up partway, the queries already
+        queued are cancelled and queue.Full is raised.
+        """
+        futures: List[Future] = []
+        try:
+            for query in queries:
+                futures.append(self.submit(query, k=k, filters=filters, mode=mode))
+        except queue.Full:
+            _cancel(futures)
+            raise
+        return futures
+
+    def close(self) -> None:
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    # ------------------------------------------------------------------
+    # Worker side
+    # ------------------------------------------------------------------
+    def _collect(self, first: _Pending) -> List[Any]:
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    # past the deadline: still take whatever is already queued
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            if item is _STOP:
+                break
+        return batch
+
+    def _run_batch(self, batch: List[_Pending]) -> None:
+        groups: Dict[str, List[_Pending]] = {}
+        for item in batch:
+            key = json.dumps([item.filters, item.mode], sort_keys=True)
+            groups.setdefault(key, []).append(item)
+
+        for items in groups.values():
+            try:
+                k = max(item.k for item in items)
+                hits = self.retriever.retrieve_many(
+                    [item.query for item in items],
+                    k=k,
+                    filters=items[0].filters,
+                    mode=items[0].mode,
+                )
+            except Exception as exc:
+                for item in items:
+                    item.future.set_exception(exc)
+                continue
+            for item, item_hits in zip(items, hits):
+                item.future.set_result(item_hits[: item.k])
+
+    def _loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = self._collect(first)
+            stop = batch[-1] is _STOP
+            if stop:
+                batch.pop()
+
+            # marks the rest running, so a late cancel() no longer applies
+            live = [item for item in batch if item.future.set_running_or_notify_cancel()]
+            if len(live) < len(batch):
+                registry.counter("server.cancelled").inc(len(batch) - len(live))
+            batch = live
+            if not batch:
+                if stop:
+                    return
+                continue
+
+            self.stats.record_batch(len(batch))
+            started = time.perf_counter()
+            queue_wait = registry.histogram("server.queue_wait_ms")
+            for item in batch:
+                queue_wait.observe((started - item.enqueued) * 1000.0)
+            registry.histogram("server.batch_size", SIZE_BUCKETS).observe(len(batch))
+            self._run_batch(batch)
+            if stop:
+                return
+
+
+# ----------------------------------------------------------------------
+# HTTP app
+# ----------------------------------------------------------------------
+def load_retriever(retrieval_cfg: RetrievalConfig):
+    from Reasona.data.embedder import Embedder
+    from Reasona.vectorstore.retriever import Retriever
+    from Reasona.vectorstore.snapshots import SnapshotManager, SnapshotReloader
+
+    snapshots = SnapshotManager(Path(retrieval_cfg.vector_store_dir))
+    store = snapshots.load(
+        mmap=retrieval_cfg.mmap_index, checksums=retrieval_cfg.verify_checksums
+    )
+    embedder = Embedder(model_name=retrieval_cfg.embedding_model)
+    logger.info(
+        f"Loaded store | dir={retrieval_cfg.vector_store_dir}, vectors={len(store)}, "
+        f"snapshot={store.snapshot['version'] if store.snapshot else None}, "
+        f"mmap={retrieval_cfg.mmap_index}, model={retrieval_cfg.embedding_model}, "
+        f"mode={retrieval_cfg.mode}, keyword_index={store.has_keywords}"
+    )
+    # the encoder only loads on the first dense / hybrid query
+    retriever = Retriever(
+        store,
+        embedder,
+        nprobe=retrieval_cfg.nprobe,
+        ef_search=retrieval_cfg.ef_search,
+        query_cache_size=retrieval_cfg.query_cache_size,
+        mode=retrieval_cfg.mode,
+        rrf_k=retrieval_cfg.rrf_k,
+        hybrid_depth=retrieval_cfg.hybrid_depth,
+        result_cache_size=retrieval_cfg.result_cache_size,
+        result_cache_ttl_s=retrieval_cfg.result_cache_ttl_s,
+        semantic_threshold=retrieval_cfg.semantic_threshold,
+    )
+    if retrieval_cfg.reload_interval_s:
+        retriever.reloader = SnapshotReloader(
+            retriever,
+            snapshots,
+            interval_s=retrieval_cfg.reload_interval_s,
+            mmap=retrieval_cfg.mmap_index,
+            expected_model=retrieval_cfg.embedding_model,
+            checksums=retrieval_cfg.verify_checksums,
+        ).start()
+    return retriever
+
+
+def create_app(
+    retriever,
+    server_cfg: ServerConfig = ServerConfig(),
+    default_k: int = 5,
+) -> Flask:
+    """
+    Endpoints:
+    - POST /retrieve  {"query": str, "k": int, "filters": {...}, "mode": str}
+                      or {"queries": [str, ...], ...}; mode is optional
+                      ("dense" | "sparse" | "hybrid")
+    - GET  /health    liveness + index size
+    - GET  /stats     request / batch latency percentiles, result cache hit
+                      rates + metrics registry
+    """
+    app = Flask(__name__)
+    stats = LatencyStats()
+    batcher = MicroBatcher(
+        retriever,
+        max_batch_size=server_cfg.max_batch_size,
+        max_wait_ms=server_cfg.max_wait_ms,
+        max_queue_size=server_cfg.max_queue_size,
+        stats=stats,
+    )
+    app.config["BATCHER"] = batcher
+
+    @app.get("/health")
+    def health():
+        return jsonify(
+            {
+                "status": "ok",
+                "vectors": len(retriever.store),
+                "snapshot": (getattr(retriever.store, "snapshot", None) or {}).get("version"),
+                "queue_depth": batcher.queue_depth,
+            }
+        )
+
+    @app.get("/stats")
+    def get_stats():
+        report = {**stats.snapshot(), "queue_depth": batcher.queue_depth}
+        if getattr(retriever, "result_cache", None) is not None:
+            report["result_cache"] = retriever.result_cache.stats()
+        report["metrics"] = registry.snapshot()
+        return jsonify(report)
+
+    @app.post("/retrieve")
+    def retrieve():
+        t0 = time.perf_counter()
+        body = request.get_json(silent=True) or {}
+
+        queries = body.get("queries")
+        single = queries is None
+        if single:
+            queries = [body.get("query")]
+        if not queries or not all(isinstance(q, str) and q for q in queries):
+            return jsonify({"error": "'query' or 'queries' must be non-empty strings"}), 400
+
+        # one bad request must not fail (or bloat) the batch it joins
+        k = body.get("k", default_k)
+        if isinstance(k, bool) or not isinstance(k, int) or not 1 <= k <= server_cfg.max_k:
+            return jsonify({"error": f"'k' must be an integer in 1..{server_cfg.max_k}"}), 400
+        filters = body.get("filters")
+        if filters is not None and not isinstance(filters, dict):
+            return jsonify({"error": "'filters' must be an object"}), 400
+        mode = body.get("mode")
+        if mode is not None:
+            if mode not in MODES:
+                return jsonify({"error": f"'mode' must be one of {list(MODES)}"}), 400
+            if mode != "dense" and not retriever.store.has_keywords:
+                return jsonify({"error": f"mode '{mode}' needs a keyword index"}), 400
+
+        try:
+            futures = batcher.submit_many(queries, k=k, filters=filters, mode=mode)
+        except queue.Full:
+            stats.record_request(time.perf_counter() - t0, ok=False)
+            return jsonify({"error": "server overloaded"}), 503
+
+        try:
+            results = [f.result(timeout=server_cfg.request_timeout_s) for f in futures]
+        except FutureTimeout:
+            # nobody will read the rest; skip them if still queued
+            _cancel(futures)
+            stats.record_request(time.perf_counter() - t0, ok=False)
+            return jsonify({"error": "retrieval timed out"}), 504
+        except KeyError as exc:
+            stats.record_request(time.perf_counter() - t0, ok=False)
+            return jsonify({"error": str(exc)}), 400
+        except Exception as exc:
+            stats.record_request(time.perf_counter() - t0, ok=False)
+            logger.exception(f"Retrieval failed: {exc}")
+            return jsonify({"error": "retrieval failed"}), 500
+
+        stats.record_request(time.perf_counter() - t0)
+        return jsonify({"results": results[0] if single else results})
+
+    return app
+
+
+def serve(retrieval_cfg: RetrievalConfig, server_cfg: ServerConfig) -> None:
+    retriever = load_retriever(retrieval_cfg)
+    app = create_app(retriever, server_cfg, default_k=retrieval_cfg.top_k)
+    logger.info(
+        f"Serving on {server_cfg.host}:{server_cfg.port} | "
+        f"max_batch_size={server_cfg.max_batch_size}, max_wait_ms={server_cfg.max_wait_ms}"
+    )
+    app.run(host=server_cfg.host, port=server_cfg.port, threaded=True)
@@ -0,0 +1,74 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from Reasona.utils.logger import setup_logger
+from Reasona.utils.metrics import registry
+
+logger = setup_logger(__name__, "logs/model/registry.json")
+
+
+class ModelRegistry:
+    """
+    Per-process cache of loaded models, keyed by (kind, name).
+
+    Loading happens on the first `get` for a key; concurrent callers for
+    the same key wait for that one load instead of loading twice, while
+    different keys load independently.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[Tuple[str, str], Any] = {}
+        self._loading: Dict[Tuple[str, str], threading.Lock] = {}
+
+    def get(self, kind: str, name: str, loader: Callable[[], Any]) -> Any:
+        key = (kind, name)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        with key_lock:
+            model = self._models.get(key)
+            if model is None:
+                t0 = time.perf_counter()
+                model = loader()
+                elapsed_ms = (time.perf_counter() - t0) * 1000.0
+                registry.histogram("models.load_ms").observe(elapsed_ms)
+                logger.info(f"Loaded {kind} '{name}' in {elapsed_ms:.0f} ms")
+                self._models[key] = model
+        return model
+
+    def loaded(self) -> List[Tuple[str, str]]:
+        return list(self._models)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+            self._loading.clear()
+
+
+models = ModelRegistry()
+
+
+def sentence_transformer(model_name: str):
+    def load():
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(model_name)
+
+    return models.get("sentence_transformer", model_name, load)
+
+
+def tokenizer(model_name: str):
+    """
+    Fast tokenizer for `model_name` (the slow one if none exists).
+    """
+    def load():
+        from transformers import AutoTokenizer
+
+        return AutoTokenizer.from_pretrained(model_name, use_fast=True)
+
+    return models.get("tokenizer", model_name, load)
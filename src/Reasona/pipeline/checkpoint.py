@@ -0,0 +1,117 @@
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from Reasona.utils.logger import setup_logger
+from Reasona.data.dedup import StreamDeduplicator
+from Reasona.vectorstore.faiss_store import FaissStore
+from Reasona.vectorstore.segmented_store import load_store
+
+logger = setup_logger(__name__, "logs/pipeline/checkpoint.json")
+
+
+class IndexCheckpoint:
+    """
+    Periodic snapshots of a partially built index.
+    - Persists the store, its metadata, the stream position and the
+      dedup index (if any), so a resumed run filters the same samples
+    - Written to a temp dir and swapped in, so a crash mid-write keeps
+      the previous checkpoint intact (a crash between the two renames
+      leaves it as `<dir>.old`, which `load` restores)
+    """
+
+    STATE_FILE = "state.json"
+    DEDUP_DIR = "dedup"
+
+    def __init__(
+        self,
+        directory: Path,
+        every_samples: Optional[int] = None,
+        every_seconds: Optional[float] = None,
+    ):
+        self.dir = Path(directory)
+        self.every_samples = every_samples
+        self.every_seconds = every_seconds
+
+        self._last_samples = 0
+        self._last_time = time.monotonic()
+
+    @property
+    def _old_dir(self) -> Path:
+        return self.dir.with_name(self.dir.name + ".old")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.every_samples or self.every_seconds)
+
+    def due(self, samples_consumed: int) -> bool:
+        if self.every_samples and samples_consumed - self._last_samples >= self.every_samples:
+            return True
+        if self.every_seconds and time.monotonic() - self._last_time >= self.every_seconds:
+            return True
+        return False
+
+    def save(
+        self,
+        store: FaissStore,
+        state: Dict[str, Any],
+        dedup: Optional[StreamDeduplicator] = None,
+    ) -> None:
+        tmp = self.dir.with_name(self.dir.name + ".tmp")
+        old = self._old_dir
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+
+        store.save(tmp, finalize=False)
+        if dedup is not None:
+            dedup.save(tmp / self.DEDUP_DIR)
+        with open(tmp / self.STATE_FILE, "w") as f:
+            json.dump({**state, "dim": store.dim}, f)
+
+        if self.dir.exists():
+            # a crash right after the last swap can leave the one before
+            shutil.rmtree(old, ignore_errors=True)
+            os.replace(self.dir, old)
+        os.replace(tmp, self.dir)
+        shutil.rmtree(old, ignore_errors=True)
+
+        self._last_samples = state["samples_consumed"]
+        self._last_time = time.monotonic()
+        logger.info(f"Checkpoint saved | {state}")
+
+    def load(self, indexing_cfg=None) -> Optional[Tuple[FaissStore, Dict[str, Any]]]:
+        """
+        Restore the checkpointed store and state. A segmented store is
+        reopened in the work dir of `indexing_cfg` to take further adds.
+        """
+        state_path = self.dir / self.STATE_FILE
+        if not state_path.exists() and (self._old_dir / self.STATE_FILE).exists():
+            # crashed between moving the previous checkpoint aside and
+            # moving the new one in
+            shutil.rmtree(self.dir, ignore_errors=True)
+            os.replace(self._old_dir, self.dir)
+            logger.warning(f"Recovered previous checkpoint from {self._old_dir}")
+        if not state_path.exists():
+            return None
+
+        with open(state_path, "r") as f:
+            state = json.load(f)
+
+        store = load_store(self.dir, cfg=indexing_cfg)
+
+        self._last_samples = state["samples_consumed"]
+        logger.info(f"Checkpoint loaded | {state}")
+        return store, state
+
+    def load_dedup(self, dedup: StreamDeduplicator) -> bool:
+        restored = dedup.load(self.dir / self.DEDUP_DIR)
+        if restored:
+            logger.info(f"Dedup index restored | {dedup.report()}")
+        return restored
+
+    def clear(self) -> None:
+        shutil.rmtree(self.dir, ignore_errors=True)
+        shutil.rmtree(self._old_dir, ignore_errors=True)
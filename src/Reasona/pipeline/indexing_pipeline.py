@@ -1,8 +1,17 @@
 from Reasona.utils.logger import setup_logger
+from Reasona.utils.metrics import registry
 from Reasona.data.chunker import TextChunker
+from Reasona.data.batcher import ChunkBatcher
 from Reasona.data.embedder import Embedder
+from Reasona.data.embedding_cache import EmbeddingCache, CachedEmbedder
+from Reasona.data.dedup import StreamDeduplicator
 from Reasona.vectorstore.faiss_store import FaissStore
+from Reasona.vectorstore.segmented_store import SegmentedStore, create_store
+from Reasona.vectorstore.snapshots import SnapshotManager
 from Reasona.pipeline.preprocess_pipeline import PreprocessPipeline
+from Reasona.pipeline.staged_indexing import StagedIndexer
+from Reasona.pipeline.sharded_indexing import ShardedIndexer
+from Reasona.pipeline.checkpoint import IndexCheckpoint
 from Reasona.entities.config_entity import PreprocessConfig, IndexingConfig
 
 logger = setup_logger("indexing_pipeline", "logs/pipeline/indexing_pipeline.json")
@@ -27,48 +36,162 @@ class IndexingPipeline:
         self.vector_db_dir = indexing_cfg.vector_store_dir
         self.vector_db_dir.mkdir(parents=True, exist_ok=True)
 
-        self.chunker = TextChunker(
-            chunk_size=indexing_cfg.chunk_size,
-            chunk_overlap=indexing_cfg.chunk_overlap,
+        self.chunker = TextChunker.from_config(indexing_cfg)
+
+        # sharded runs load the model inside each worker process instead
+        self.embedder = (
+            Embedder(model_name=indexing_cfg.embedding_model)
+            if indexing_cfg.num_workers <= 1
+            else None
         )
 
-        self.embedder = Embedder(model_name=indexing_cfg.embedding_model)
+        self.embedding_cache: EmbeddingCache | None = None
+        if self.embedder is not None and indexing_cfg.embedding_cache_dir:
+            self.embedding_cache = EmbeddingCache(
+                indexing_cfg.embedding_cache_dir,
+                model_name=indexing_cfg.embedding_model,
+                max_entries=indexing_cfg.embedding_cache_max_entries,
+            )
+            self.embedder = CachedEmbedder(self.embedder, self.embedding_cache)
 
-    def run(self) -> None:
-        logger.info("=== INDEXING PIPELINE STARTED ===")
+        self.store: FaissStore | SegmentedStore | None = None
+        self.dedup: StreamDeduplicator | None = None
 
-        # ---- producer ----
-        preprocess = PreprocessPipeline(self.preprocess_cfg)
-        stream = preprocess.stream()
-
-        store: FaissStore | None = None
-        processed = 0
+        self.checkpoint = IndexCheckpoint(
+            self.vector_db_dir / "checkpoint",
+            every_samples=indexing_cfg.checkpoint_every_samples,
+            every_seconds=indexing_cfg.checkpoint_every_seconds,
+        )
 
-        for sample in stream:
-            chunks = self.chunker.chunk_text(
-                sample["text"],
-                metadata=sample.get("metadata"),
-            )
+    def _index_batch(self, texts, metadatas) -> None:
+        vectors = self.embedder.embed(
+            texts,
+            batch_size=self.indexing_cfg.embed_batch_size,
+            show_progress_bar=False,
+        )
 
-            if not chunks:
-                continue
+        if self.store is None:
+            self.store = create_store(vectors.shape[1], self.indexing_cfg)
 
-            texts = [c["text"] for c in chunks]
-            metadatas = [c["metadata"] for c in chunks]
+        self.store.add(vectors, metadatas, texts)
 
-            vectors = self.embedder.embed(texts)
+    def run(self, resume: bool = False) -> None:
+        logger.info("=== INDEXING PIPELINE STARTED ===")
 
-            if store is None:
-                store = FaissStore(dim=vectors.shape[1])
+        mode = self.indexing_cfg.execution_mode
+        serial = mode == "serial" and self.indexing_cfg.num_workers <= 1
+        if resume and not serial:
+            raise ValueError("resume is only supported for serial single-worker runs")
+        if self.checkpoint.enabled and not serial:
+            logger.warning("Checkpointing is disabled outside serial single-worker runs")
+
+        if self.indexing_cfg.num_workers > 1:
+            self.store = ShardedIndexer(self.preprocess_cfg, self.indexing_cfg).run()
+        elif mode == "staged":
+            staged = StagedIndexer(self.preprocess_cfg, self.indexing_cfg, self.embedder)
+            self.store = staged.run()
+            self.dedup = staged.dedup
+        elif mode == "serial":
+            self._run_serial(resume=resume)
+        else:
+            raise ValueError(f"Unknown execution_mode: {mode}")
+
+        if self.embedding_cache is not None:
+            self.embedding_cache.save()
+            logger.info(f"Embedding cache stats: {self.embedder.stats()}")
+
+        if self.store is not None:
+            # a new immutable snapshot; servers pick it up via CURRENT
+            snapshots = SnapshotManager(self.vector_db_dir)
+            version = snapshots.publish(self.store, self.indexing_cfg.embedding_model)
+            snapshots.gc(keep=self.indexing_cfg.keep_snapshots)
+            logger.info(f"Vector store published to {snapshots.path(version)}")
+
+            if isinstance(self.store, SegmentedStore):
+                # the snapshot links every segment file; the build copy can go
+                self.store.close(remove_work_dir=True)
+
+        self.checkpoint.clear()
+        logger.info("=== INDEXING PIPELINE FINISHED ===")
 
-            store.add(vectors, metadatas)
+    def _save_checkpoint(self, batcher: ChunkBatcher, consumed: int) -> None:
+        # everything consumed so far must be in the store before persisting
+        tail = batcher.flush()
+        if tail is not None:
+            self._index_batch(*tail)
+
+        if self.store is None:
+            return
+
+        self.checkpoint.save(
+            self.store,
+            {
+                "dataset_name": self.preprocess_cfg.dataset_name,
+                "split": self.preprocess_cfg.split,
+                "samples_consumed": consumed,
+            },
+            dedup=self.dedup,
+        )
+        if self.embedding_cache is not None:
+            self.embedding_cache.save()
+
+    def _run_serial(self, resume: bool = False) -> None:
+        consumed = 0
+
+        if resume:
+            restored = self.checkpoint.load(self.indexing_cfg)
+            if restored is None:
+                logger.info("No checkpoint found, starting from scratch")
+            else:
+                self.store, state = restored
+                if state["split"] != self.preprocess_cfg.split:
+                    raise ValueError(
+                        f"Checkpoint split '{state['split']}' does not match "
+                        f"'{self.preprocess_cfg.split}'"
+                    )
+                consumed = state["samples_consumed"]
+                logger.info(f"Resuming after {consumed} samples")
 
-            processed += 1
-            if processed % 100 == 0:
-                logger.info(f"Indexed {processed} streamed samples")
+        # ---- producer ----
+        preprocess = PreprocessPipeline(self.preprocess_cfg)
+        self.dedup = preprocess.dedup
+        if consumed and self.dedup is not None:
+            self.checkpoint.load_dedup(self.dedup)
+        batches = preprocess.stream_batches(skip=consumed)
+
+        # ---- cross-sample batching ----
+        batcher = ChunkBatcher(
+            batch_size=self.indexing_cfg.embed_batch_size,
+            token_budget=self.indexing_cfg.embed_token_budget,
+        )
 
-        if store is not None:
-            store.save(self.vector_db_dir)
-            logger.info(f"Vector store saved to {self.vector_db_dir}")
+        processed = 0
 
-        logger.info("=== INDEXING PIPELINE FINISHED ===")
+        for batch in batches:
+            duplicate = batch.get("duplicate") or [False] * len(batch["text"])
+            sample_chunks = self.chunker.chunk_many(batch["text"], batch["metadata"])
+            for chunks, is_duplicate in zip(sample_chunks, duplicate):
+                consumed += 1
+                if is_duplicate:
+                    self.dedup.record_dropped_chunks(len(chunks))
+                    chunks = []
+
+                if chunks:
+                    for texts, metadatas in batcher.add(chunks):
+                        self._index_batch(texts, metadatas)
+
+                    processed += 1
+                    if processed % 100 == 0:
+                        logger.info(f"Indexed {processed} streamed samples")
+
+            # only between batches: the dedup index already holds the whole
+            # batch, so a mid-batch checkpoint would flag its unconsumed
+            # samples as duplicates of themselves on resume
+            if self.checkpoint.enabled and self.checkpoint.due(consumed):
+                self._save_checkpoint(batcher, consumed)
+
+            registry.gauge("indexing.samples_consumed").set(consumed)
+
+        tail = batcher.flush()
+        if tail is not None:
+            self._index_batch(*tail)
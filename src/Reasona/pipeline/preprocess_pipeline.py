@@ -1,7 +1,10 @@
-from typing import Iterator, Dict, Any
+from typing import Iterator, Dict, Any, List
 from Reasona.utils.logger import setup_logger
+from Reasona.utils.metrics import registry, SIZE_BUCKETS
 from Reasona.data.loader import StreamingDatasetProcessor
+from Reasona.data.local_loader import LocalShardedDatasetProcessor, projected_columns
 from Reasona.data.formatter import DataFormatter
+from Reasona.data.dedup import StreamDeduplicator
 from Reasona.entities.config_entity import PreprocessConfig
 
 logger = setup_logger(__name__, "logs/pipeline/preprocess_pipeline.json")
@@ -10,32 +13,89 @@ logger = setup_logger(__name__, "logs/pipeline/preprocess_pipeline.json")
 class PreprocessPipeline:
     """
     Streaming data PRODUCER.
-    Yields preprocessed samples one-by-one.
+    Yields preprocessed samples one-by-one, or column-wise batches.
     """
 
     def __init__(self, cfg: PreprocessConfig):
         logger.info("Initializing PreprocessPipeline (stream producer)")
         self.cfg = cfg
 
-        self.loader = StreamingDatasetProcessor(
-            dataset_name=cfg.dataset_name,
-            revision=cfg.revision,
-        )
+        self.loader = self.build_loader(cfg)
+
+        self.formatter = DataFormatter(cfg.schema_path)
+
+        self.dedup = StreamDeduplicator.from_config(cfg) if cfg.dedup else None
 
-        self.formatter = DataFormatter()
+    @staticmethod
+    def build_loader(cfg: PreprocessConfig):
+        if cfg.source == "hub":
+            return StreamingDatasetProcessor(
+                dataset_name=cfg.dataset_name,
+                revision=cfg.revision,
+            )
+        if cfg.source == "local":
+            if cfg.local_dir is None:
+                raise ValueError("preprocess.local_dir is required when source is 'local'")
+            # synth_id is kept for hash sharding even though the formatter ignores it
+            columns = projected_columns(
+                cfg.schema_path,
+                ["synth_id"] + DataFormatter(cfg.schema_path).input_columns,
+            )
+            return LocalShardedDatasetProcessor(
+                data_dir=cfg.local_dir,
+                columns=columns,
+                num_readers=cfg.num_readers,
+                batch_size=cfg.read_batch_size,
+            )
+        raise ValueError(f"Unknown preprocess source: {cfg.source}")
 
-    def stream(self) -> Iterator[Dict[str, Any]]:
+    def stream_batches(self, skip: int = 0) -> Iterator[Dict[str, List[Any]]]:
+        """
+        Yield formatted batches as dicts of equal-length column lists
+        (see DataFormatter.format_batch). With dedup enabled each batch
+        also carries a boolean `duplicate` column; flagged rows are kept so
+        stream positions stay aligned with the source for resume.
+        """
         logger.info("=== PREPROCESS STREAM STARTED ===")
 
-        stream = self.loader.stream_samples(
+        batches = self.loader.stream_sample_batches(
             split=self.cfg.split,
             max_samples=self.cfg.max_samples,
+            skip=skip,
+            batch_size=self.cfg.batch_size,
         )
 
-        for idx, raw_sample in enumerate(stream, start=1):
+        samples = registry.counter("preprocess.samples")
+        duplicates = registry.counter("preprocess.duplicates")
+        batch_size = registry.histogram("preprocess.batch_size", SIZE_BUCKETS)
+
+        for idx, raw_batch in enumerate(batches, start=1):
             if idx == 1:
-                logger.info("Streaming first sample")
+                logger.info("Streaming first batch")
+
+            with registry.timer("preprocess.format_ms"):
+                batch = self.formatter.format_batch(raw_batch)
+            if self.dedup is not None:
+                with registry.timer("preprocess.dedup_ms"):
+                    batch["duplicate"] = self.dedup.mark(batch["text"])
+                duplicates.inc(sum(batch["duplicate"]))
 
-            yield self.formatter.format_sample(raw_sample)
+            samples.inc(len(batch["text"]))
+            batch_size.observe(len(batch["text"]))
+            yield batch
 
+        if self.dedup is not None:
+            logger.info(f"Dedup report | {self.dedup.report()}")
         logger.info("=== PREPROCESS STREAM ENDED ===")
+
+    def stream(self, skip: int = 0) -> Iterator[Dict[str, Any]]:
+        """
+        Yield formatted samples one by one, without duplicates.
+        """
+        for batch in self.stream_batches(skip=skip):
+            duplicate = batch.pop("duplicate", None)
+            keys = list(batch)
+            for idx, values in enumerate(zip(*(batch[k] for k in keys))):
+                if duplicate is not None and duplicate[idx]:
+                    continue
+                yield dict(zip(keys, values))
@@ -0,0 +1,313 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from Reasona.utils.logger import setup_logger
+from Reasona.utils.metrics import registry
+from Reasona.data.chunker import TextChunker
+from Reasona.data.batcher import ChunkBatcher
+from Reasona.data.embedder import Embedder
+from Reasona.data.embedding_cache import KEY_BYTES, EmbeddingCache, CachedEmbedder
+from Reasona.vectorstore.faiss_store import FaissStore
+from Reasona.vectorstore.segmented_store import create_store
+from Reasona.pipeline.preprocess_pipeline import PreprocessPipeline
+from Reasona.entities.config_entity import PreprocessConfig, IndexingConfig
+
+logger = setup_logger(__name__, "logs/pipeline/sharded_indexing.json")
+
+# rows gathered from the shard files per store.add during a merge
+MERGE_CHUNK = 65536
+# row count and dimension, written once a shard is complete
+SHARD_FILE = "shard.json"
+
+
+def shard_of(idx: int, raw: Dict[str, Any], num_shards: int, shard_by: str) -> int:
+    """
+    Assign a raw sample to a shard, either by stream position or by content hash.
+    """
+    if shard_by == "index":
+        return idx % num_shards
+    if shard_by == "hash":
+        key = raw.get("synth_id") or repr(sorted(raw.items()))
+        digest = hashlib.blake2b(str(key).encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little") % num_shards
+    raise ValueError(f"Unknown shard_by: {shard_by}")
+
+
+def _limit_torch_threads(num_workers: int) -> None:
+    # N workers each using every core would oversubscribe the CPU
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // num_workers))
+
+
+def build_shard(
+    preprocess_cfg: PreprocessConfig,
+    indexing_cfg: IndexingConfig,
+    worker_id: int,
+    shard_dir: Path,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Worker entry point. Streams the dataset, keeps only the samples assigned
+    to `worker_id` and appends vectors, metadata, global order keys and,
+    for the keyword index, the chunk texts to the shard files as it goes.
+    Returns the metrics recorded in this process for the parent to merge.
+    """
+    num_workers = indexing_cfg.num_workers
+    _limit_torch_threads(num_workers)
+
+    preprocess = PreprocessPipeline(preprocess_cfg)
+    chunker = TextChunker.from_config(indexing_cfg)
+    embedder = Embedder(model_name=indexing_cfg.embedding_model)
+    miss_keys_f = miss_vectors_f = None
+
+    def record_misses(keys, vectors):
+        miss_keys_f.write(b"".join(keys))
+        miss_vectors_f.write(np.ascontiguousarray(vectors, dtype="float32").tobytes())
+
+    if indexing_cfg.embedding_cache_dir:
+        # workers share the on-disk cache for lookups only (concurrent
+        # writers would race on slot allocation); their misses go to the
+        # shard files and the parent adds them after the merge
+        embedder = CachedEmbedder(
+            embedder,
+            EmbeddingCache(
+                indexing_cfg.embedding_cache_dir,
+                model_name=indexing_cfg.embedding_model,
+                max_entries=indexing_cfg.embedding_cache_max_entries,
+                read_only=True,
+            ),
+            on_miss=record_misses,
+        )
+    batcher = ChunkBatcher(
+        batch_size=indexing_cfg.embed_batch_size,
+        token_budget=indexing_cfg.embed_token_budget,
+    )
+
+    # everything is appended to the shard files batch by batch, so a
+    # worker holds one embedding batch at a time whatever its shard size
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    vectors_f = open(shard_dir / "vectors.f32", "wb")
+    keys_f = open(shard_dir / "keys.i64", "wb")
+    meta_f = open(shard_dir / "meta.pkl", "wb")
+    texts_f = open(shard_dir / "texts.pkl", "wb") if indexing_cfg.keyword_index else None
+    if indexing_cfg.embedding_cache_dir:
+        miss_keys_f = open(shard_dir / "cache_keys.u8", "wb")
+        miss_vectors_f = open(shard_dir / "cache_vectors.f32", "wb")
+    count, dim = 0, None
+
+    def embed(texts, metadatas):
+        nonlocal count, dim
+        vectors = embedder.embed(
+            texts,
+            batch_size=indexing_cfg.embed_batch_size,
+            show_progress_bar=False,
+        )
+        vectors_f.write(np.ascontiguousarray(vectors, dtype="float32").tobytes())
+        pickle.dump(list(metadatas), meta_f)
+        if texts_f is not None:
+            pickle.dump(list(texts), texts_f)
+        count += len(metadatas)
+        dim = vectors.shape[1]
+
+    stream = preprocess.loader.stream_samples(
+        split=preprocess_cfg.split,
+        max_samples=preprocess_cfg.max_samples,
+    )
+
+    try:
+        for idx, raw in enumerate(stream):
+            if shard_of(idx, raw, num_workers, indexing_cfg.shard_by) != worker_id:
+                continue
+
+            sample = preprocess.formatter.format_sample(raw)
+            chunks = chunker.chunk_text(sample["text"], metadata=sample.get("metadata"))
+
+            # dedup only sees this worker's shard, so duplicates assigned to
+            # different workers are both kept
+            dedup = preprocess.dedup
+            if dedup is not None and dedup.seen(dedup.fingerprint(sample["text"])):
+                dedup.record_dropped_chunks(len(chunks))
+                continue
+
+            # (sample position, chunk position) is the single-process insertion order
+            keys_f.write(
+                np.array([(idx, pos) for pos in range(len(chunks))], dtype=np.int64).tobytes()
+            )
+
+            for texts, metadatas in batcher.add(chunks):
+                embed(texts, metadatas)
+
+        tail = batcher.flush()
+        if tail is not None:
+            embed(*tail)
+    finally:
+        for f in (vectors_f, keys_f, meta_f, texts_f, miss_keys_f, miss_vectors_f):
+            if f is not None:
+                f.close()
+
+    with open(shard_dir / SHARD_FILE, "w") as f:
+        json.dump({"count": count, "dim": dim}, f)
+
+    logger.info(f"Shard {worker_id}/{num_workers} built | chunks={count}")
+    if preprocess.dedup is not None:
+        logger.info(f"Shard {worker_id} dedup report | {preprocess.dedup.report()}")
+    return registry.drain()
+
+
+def _batches(path: Path) -> Iterator[Any]:
+    # the pickled lists build_shard appended, flattened back into rows
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield from pickle.load(f)
+            except EOFError:
+                return
+
+
+def merge_shards(
+    shard_dirs: List[Path], indexing_cfg: IndexingConfig
+) -> Optional[FaissStore]:
+    """
+    Combine shard outputs into one store. Rows are re-ordered by their
+    global (sample, chunk) key, so IDs match a single-process build.
+    Each shard is already in key order, so its vectors (memory-mapped),
+    metadata and texts are read front to back, MERGE_CHUNK rows at a
+    time; only the keys and the merge order (24 bytes per chunk) are
+    held in full, and a segmented store stays within its memory budget.
+    """
+    shards = []
+    for shard_dir in shard_dirs:
+        with open(shard_dir / SHARD_FILE, "r") as f:
+            info = json.load(f)
+        if not info["count"]:
+            continue
+        shards.append((shard_dir, info))
+
+    if not shards:
+        return None
+
+    dim = shards[0][1]["dim"]
+    all_keys, all_vectors, all_meta, all_texts = [], [], [], []
+    for shard_dir, info in shards:
+        all_keys.append(np.fromfile(shard_dir / "keys.i64", dtype=np.int64).reshape(-1, 2))
+        all_vectors.append(
+            np.memmap(shard_dir / "vectors.f32", dtype="float32", mode="r", shape=(info["count"], dim))
+        )
+        all_meta.append(_batches(shard_dir / "meta.pkl"))
+        if indexing_cfg.keyword_index:
+            all_texts.append(_batches(shard_dir / "texts.pkl"))
+
+    keys = np.concatenate(all_keys)
+    del all_keys
+    order = np.lexsort((keys[:, 1], keys[:, 0]))
+    del keys
+    starts = np.cumsum([0] + [len(v) for v in all_vectors])
+
+    store = create_store(dim, indexing_cfg)
+    for lo in range(0, len(order), MERGE_CHUNK):
+        rows = order[lo:lo + MERGE_CHUNK]
+        owner = np.searchsorted(starts, rows, side="right") - 1
+        vectors = np.empty((len(rows), dim), dtype="float32")
+        metadata: List[Any] = [None] * len(rows)
+        texts: Optional[List[Any]] = [None] * len(rows) if all_texts else None
+        for shard in np.unique(owner):
+            positions = np.flatnonzero(owner == shard)
+            # a shard's rows come out in its own (increasing) order
+            vectors[positions] = all_vectors[shard][rows[positions] - starts[shard]]
+            for pos, meta in zip(positions, islice(all_meta[shard], len(positions))):
+                metadata[pos] = meta
+            if texts is not None:
+                for pos, text in zip(positions, islice(all_texts[shard], len(positions))):
+                    texts[pos] = text
+        store.add(vectors, metadata, texts)
+
+    logger.info(f"Merged {len(shard_dirs)} shards | chunks={len(order)}")
+    return store
+
+
+def fill_embedding_cache(shard_dirs: List[Path], indexing_cfg: IndexingConfig) -> int:
+    """
+    Add the embeddings workers computed on cache misses to the on-disk
+    cache, MERGE_CHUNK at a time. Returns the number of entries added.
+    """
+    cache = EmbeddingCache(
+        indexing_cfg.embedding_cache_dir,
+        model_name=indexing_cfg.embedding_model,
+        max_entries=indexing_cfg.embedding_cache_max_entries,
+    )
+    added = 0
+    for shard_dir in shard_dirs:
+        keys_path = shard_dir / "cache_keys.u8"
+        if not keys_path.exists() or not keys_path.stat().st_size:
+            continue
+        with open(shard_dir / SHARD_FILE, "r") as f:
+            dim = json.load(f)["dim"]
+        keys = np.memmap(keys_path, dtype=np.uint8, mode="r").reshape(-1, KEY_BYTES)
+        vectors = np.memmap(
+            shard_dir / "cache_vectors.f32", dtype="float32", mode="r", shape=(len(keys), dim)
+        )
+        for lo in range(0, len(keys), MERGE_CHUNK):
+            # a worker re-encodes a repeated miss, so keys can repeat
+            rows = {keys[i].tobytes(): i for i in range(lo, min(lo + MERGE_CHUNK, len(keys)))}
+            cache.put_many(list(rows), np.asarray(vectors[list(rows.values())]))
+            added += len(rows)
+    cache.save()
+    logger.info(f"Added {added} worker embeddings to the cache | {cache.stats()}")
+    return added
+
+
+class ShardedIndexer:
+    """
+    Splits the input stream N ways and builds one partial store per worker
+    process, then merges the shards into a single store with stable IDs.
+    """
+
+    def __init__(self, preprocess_cfg: PreprocessConfig, indexing_cfg: IndexingConfig):
+        self.preprocess_cfg = preprocess_cfg
+        self.indexing_cfg = indexing_cfg
+        self.shards_dir = indexing_cfg.vector_store_dir / "shards"
+
+    def run(self) -> Optional[FaissStore]:
+        num_workers = self.indexing_cfg.num_workers
+        logger.info(
+            f"Sharded indexing | workers={num_workers}, shard_by={self.indexing_cfg.shard_by}"
+        )
+        if self.preprocess_cfg.dedup:
+            logger.warning("Dedup runs per shard; duplicates split across workers are kept")
+
+        shard_dirs = [self.shards_dir / f"shard_{i:03d}" for i in range(num_workers)]
+
+        with ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=mp.get_context("spawn"),
+        ) as pool:
+            futures = [
+                pool.submit(
+                    build_shard,
+                    self.preprocess_cfg,
+                    self.indexing_cfg,
+                    worker_id,
+                    shard_dir,
+                )
+                for worker_id, shard_dir in enumerate(shard_dirs)
+            ]
+            for future in futures:
+                registry.merge(future.result())
+
+        store = merge_shards(shard_dirs, self.indexing_cfg)
+        if self.indexing_cfg.embedding_cache_dir:
+            fill_embedding_cache(shard_dirs, self.indexing_cfg)
+        shutil.rmtree(self.shards_dir, ignore_errors=True)
+        return store
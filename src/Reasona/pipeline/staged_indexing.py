@@ -0,0 +1,321 @@
+import queue
+import threading
+import time
+import multiprocessing as mp
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from Reasona.utils.logger import setup_logger
+from Reasona.utils.metrics import registry
+from Reasona.pipeline.preprocess_pipeline import PreprocessPipeline
+from Reasona.data.formatter import DataFormatter
+from Reasona.data.chunker import TextChunker
+from Reasona.data.dedup import StreamDeduplicator
+from Reasona.data.batcher import ChunkBatcher
+from Reasona.vectorstore.faiss_store import FaissStore
+from Reasona.vectorstore.segmented_store import create_store
+from Reasona.entities.config_entity import PreprocessConfig, IndexingConfig
+
+logger = setup_logger(__name__, "logs/pipeline/staged_indexing.json")
+
+_END = object()
+
+
+@dataclass
+class StageStats:
+    name: str
+    items: int = 0
+    busy_s: float = 0.0
+    idle_s: float = 0.0            # blocked on an empty input or a full output queue
+    queue_depth_max: int = 0
+    _depth_total: int = 0
+    _depth_samples: int = 0
+
+    def observe(self, q: "queue.Queue") -> None:
+        depth = q.qsize()
+        self.queue_depth_max = max(self.queue_depth_max, depth)
+        self._depth_total += depth
+        self._depth_samples += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        report = {k: v for k, v in asdict(self).items() if not k.startswith("_")}
+        report["queue_depth_avg"] = (
+            self._depth_total / self._depth_samples if self._depth_samples else 0.0
+        )
+        report["busy_s"] = round(self.busy_s, 3)
+        report["idle_s"] = round(self.idle_s, 3)
+        return report
+
+
+# ----------------------------------------------------------------------
+# Process-pool worker (format + fingerprint + chunk)
+# ----------------------------------------------------------------------
+_worker_formatter: Optional[DataFormatter] = None
+_worker_chunker: Optional[TextChunker] = None
+_worker_dedup: Optional[StreamDeduplicator] = None
+
+
+def _init_worker(preprocess_cfg: PreprocessConfig, indexing_cfg: IndexingConfig) -> None:
+    global _worker_formatter, _worker_chunker, _worker_dedup
+    _worker_formatter = DataFormatter(preprocess_cfg.schema_path)
+    _worker_chunker = TextChunker.from_config(indexing_cfg)
+    if preprocess_cfg.dedup:
+        _worker_dedup = StreamDeduplicator.from_config(preprocess_cfg)
+
+
+def _format_and_chunk(
+    raw_samples: List[Dict[str, Any]],
+) -> Tuple[List[Tuple[Any, List[Dict]]], Dict[str, Dict[str, Any]]]:
+    """
+    Per sample: (MinHash fingerprint or None, chunks), plus the metrics
+    recorded since the previous call. Duplicates are decided in stream
+    order by the chunk thread.
+    """
+    batch = _worker_formatter.format_batch(raw_samples)
+    fingerprints = (
+        [_worker_dedup.fingerprint(t) for t in batch["text"]]
+        if _worker_dedup is not None
+        else [None] * len(batch["text"])
+    )
+    samples = list(zip(fingerprints, _worker_chunker.chunk_many(batch["text"], batch["metadata"])))
+    return samples, registry.drain()
+
+
+class StagedIndexer:
+    """
+    Overlapped producer/consumer indexing.
+
+    fetch (thread) -> format+chunk (process pool) -> embed (thread) -> insert (caller)
+
+    Stages are connected by bounded queues, so a slow consumer applies
+    backpressure upstream instead of buffering the whole stream.
+    """
+
+    def __init__(
+        self,
+        preprocess_cfg: PreprocessConfig,
+        indexing_cfg: IndexingConfig,
+        embedder,
+    ):
+        self.preprocess_cfg = preprocess_cfg
+        self.indexing_cfg = indexing_cfg
+        self.embedder = embedder
+
+        size = indexing_cfg.queue_size
+        self.raw_q: "queue.Queue" = queue.Queue(maxsize=size)
+        self.chunk_q: "queue.Queue" = queue.Queue(maxsize=size)
+        self.vector_q: "queue.Queue" = queue.Queue(maxsize=size)
+
+        self.stats = {
+            name: StageStats(name) for name in ("fetch", "chunk", "embed", "insert")
+        }
+
+        self.dedup = (
+            StreamDeduplicator.from_config(preprocess_cfg) if preprocess_cfg.dedup else None
+        )
+
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    # ------------------------------------------------------------------
+    # Queue helpers (stop-aware so a failing stage never deadlocks others)
+    # ------------------------------------------------------------------
+    def _put(self, q: "queue.Queue", item, stats: StageStats) -> None:
+        t0 = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        waited = time.perf_counter() - t0
+        stats.idle_s += waited
+        registry.histogram(f"staged_{stats.name}.put_wait_ms").observe(waited * 1000.0)
+
+    def _get(self, q: "queue.Queue", stats: StageStats):
+        stats.observe(q)
+        t0 = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                item = q.get(timeout=0.1)
+                break
+            except queue.Empty:
+                continue
+        else:
+            item = _END
+        waited = time.perf_counter() - t0
+        stats.idle_s += waited
+        registry.histogram(f"staged_{stats.name}.get_wait_ms").observe(waited * 1000.0)
+        registry.gauge(f"staged_{stats.name}.queue_depth").set(q.qsize())
+        return item
+
+    def _fail(self, exc: BaseException) -> None:
+        if self._error is None:
+            self._error = exc
+        self._stop.set()
+
+    # ------------------------------------------------------------------
+    # Stages
+    # ------------------------------------------------------------------
+    def _fetch(self) -> None:
+        stats = self.stats["fetch"]
+        batch_size = self.indexing_cfg.stage_batch_size
+        try:
+            loader = PreprocessPipeline.build_loader(self.preprocess_cfg)
+            stream = loader.stream_samples(
+                split=self.preprocess_cfg.split,
+                max_samples=self.preprocess_cfg.max_samples,
+            )
+
+            batch = []
+            t0 = time.perf_counter()
+            for raw in stream:
+                batch.append(raw)
+                if len(batch) >= batch_size:
+                    stats.busy_s += time.perf_counter() - t0
+                    stats.items += len(batch)
+                    self._put(self.raw_q, batch, stats)
+                    batch = []
+                    t0 = time.perf_counter()
+                if self._stop.is_set():
+                    return
+
+            if batch:
+                stats.items += len(batch)
+                self._put(self.raw_q, batch, stats)
+        except BaseException as exc:
+            self._fail(exc)
+        finally:
+            self._put(self.raw_q, _END, stats)
+
+    def _chunk(self) -> None:
+        stats = self.stats["chunk"]
+        workers = self.indexing_cfg.num_chunk_workers
+        try:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=mp.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.preprocess_cfg, self.indexing_cfg),
+            ) as pool:
+                pending: deque = deque()
+
+                def drain_one():
+                    t0 = time.perf_counter()
+                    chunks = []
+                    samples, metrics = pending.popleft().result()
+                    registry.merge(metrics)
+                    for fingerprint, sample_chunks in samples:
+                        if self.dedup is not None and self.dedup.seen(fingerprint):
+                            self.dedup.record_dropped_chunks(len(sample_chunks))
+                        else:
+                            chunks.extend(sample_chunks)
+                    stats.busy_s += time.perf_counter() - t0
+                    stats.items += len(chunks)
+                    self._put(self.chunk_q, chunks, stats)
+
+                while True:
+                    raw_batch = self._get(self.raw_q, stats)
+                    if raw_batch is _END:
+                        break
+                    pending.append(pool.submit(_format_and_chunk, raw_batch))
+                    # keep every worker busy while preserving stream order
+                    if len(pending) >= workers * 2:
+                        drain_one()
+
+                while pending and not self._stop.is_set():
+                    drain_one()
+        except BaseException as exc:
+            self._fail(exc)
+        finally:
+            self._put(self.chunk_q, _END, stats)
+
+    def _embed(self) -> None:
+        stats = self.stats["embed"]
+        batcher = ChunkBatcher(
+            batch_size=self.indexing_cfg.embed_batch_size,
+            token_budget=self.indexing_cfg.embed_token_budget,
+        )
+
+        def encode(texts, metadatas):
+            t0 = time.perf_counter()
+            vectors = self.embedder.embed(
+                texts,
+                batch_size=self.indexing_cfg.embed_batch_size,
+                show_progress_bar=False,
+            )
+            stats.busy_s += time.perf_counter() - t0
+            stats.items += len(texts)
+            self._put(self.vector_q, (vectors, metadatas, texts), stats)
+
+        try:
+            while True:
+                chunks = self._get(self.chunk_q, stats)
+                if chunks is _END:
+                    break
+                for texts, metadatas in batcher.add(chunks):
+                    encode(texts, metadatas)
+
+            tail = batcher.flush()
+            if tail is not None and not self._stop.is_set():
+                encode(*tail)
+        except BaseException as exc:
+            self._fail(exc)
+        finally:
+            self._put(self.vector_q, _END, stats)
+
+    # ------------------------------------------------------------------
+    # Driver
+    # ------------------------------------------------------------------
+    def run(self) -> Optional[FaissStore]:
+        logger.info(
+            f"Staged indexing | queue_size={self.indexing_cfg.queue_size}, "
+            f"chunk_workers={self.indexing_cfg.num_chunk_workers}"
+        )
+
+        threads = [
+            threading.Thread(target=self._fetch, name="fetch", daemon=True),
+            threading.Thread(target=self._chunk, name="chunk", daemon=True),
+            threading.Thread(target=self._embed, name="embed", daemon=True),
+        ]
+        for t in threads:
+            t.start()
+
+        stats = self.stats["insert"]
+        store: Optional[FaissStore] = None
+        try:
+            while True:
+                item = self._get(self.vector_q, stats)
+                if item is _END:
+                    break
+                vectors, metadatas, texts = item
+
+                t0 = time.perf_counter()
+                if store is None:
+                    store = create_store(vectors.shape[1], self.indexing_cfg)
+                store.add(vectors, metadatas, texts)
+                stats.busy_s += time.perf_counter() - t0
+                stats.items += len(metadatas)
+        except BaseException as exc:
+            self._fail(exc)
+        finally:
+            for t in threads:
+                t.join()
+
+        self.log_report()
+
+        if self._error is not None:
+            raise self._error
+
+        return store
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        return {name: s.as_dict() for name, s in self.stats.items()}
+
+    def log_report(self) -> None:
+        for name, stage in self.report().items():
+            logger.info(f"Stage report | {name}: {stage}")
+        if self.dedup is not None:
+            logger.info(f"Dedup report | {self.dedup.report()}")
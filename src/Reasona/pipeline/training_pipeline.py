@@ -1,48 +1,65 @@
+import json
 import os
-import joblib
-import pandas as pd
+from dataclasses import asdict
 from Reasona.utils.logger import setup_logger
 from Reasona.config.config_manager import ConfigurationManager
+from Reasona.training.token_cache import TokenCache, TokenizedDataset
 
 logger = setup_logger("training_pipeline", "logs/pipeline/training_pipeline.json")
 
 class TrainingPipeline:
     def __init__(self):
         logger.info("Initializing TrainingPipeline()")
-        cfg = ConfigurationManager()
-        self.train_cfg = cfg.get_training_config()
+        self.cfg = ConfigurationManager()
+        self.train_cfg = self.cfg.get_training_config()
+        self.lora_cfg = self.cfg.get_lora_config()
 
     def load_data(self):
-        logger.info("Loading transformed dataset...")
+        """
+        Tokenized dataset from the token cache, building it on first use
+        from the transformed JSONL or, without one, the preprocess stream.
+        """
+        logger.info("Loading tokenized dataset...")
+        cache = TokenCache.from_config(self.train_cfg)
 
-        data_path = self.train_cfg.transformed_data_path
-        if not os.path.exists(data_path):
-            logger.error(f"Transformed dataset not found: {data_path}")
-            return None
+        data_path = self.train_cfg.dataset_path
+        if os.path.exists(data_path):
+            cache_path = cache.build_from_jsonl(data_path)
+        else:
+            from Reasona.pipeline.preprocess_pipeline import PreprocessPipeline
 
-        df = pd.read_json(data_path, lines=True)
-        logger.info(f"Loaded dataset with {len(df)} rows")
-        return df
+            preprocess_cfg = self.cfg.get_preprocess_config()
+            logger.info(f"Transformed dataset not found: {data_path}; tokenizing the preprocess stream")
+            source = "stream:" + json.dumps(asdict(preprocess_cfg), default=str, sort_keys=True)
+            cache_path = cache.build(PreprocessPipeline(preprocess_cfg).stream(), source)
 
-    def train_model(self, df):
-        logger.info("Training model (placeholder)...")
-        model = {"model": "dummy", "status": "ok"}
+        dataset = TokenizedDataset(cache_path)
+        logger.info(f"Loaded dataset with {len(dataset)} examples, {dataset.meta['tokens']} tokens")
+        return dataset
+
+    def train_model(self, dataset):
+        from Reasona.training.train_lora import train_lora
+
+        logger.info("Training LoRA adapter...")
+        model, self.summary = train_lora(dataset, self.train_cfg, self.lora_cfg)
         return model
 
     def save_model(self, model):
+        from Reasona.training.train_lora import save_adapter
+
         logger.info("Saving model...")
-        os.makedirs(self.train_cfg.output_dir, exist_ok=True)
-        model_path = os.path.join(self.train_cfg.output_dir, "model.pkl")
-        joblib.dump(model, model_path)
-        logger.info(f"Model saved to: {model_path}")
+        adapter_dir = save_adapter(model, self.train_cfg.output_dir)
+        with open(os.path.join(self.train_cfg.output_dir, "training_summary.json"), "w") as f:
+            json.dump(self.summary, f, indent=2)
+        logger.info(f"Model saved to: {adapter_dir}")
 
     def run(self):
         logger.info("=== TRAINING PIPELINE STARTED ===")
-        df = self.load_data()
-        if df is None:
-            logger.error("Stopping training: no dataset found.")
+        dataset = self.load_data()
+        if not len(dataset):
+            logger.error("Stopping training: dataset is empty.")
             return
-        model = self.train_model(df)
+        model = self.train_model(dataset)
         self.save_model(model)
         logger.info("=== TRAINING PIPELINE FINISHED ===")
 
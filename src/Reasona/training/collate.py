@@ -0,0 +1,269 @@
+"""
+Batching for causal-LM fine-tuning on variable-length examples.
+
+Two ways to keep pad tokens out of the compute:
+- LengthBucketSampler + PaddedCollator: batches of similar length, padded
+  to the longest example in the batch.
+- pack_examples + PackedCollator: several examples per fixed-length row.
+  Position IDs restart at every example, attention is block-diagonal
+  causal (examples never attend to each other) and the first token of
+  each example gets no label, so nothing is predicted across a boundary.
+
+Examples are dicts with `input_ids` (1-D int array) and `prompt_length`,
+as returned by TokenizedDataset. Collators return numpy arrays; the
+trainer moves them to tensors. Labels use IGNORE_INDEX for prompt and
+padding positions.
+"""
+import bisect
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+IGNORE_INDEX = -100
+
+
+class BatchStats:
+    """
+    Running totals of real vs. padded token slots.
+    """
+
+    def __init__(self):
+        self.batches = 0
+        self.tokens = 0          # real tokens
+        self.slots = 0           # tokens incl. padding
+        self.label_tokens = 0    # tokens that contribute to the loss
+
+    def add(self, tokens: int, slots: int, label_tokens: int) -> None:
+        self.batches += 1
+        self.tokens += tokens
+        self.slots += slots
+        self.label_tokens += label_tokens
+
+    @property
+    def padding_ratio(self) -> float:
+        return 1.0 - self.tokens / self.slots if self.slots else 0.0
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "tokens": self.tokens,
+            "slots": self.slots,
+            "label_tokens": self.label_tokens,
+            "padding_ratio": round(self.padding_ratio, 4),
+        }
+
+
+def _labels(ids: np.ndarray, prompt_length: int, mask_prompt: bool) -> np.ndarray:
+    labels = ids.astype(np.int64, copy=True)
+    # the first token is never a target: in a packed row it would be
+    # predicted from the previous example
+    labels[: max(1, prompt_length if mask_prompt else 0)] = IGNORE_INDEX
+    return labels
+
+
+# ----------------------------------------------------------------------
+# Length-bucketed padding
+# ----------------------------------------------------------------------
+class LengthBucketSampler:
+    """
+    Yields batches of indices whose lengths are close: indices are
+    shuffled, cut into pools of `batch_size * bucket_multiplier`, each
+    pool is sorted by length and split into batches, and the batch order
+    is shuffled again so long and short batches interleave.
+    """
+
+    def __init__(
+        self,
+        lengths: Sequence[int],
+        batch_size: int,
+        bucket_multiplier: int = 50,
+        shuffle: bool = True,
+        drop_last: bool = False,
+        seed: int = 0,
+    ):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.pool_size = batch_size * bucket_multiplier
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int) -> None:
+        self.epoch = epoch
+
+    def __len__(self) -> int:
+        n = len(self.lengths)
+        return n // self.batch_size if self.drop_last else -(-n // self.batch_size)
+
+    def __iter__(self) -> Iterator[List[int]]:
+        rng = np.random.default_rng((self.seed, self.epoch))
+        order = rng.permutation(len(self.lengths)) if self.shuffle else np.arange(len(self.lengths))
+
+        batches = []
+        for start in range(0, len(order), self.pool_size):
+            pool = order[start:start + self.pool_size]
+            pool = pool[np.argsort(self.lengths[pool], kind="stable")]
+            for b in range(0, len(pool), self.batch_size):
+                batches.append(pool[b:b + self.batch_size])
+
+        if self.drop_last:
+            batches = [b for b in batches if len(b) == self.batch_size]
+        if self.shuffle:
+            batches = [batches[i] for i in rng.permutation(len(batches))]
+        for batch in batches:
+            yield batch.tolist()
+
+
+class PaddedCollator:
+    """
+    Right-pads a batch to its longest example (rounded up to
+    `pad_to_multiple_of`).
+    """
+
+    def __init__(
+        self,
+        pad_token_id: int,
+        mask_prompt: bool = True,
+        pad_to_multiple_of: Optional[int] = None,
+        stats: Optional[BatchStats] = None,
+    ):
+        self.pad_token_id = pad_token_id
+        self.mask_prompt = mask_prompt
+        self.pad_to_multiple_of = pad_to_multiple_of
+        self.stats = stats or BatchStats()
+
+    def __call__(self, examples: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+        width = max(len(e["input_ids"]) for e in examples)
+        if self.pad_to_multiple_of:
+            width = -(-width // self.pad_to_multiple_of) * self.pad_to_multiple_of
+
+        input_ids = np.full((len(examples), width), self.pad_token_id, dtype=np.int64)
+        labels = np.full((len(examples), width), IGNORE_INDEX, dtype=np.int64)
+        attention_mask = np.zeros((len(examples), width), dtype=np.int64)
+
+        for row, example in enumerate(examples):
+            ids = np.asarray(example["input_ids"])
+            input_ids[row, : len(ids)] = ids
+            labels[row, : len(ids)] = _labels(ids, example["prompt_length"], self.mask_prompt)
+            attention_mask[row, : len(ids)] = 1
+
+        self.stats.add(
+            int(attention_mask.sum()), input_ids.size, int((labels != IGNORE_INDEX).sum())
+        )
+        return {"input_ids": input_ids, "attention_mask": attention_mask, "labels": labels}
+
+
+# ----------------------------------------------------------------------
+# Packing
+# ----------------------------------------------------------------------
+def pack_examples(
+    lengths: Sequence[int],
+    seq_length: int,
+    window: int = 2000,
+    shuffle: bool = True,
+    seed: int = 0,
+) -> List[List[int]]:
+    """
+    Group example indices into rows of at most `seq_length` tokens.
+
+    Best-fit decreasing within windows of `window` (shuffled) examples:
+    each example, longest first, goes into the open row with the least
+    room that still fits it. Longer examples are truncated to
+    `seq_length` by the collator and fill a row on their own.
+    """
+    lengths = np.minimum(np.asarray(lengths), seq_length)
+    order = np.random.default_rng(seed).permutation(len(lengths)) if shuffle else np.arange(len(lengths))
+
+    rows: List[List[int]] = []
+    for start in range(0, len(order), window):
+        chunk = order[start:start + window]
+        chunk = chunk[np.argsort(-lengths[chunk], kind="stable")]
+
+        # open rows sorted by remaining room: (room, row number)
+        room: List[tuple] = []
+        for idx in chunk.tolist():
+            need = int(lengths[idx])
+            pos = bisect.bisect_left(room, (need, -1))
+            if pos < len(room):
+                left, row = room.pop(pos)
+                rows[row].append(idx)
+                left -= need
+            else:
+                rows.append([idx])
+                row, left = len(rows) - 1, seq_length - need
+            if left > 0:
+                bisect.insort(room, (left, row))
+
+    if shuffle:
+        rows = [rows[i] for i in np.random.default_rng(seed + 1).permutation(len(rows))]
+    return rows
+
+
+class PackedCollator:
+    """
+    Lays each row's examples end to end in a `seq_length` row.
+
+    Besides input_ids / labels / attention_mask (1 on real tokens) it
+    returns `position_ids`, restarting at 0 for every example, and
+    `segment_ids` (example number within the row, -1 on padding), from
+    which `block_causal_mask` builds the 4-D attention mask.
+    """
+
+    def __init__(
+        self,
+        pad_token_id: int,
+        seq_length: int,
+        mask_prompt: bool = True,
+        stats: Optional[BatchStats] = None,
+    ):
+        self.pad_token_id = pad_token_id
+        self.seq_length = seq_length
+        self.mask_prompt = mask_prompt
+        self.stats = stats or BatchStats()
+
+    def __call__(self, rows: List[List[Dict[str, Any]]]) -> Dict[str, np.ndarray]:
+        shape = (len(rows), self.seq_length)
+        input_ids = np.full(shape, self.pad_token_id, dtype=np.int64)
+        labels = np.full(shape, IGNORE_INDEX, dtype=np.int64)
+        position_ids = np.zeros(shape, dtype=np.int64)
+        segment_ids = np.full(shape, -1, dtype=np.int64)
+
+        for r, examples in enumerate(rows):
+            offset = 0
+            for segment, example in enumerate(examples):
+                ids = np.asarray(example["input_ids"])[: self.seq_length - offset]
+                end = offset + len(ids)
+                input_ids[r, offset:end] = ids
+                labels[r, offset:end] = _labels(ids, example["prompt_length"], self.mask_prompt)
+                position_ids[r, offset:end] = np.arange(len(ids))
+                segment_ids[r, offset:end] = segment
+                offset = end
+                if offset >= self.seq_length:
+                    break
+
+        attention_mask = (segment_ids >= 0).astype(np.int64)
+        self.stats.add(
+            int(attention_mask.sum()), input_ids.size, int((labels != IGNORE_INDEX).sum())
+        )
+        return {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "labels": labels,
+            "position_ids": position_ids,
+            "segment_ids": segment_ids,
+        }
+
+
+def block_causal_mask(segment_ids: np.ndarray) -> np.ndarray:
+    """
+    (batch, 1, seq, seq) boolean mask: query i may attend key j iff both
+    are in the same example and j <= i. Padding rows attend to
+    themselves only, so softmax never sees an empty row.
+    """
+    seq = segment_ids.shape[1]
+    same = segment_ids[:, :, None] == segment_ids[:, None, :]
+    causal = np.tril(np.ones((seq, seq), dtype=bool))
+    mask = same & causal & (segment_ids[:, None, :] >= 0)
+    mask |= np.eye(seq, dtype=bool)
+    return mask[:, None, :, :]
@@ -0,0 +1,267 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from Reasona.model.registry import tokenizer as load_tokenizer
+from Reasona.utils.logger import setup_logger
+from Reasona.utils.metrics import registry
+
+logger = setup_logger(__name__, "logs/training/token_cache.json")
+
+META_FILE = "meta.json"
+INDEX_FILE = "index.npy"
+
+# index.npy columns, one row per example
+SHARD, START, LENGTH, PROMPT_LENGTH = range(4)
+
+# bump when the on-disk layout or the prompt/completion split changes
+CACHE_VERSION = 1
+
+
+def split_example(record: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    (prompt, completion) of a formatted sample: instruction + input,
+    then reasoning + output.
+    """
+    prompt = "\n".join(v for v in (record.get("instruction"), record.get("input")) if v)
+    completion = "\n".join(v for v in (record.get("reasoning"), record.get("output")) if v)
+    return prompt, completion
+
+
+def read_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class TokenCache:
+    """
+    Tokenized training data, built once per (tokenizer, settings, source).
+
+    Each example is prompt tokens + completion tokens + EOS, truncated to
+    `max_seq_length`. Token IDs are appended to raw `tokens-<n>.bin`
+    shards (uint16 when the vocabulary fits, else uint32) of about
+    `shard_tokens` tokens; `index.npy` holds (shard, start, length,
+    prompt_length) per example.
+
+    The cache directory name hashes the tokenizer, the settings and the
+    source, and is only moved into place once complete, so a rerun with
+    the same inputs skips tokenization and an interrupted build leaves
+    nothing behind that could be mistaken for a finished one.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        tokenizer_name: str,
+        max_seq_length: int = 2048,
+        batch_size: int = 1000,
+        shard_tokens: int = 50_000_000,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.tokenizer_name = tokenizer_name
+        self.max_seq_length = max_seq_length
+        self.batch_size = batch_size
+        self.shard_tokens = shard_tokens
+
+    @classmethod
+    def from_config(cls, cfg) -> "TokenCache":
+        return cls(
+            cache_dir=cfg.token_cache_dir,
+            tokenizer_name=cfg.base_model,
+            max_seq_length=cfg.max_seq_length,
+            batch_size=cfg.tokenize_batch_size,
+            shard_tokens=cfg.shard_tokens,
+        )
+
+    @property
+    def tokenizer(self):
+        return load_tokenizer(self.tokenizer_name)
+
+    def _settings(self, source: str) -> Dict[str, Any]:
+        tok = self.tokenizer
+        return {
+            "version": CACHE_VERSION,
+            "tokenizer": self.tokenizer_name,
+            "tokenizer_class": type(tok).__name__,
+            "vocab_size": len(tok),
+            "eos_token_id": tok.eos_token_id,
+            "max_seq_length": self.max_seq_length,
+            "source": source,
+        }
+
+    def path_for(self, source: str) -> Path:
+        settings = json.dumps(self._settings(source), sort_keys=True)
+        key = hashlib.blake2b(settings.encode("utf-8"), digest_size=8).hexdigest()
+        return self.cache_dir / key
+
+    # ------------------------------------------------------------------
+    # Build
+    # ------------------------------------------------------------------
+    def build_from_jsonl(self, path: Path) -> Path:
+        """
+        The source is keyed on path, size and mtime, so an edited dataset
+        gets a fresh cache.
+        """
+        path = Path(path)
+        stat = path.stat()
+        source = f"{path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+        return self.build(read_jsonl(path), source)
+
+    def build(self, records: Iterable[Dict[str, Any]], source: str) -> Path:
+        """
+        Tokenize `records` into the cache for `source` unless it already
+        exists. Returns the cache directory.
+        """
+        final = self.path_for(source)
+        if (final / META_FILE).exists():
+            logger.info(f"Token cache hit | dir={final}")
+            registry.counter("token_cache.hits").inc()
+            return final
+
+        registry.counter("token_cache.misses").inc()
+        tmp = final.with_name(f"{final.name}.tmp-{os.getpid()}")
+        if tmp.exists():
+            shutil.rmtree(tmp)
+        tmp.mkdir(parents=True)
+
+        dtype = np.uint16 if len(self.tokenizer) <= np.iinfo(np.uint16).max + 1 else np.uint32
+        writer = _ShardWriter(tmp, dtype, self.shard_tokens)
+        rows: List[Tuple[int, int, int, int]] = []
+
+        batch: List[Dict[str, Any]] = []
+        try:
+            for record in records:
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    rows.extend(self._write_batch(batch, writer))
+                    batch = []
+            if batch:
+                rows.extend(self._write_batch(batch, writer))
+        finally:
+            writer.close()
+
+        index = np.asarray(rows, dtype=np.int64).reshape(-1, 4)
+        np.save(tmp / INDEX_FILE, index)
+
+        meta = {
+            **self._settings(source),
+            "dtype": np.dtype(dtype).name,
+            "shards": writer.shard_names,
+            "examples": len(index),
+            "tokens": int(index[:, LENGTH].sum()),
+        }
+        with open(tmp / META_FILE, "w") as f:
+            json.dump(meta, f, indent=2)
+
+        if final.exists():
+            # another process finished the same cache first
+            shutil.rmtree(tmp)
+        else:
+            os.replace(tmp, final)
+
+        logger.info(
+            f"Built token cache | dir={final}, examples={meta['examples']}, "
+            f"tokens={meta['tokens']}, shards={len(meta['shards'])}"
+        )
+        return final
+
+    def _write_batch(self, batch: List[Dict[str, Any]], writer: "_ShardWriter"):
+        prompts, completions = zip(*(split_example(r) for r in batch))
+        tok = self.tokenizer
+
+        with registry.timer("token_cache.tokenize_ms"):
+            kwargs = dict(return_attention_mask=False, return_token_type_ids=False, verbose=False)
+            prompt_ids = tok(list(prompts), add_special_tokens=True, **kwargs)["input_ids"]
+            completion_ids = tok(list(completions), add_special_tokens=False, **kwargs)["input_ids"]
+
+        eos = [tok.eos_token_id] if tok.eos_token_id is not None else []
+        rows = []
+        for p_ids, c_ids in zip(prompt_ids, completion_ids):
+            ids = (p_ids + c_ids + eos)[: self.max_seq_length]
+            shard, start = writer.write(ids)
+            rows.append((shard, start, len(ids), min(len(p_ids), len(ids))))
+
+        registry.counter("token_cache.examples").inc(len(rows))
+        registry.counter("token_cache.tokens").inc(sum(r[LENGTH] for r in rows))
+        return rows
+
+
+class _ShardWriter:
+    """
+    Appends token IDs to raw shard files, starting a new shard once the
+    current one holds `shard_tokens`. Examples never span shards.
+    """
+
+    def __init__(self, directory: Path, dtype, shard_tokens: int):
+        self.directory = directory
+        self.dtype = dtype
+        self.shard_tokens = shard_tokens
+        self.shard_names: List[str] = []
+        self._file = None
+        self._written = 0
+
+    def _open_next(self) -> None:
+        self.close()
+        name = f"tokens-{len(self.shard_names):05d}.bin"
+        self.shard_names.append(name)
+        self._file = open(self.directory / name, "wb")
+        self._written = 0
+
+    def write(self, ids: List[int]) -> Tuple[int, int]:
+        if self._file is None or self._written >= self.shard_tokens:
+            self._open_next()
+        start = self._written
+        self._file.write(np.asarray(ids, dtype=self.dtype).tobytes())
+        self._written += len(ids)
+        return len(self.shard_names) - 1, start
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class TokenizedDataset:
+    """
+    Read-only view over a built TokenCache; shards and index are
+    memory-mapped, so `dataset[i]` is O(1) and nothing is read up front.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path / META_FILE, "r") as f:
+            self.meta = json.load(f)
+
+        dtype = np.dtype(self.meta["dtype"])
+        self.index = np.load(self.path / INDEX_FILE, mmap_mode="r")
+        self.shards = [
+            np.memmap(self.path / name, dtype=dtype, mode="r")
+            if (self.path / name).stat().st_size
+            else np.zeros(0, dtype=dtype)
+            for name in self.meta["shards"]
+        ]
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return self.index[:, LENGTH]
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        shard, start, length, prompt_length = self.index[i].tolist()
+        return {
+            "input_ids": self.shards[shard][start:start + length],
+            "prompt_length": prompt_length,
+        }
+
+    @property
+    def eos_token_id(self) -> Optional[int]:
+        return self.meta["eos_token_id"]
@@ -0,0 +1,168 @@
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
+import numpy as np
+
+from Reasona.entities.config_entity import LoraTrainingConfig, TrainingConfig
+from Reasona.model.registry import tokenizer as load_tokenizer
+from Reasona.training.collate import (
+    BatchStats,
+    LengthBucketSampler,
+    PackedCollator,
+    PaddedCollator,
+    block_causal_mask,
+    pack_examples,
+)
+from Reasona.training.token_cache import TokenizedDataset
+from Reasona.utils.logger import setup_logger
+from Reasona.utils.metrics import registry
+
+logger = setup_logger(__name__, "logs/training/train_lora.json")
+
+
+def iter_batches(
+    dataset: TokenizedDataset,
+    seq_length: int,
+    lora_cfg: LoraTrainingConfig,
+    pad_token_id: int,
+    stats: BatchStats,
+    epoch: int = 0,
+) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    One epoch of collated batches: packed rows of `seq_length` tokens, or
+    length-bucketed padded batches when packing is off.
+    """
+    lengths = np.minimum(np.asarray(dataset.lengths), seq_length)
+
+    if lora_cfg.packing:
+        rows = pack_examples(lengths, seq_length, seed=epoch)
+        collator = PackedCollator(pad_token_id, seq_length, stats=stats)
+        for start in range(0, len(rows), lora_cfg.batch_size):
+            yield collator(
+                [[dataset[i] for i in row] for row in rows[start:start + lora_cfg.batch_size]]
+            )
+        return
+
+    sampler = LengthBucketSampler(lengths, lora_cfg.batch_size, lora_cfg.bucket_multiplier)
+    sampler.set_epoch(epoch)
+    collator = PaddedCollator(pad_token_id, stats=stats)
+    for indices in sampler:
+        yield collator([dataset[i] for i in indices])
+
+
+def to_model_inputs(batch: Dict[str, np.ndarray], model, device) -> Dict[str, Any]:
+    """
+    Tensors for a causal LM forward pass. Packed batches (with
+    `segment_ids`) get restarting position IDs plus, unless the model
+    runs flash-attention-2 (which derives sequence boundaries from the
+    position IDs), a block-diagonal causal 4-D additive mask.
+    """
+    import torch
+
+    inputs = {
+        "input_ids": torch.from_numpy(batch["input_ids"]).to(device),
+        "labels": torch.from_numpy(batch["labels"]).to(device),
+    }
+    if "segment_ids" not in batch:
+        inputs["attention_mask"] = torch.from_numpy(batch["attention_mask"]).to(device)
+        return inputs
+
+    inputs["position_ids"] = torch.from_numpy(batch["position_ids"]).to(device)
+    if getattr(model.config, "_attn_implementation", None) != "flash_attention_2":
+        allowed = torch.from_numpy(block_causal_mask(batch["segment_ids"])).to(device)
+        dtype = next(model.parameters()).dtype
+        mask = torch.zeros(allowed.shape, dtype=dtype, device=device)
+        inputs["attention_mask"] = mask.masked_fill_(~allowed, torch.finfo(dtype).min)
+    return inputs
+
+
+def train_lora(
+    dataset: TokenizedDataset,
+    train_cfg: TrainingConfig,
+    lora_cfg: LoraTrainingConfig,
+):
+    """
+    LoRA fine-tuning of `train_cfg.base_model` on a tokenized dataset.
+    Returns (peft model, summary) where the summary carries tokens/sec
+    and the padding ratio over the whole run.
+    """
+    import torch
+    from peft import LoraConfig, get_peft_model
+    from transformers import AutoModelForCausalLM
+
+    tok = load_tokenizer(train_cfg.base_model)
+    pad_token_id = tok.pad_token_id if tok.pad_token_id is not None else tok.eos_token_id
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model = AutoModelForCausalLM.from_pretrained(train_cfg.base_model)
+    model = get_peft_model(
+        model,
+        LoraConfig(
+            r=lora_cfg.r,
+            lora_alpha=lora_cfg.alpha,
+            lora_dropout=lora_cfg.dropout,
+            target_modules=list(lora_cfg.target_modules) if lora_cfg.target_modules else None,
+            task_type="CAUSAL_LM",
+        ),
+    ).to(device)
+    model.train()
+
+    optimizer = torch.optim.AdamW(
+        (p for p in model.parameters() if p.requires_grad), lr=lora_cfg.learning_rate
+    )
+
+    seq_length = train_cfg.max_seq_length
+    stats = BatchStats()
+    step = 0
+    started = time.perf_counter()
+    window_start, window_tokens = started, 0
+
+    logger.info(
+        f"LoRA training | model={train_cfg.base_model}, examples={len(dataset)}, "
+        f"packing={lora_cfg.packing}, batch_size={lora_cfg.batch_size}, seq_length={seq_length}"
+    )
+
+    for epoch in range(lora_cfg.epochs):
+        for batch in iter_batches(dataset, seq_length, lora_cfg, pad_token_id, stats, epoch):
+            tokens = int(batch["attention_mask"].sum())
+
+            with registry.timer("training.step_ms"):
+                loss = model(**to_model_inputs(batch, model, device)).loss
+                loss.backward()
+                optimizer.step()
+                optimizer.zero_grad(set_to_none=True)
+
+            step += 1
+            window_tokens += tokens
+            registry.counter("training.tokens").inc(tokens)
+            registry.counter("training.pad_tokens").inc(batch["input_ids"].size - tokens)
+            registry.gauge("training.padding_ratio").set(round(stats.padding_ratio, 4))
+
+            if step % lora_cfg.log_every == 0:
+                now = time.perf_counter()
+                logger.info(
+                    f"step={step} epoch={epoch} loss={loss.item():.4f} "
+                    f"tokens_per_sec={window_tokens / (now - window_start):.1f} "
+                    f"padding_ratio={stats.padding_ratio:.3f}"
+                )
+                window_start, window_tokens = now, 0
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "steps": step,
+        "epochs": lora_cfg.epochs,
+        "packing": lora_cfg.packing,
+        "seconds": round(elapsed, 2),
+        "tokens_per_sec": round(stats.tokens / elapsed, 1) if elapsed else 0.0,
+        **stats.report(),
+    }
+    logger.info(f"LoRA training finished | {summary}")
+    return model, summary
+
+
+def save_adapter(model, output_dir: Path) -> Path:
+    adapter_dir = Path(output_dir) / "lora_adapter"
+    adapter_dir.mkdir(parents=True, exist_ok=True)
+    model.save_pretrained(adapter_dir)
+    return adapter_dir
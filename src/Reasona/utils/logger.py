@@ -1,27 +1,265 @@
+"""
+JSON logging behind a queue.
+
+Loggers returned by `setup_logger` only enqueue records; one listener
+thread per process formats them and writes the per-logger file plus
+stderr, so JSON serialisation and disk I/O stay off the calling thread.
+Output lines are the same as with handlers attached directly.
+
+INFO and below are rate-limited per call site (token bucket); the first
+record let through after a suppressed run carries `suppressed: <n>`.
+Warnings and errors always pass.
+
+Nothing touches the filesystem or starts a thread at import: the log
+directory and file are created on a logger's first record, and the
+listener starts with the first record of the process.
+
+The queue is drained at interpreter exit (also after an uncaught
+exception) and when a spawned multiprocessing worker exits; forked
+children write inline. Entry points call `install_signal_handlers` so
+SIGTERM drains it too; the library never replaces signal handlers.
+"""
+import atexit
+import copy
 import logging
+import logging.handlers
+import os
+import queue
+import signal
+import sys
+import threading
+import time
 from pathlib import Path
+from typing import Dict, Optional, Tuple
+
 from pythonjsonlogger import jsonlogger
 
-def setup_logger(logger_name: str, log_path: str):
-    log_file = Path(log_path)
-    log_file.parent.mkdir(parents=True, exist_ok=True)
+LOG_FORMAT = '%(asctime)s %(name)s %(levelname)s %(message)s'
+
+# per call site; inherited by spawned workers through the environment
+RATE_ENV, BURST_ENV = "REASONA_LOG_RATE", "REASONA_LOG_BURST"
+DEFAULT_RATE_PER_S = 10.0
+DEFAULT_BURST = 50
+
+_ROUTE_ATTR = "_reasona_route"
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per (logger, file, line): `burst` records at once, then
+    `rate_per_s` on average. rate_per_s <= 0 disables limiting.
+    """
+
+    def __init__(self, rate_per_s: float = DEFAULT_RATE_PER_S, burst: int = DEFAULT_BURST):
+        super().__init__()
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self._lock = threading.Lock()
+        # call site -> [tokens, last refill, suppressed since last pass]
+        self._buckets: Dict[Tuple[str, str, int], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or self.rate_per_s <= 0:
+            return True
+
+        key = (record.name, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now, 0]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate_per_s)
+                bucket[1] = now
+
+            if bucket[0] < 1.0:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1.0
+            suppressed, bucket[2] = bucket[2], 0
+
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues a copy of each record tagged with the logger it was set up
+    for. Falls back to writing inline when the listener is not running
+    (e.g. records logged by atexit hooks after the queue was drained).
+    """
+
+    def __init__(self, route: str):
+        super().__init__(None)
+        self.route = route
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        if not isinstance(record.msg, dict):
+            # resolve args now: they may be mutated once the caller moves on
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = _formatter.formatException(record.exc_info)
+            record.exc_info = None
+        setattr(record, _ROUTE_ATTR, self.route)
+        return record
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            record = self.prepare(record)
+            with _lock:
+                _start_listener()
+                if _listener is not None:
+                    _queue.put_nowait(record)
+                    return
+            _dispatch(record)
+        except Exception:
+            self.handleError(record)
+
+
+class _Listener(logging.handlers.QueueListener):
+    def handle(self, record: logging.LogRecord) -> None:
+        _dispatch(record)
+
+
+_formatter = jsonlogger.JsonFormatter(LOG_FORMAT)
+_lock = threading.Lock()
+_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+_listener: Optional[_Listener] = None
+_closed = False                              # set once the queue was drained at exit
+_console: Optional[logging.Handler] = None
+_files_lock = threading.Lock()
+_files: Dict[str, logging.Handler] = {}      # absolute path -> handler, opened on first record
+_routes: Dict[str, str] = {}                 # logger name -> absolute path
+_rate_limit = RateLimitFilter(
+    float(os.environ.get(RATE_ENV, DEFAULT_RATE_PER_S)),
+    int(os.environ.get(BURST_ENV, DEFAULT_BURST)),
+)
 
+
+def _file_handler(route: str) -> Optional[logging.Handler]:
+    path = _routes.get(route)
+    if path is None:
+        return None
+    handler = _files.get(path)
+    if handler is None:
+        with _files_lock:
+            handler = _files.get(path)
+            if handler is None:
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+                handler = logging.FileHandler(path, mode="a", encoding="utf-8")
+                handler.setLevel(logging.INFO)
+                handler.setFormatter(_formatter)
+                _files[path] = handler
+    return handler
+
+
+def _dispatch(record: logging.LogRecord) -> None:
+    route = record.__dict__.pop(_ROUTE_ATTR, record.name)
+    for handler in (_file_handler(route), _console):
+        if handler is not None and record.levelno >= handler.level:
+            handler.handle(record)
+
+
+# ----------------------------------------------------------------------
+# Listener lifecycle
+# ----------------------------------------------------------------------
+def _start_listener() -> None:
+    # caller holds _lock
+    global _listener
+    if _listener is None and not _closed:
+        _listener = _Listener(_queue)
+        _listener.start()
+
+
+def flush_logs() -> None:
+    """
+    Drain the queue and stop the listener; records logged afterwards are
+    written inline. Registered to run at exit.
+    """
+    global _listener, _closed
+    with _lock:
+        listener, _listener = _listener, None
+        _closed = True
+    if listener is not None:
+        listener.stop()
+    for handler in [_console, *list(_files.values())]:
+        if handler is not None:
+            try:
+                handler.flush()
+            except (OSError, ValueError):
+                # the stream was already closed (e.g. a replaced stderr)
+                pass
+
+
+def _after_fork_in_child() -> None:
+    # the parent's listener thread does not exist here, and a forked
+    # multiprocessing child exits without running atexit or Finalize
+    # hooks, so forked children write inline
+    global _lock, _queue, _listener, _closed
+    _lock = threading.Lock()
+    _queue = queue.SimpleQueue()
+    _listener = None
+    _closed = True
+
+
+def _on_sigterm(signum, frame) -> None:
+    # turn SIGTERM into a normal exit so finally blocks and atexit run
+    sys.exit(128 + signum)
+
+
+def _install_shutdown_hooks() -> None:
+    import multiprocessing.util
+
+    atexit.register(flush_logs)
+    # multiprocessing children leave through os._exit, skipping atexit
+    multiprocessing.util.Finalize(None, flush_logs, exitpriority=-100)
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def install_signal_handlers() -> None:
+    """
+    Make SIGTERM exit normally so queued records are flushed. For entry
+    points only: a handler someone else already installed is kept.
+    """
+    if (
+        threading.current_thread() is threading.main_thread()
+        and signal.getsignal(signal.SIGTERM) is signal.SIG_DFL
+    ):
+        signal.signal(signal.SIGTERM, _on_sigterm)
+
+
+def configure_logging(rate_per_s: float, burst: int) -> None:
+    """
+    Set the per-call-site rate limit for this process and for workers
+    spawned after this call.
+    """
+    _rate_limit.rate_per_s = rate_per_s
+    _rate_limit.burst = burst
+    os.environ[RATE_ENV] = str(rate_per_s)
+    os.environ[BURST_ENV] = str(burst)
+
+
+def setup_logger(logger_name: str, log_path: str):
+    global _console
     logger = logging.getLogger(logger_name)
     logger.setLevel(logging.INFO)
 
     if not logger.handlers:
-        fh = logging.FileHandler(log_file, mode="a", encoding="utf-8")
-        fh.setLevel(logging.INFO)
-        json_formatter = jsonlogger.JsonFormatter(
-            '%(asctime)s %(name)s %(levelname)s %(message)s'
-        )
-        fh.setFormatter(json_formatter)
-
-        ch = logging.StreamHandler()
-        ch.setLevel(logging.INFO)
-        ch.setFormatter(json_formatter)
-
-        logger.addHandler(fh)
-        logger.addHandler(ch)
+        with _lock:
+            if _console is None:
+                _console = logging.StreamHandler()
+                _console.setLevel(logging.INFO)
+                _console.setFormatter(_formatter)
+                _install_shutdown_hooks()
+
+            # absolute now: the working directory may change before the first record
+            _routes[logger_name] = str(Path(log_path).absolute())
+
+        qh = _QueueHandler(logger_name)
+        qh.addFilter(_rate_limit)
+        logger.addHandler(qh)
 
     return logger
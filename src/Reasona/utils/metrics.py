@@ -0,0 +1,285 @@
+import atexit
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+from Reasona.utils.logger import setup_logger
+
+logger = setup_logger("Reasona.metrics", "logs/metrics/metrics.json")
+
+# upper bounds; the last bucket is unbounded
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+
+def _split(name: str):
+    # "stage.metric" -> ("stage", "metric"); snapshots are grouped by stage
+    stage, _, metric = name.partition(".")
+    if not metric:
+        raise ValueError(f"Metric name '{name}' must look like '<stage>.<metric>'")
+    return stage, metric
+
+
+class Counter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, n: float = 1) -> None:
+        with self._lock:
+            self.value += n
+
+    def collect(self) -> Dict[str, float]:
+        return {"total": self.value}
+
+    def merge(self, collected: Dict[str, float]) -> None:
+        self.inc(collected["total"])
+
+
+class Gauge:
+    def __init__(self):
+        self.value: Optional[float] = None
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def collect(self) -> Optional[float]:
+        return self.value
+
+    def merge(self, collected: Optional[float]) -> None:
+        if collected is not None:
+            self.set(collected)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram; quantiles are interpolated within buckets.
+    """
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS_MS):
+        self._lock = threading.Lock()
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.sum += value
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+
+    def _quantile(self, q: float) -> float:
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                lo = self.bounds[i - 1] if i > 0 else self.min
+                hi = self.bounds[i] if i < len(self.bounds) else self.max
+                lo, hi = max(lo, self.min), min(hi, self.max)
+                return lo + (hi - lo) * (rank - seen) / c
+            seen += c
+        return self.max
+
+    def collect(self) -> Dict[str, Any]:
+        with self._lock:
+            if not self.count:
+                return {"count": 0}
+            return {
+                "count": self.count,
+                "sum": self.sum,
+                "mean": round(self.sum / self.count, 4),
+                "min": round(self.min, 4),
+                "max": round(self.max, 4),
+                "p50": round(self._quantile(0.50), 4),
+                "p95": round(self._quantile(0.95), 4),
+                "p99": round(self._quantile(0.99), 4),
+                "bounds": self.bounds,
+                "buckets": list(self.counts),
+            }
+
+    def merge(self, collected: Dict[str, Any]) -> None:
+        if not collected["count"]:
+            return
+        if collected["bounds"] != self.bounds:
+            raise ValueError("Cannot merge histograms with different buckets")
+        with self._lock:
+            self.counts = [a + b for a, b in zip(self.counts, collected["buckets"])]
+            self.count += collected["count"]
+            self.sum += collected["sum"]
+            self.min = min(self.min, collected["min"])
+            self.max = max(self.max, collected["max"])
+
+
+class MetricsRegistry:
+    """
+    Process-wide counters, gauges and histograms named "<stage>.<metric>".
+
+    Metrics are created on first use, so instrumented code never has to
+    register anything up front. Snapshots nest by stage:
+    {"embedder": {"texts": {"total": ..}, "latency_ms": {"p50": .., ...}}}
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Any] = {}
+
+    def _get(self, name: str, factory):
+        metric = self._metrics.get(name)
+        if metric is None:
+            _split(name)
+            with self._lock:
+                metric = self._metrics.setdefault(name, factory())
+        return metric
+
+    def counter(self, name: str) -> Counter:
+        return self._get(name, Counter)
+
+    def gauge(self, name: str) -> Gauge:
+        return self._get(name, Gauge)
+
+    def histogram(self, name: str, bounds: Sequence[float] = LATENCY_BUCKETS_MS) -> Histogram:
+        return self._get(name, lambda: Histogram(bounds))
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """
+        Observe the duration of the block, in milliseconds, into `name`.
+        """
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(name).observe((time.perf_counter() - t0) * 1000.0)
+
+    def timed(self, name: str):
+        """
+        Decorator form of `timer`.
+        """
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def _collect(items) -> Dict[str, Dict[str, Any]]:
+        stages: Dict[str, Dict[str, Any]] = {}
+        for name, metric in sorted(items):
+            stage, metric_name = _split(name)
+            stages.setdefault(stage, {})[metric_name] = metric.collect()
+        return stages
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            items = list(self._metrics.items())
+        return self._collect(items)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._metrics.clear()
+
+    def drain(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Snapshot and reset, so a worker process can hand over what it
+        recorded since the last call without reporting it twice.
+        """
+        with self._lock:
+            items, self._metrics = list(self._metrics.items()), {}
+        return self._collect(items)
+
+    def merge(self, snapshot: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Fold a snapshot taken in another process (see `drain`) into this
+        registry: counters and histograms add up, gauges take its value.
+        """
+        for stage, metrics in snapshot.items():
+            for metric_name, value in metrics.items():
+                name = f"{stage}.{metric_name}"
+                if isinstance(value, dict) and "total" in value:
+                    self.counter(name).merge(value)
+                elif isinstance(value, dict):
+                    if value["count"]:
+                        self.histogram(name, value["bounds"]).merge(value)
+                else:
+                    self.gauge(name).merge(value)
+
+
+registry = MetricsRegistry()
+
+
+class MetricsReporter:
+    """
+    Logs a registry snapshot every `interval_s` seconds (and once at exit)
+    through the json logger, as a `metrics` field that Filebeat ships to
+    Elasticsearch alongside the other logs. Counters also get `per_s`,
+    their rate since the previous snapshot.
+    """
+
+    def __init__(self, metrics: MetricsRegistry = registry, interval_s: float = 30.0):
+        self.metrics = metrics
+        self.interval_s = interval_s
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_totals: Dict[str, float] = {}
+        self._last_time = time.monotonic()
+
+    def emit(self) -> None:
+        snapshot = self.metrics.snapshot()
+        now = time.monotonic()
+        elapsed = max(now - self._last_time, 1e-9)
+
+        for stage, metrics in snapshot.items():
+            for name, value in metrics.items():
+                if isinstance(value, dict) and "total" in value:
+                    key = f"{stage}.{name}"
+                    previous = self._last_totals.get(key, 0)
+                    value["per_s"] = round((value["total"] - previous) / elapsed, 3)
+                    self._last_totals[key] = value["total"]
+        self._last_time = now
+
+        logger.info(
+            "metrics_snapshot",
+            extra={"event": "metrics_snapshot", "interval_s": round(elapsed, 3), "metrics": snapshot},
+        )
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self.emit()
+
+    def start(self) -> "MetricsReporter":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="metrics-reporter", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+        return self
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.emit()
+
+
+_reporter: Optional[MetricsReporter] = None
+
+
+def start_reporter(interval_s: float = 30.0) -> MetricsReporter:
+    """
+    Start the process-wide reporter (idempotent).
+    """
+    global _reporter
+    if _reporter is None:
+        _reporter = MetricsReporter(registry, interval_s).start()
+    return _reporter
@@ -0,0 +1,97 @@
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from Reasona.utils.logger import setup_logger
+from Reasona.vectorstore.faiss_store import FaissStore
+
+logger = setup_logger(__name__, "logs/vectorstore/ann_report.json")
+
+DEFAULT_SETTINGS = [
+    {"index_type": "ivf_flat", "nprobe": 1},
+    {"index_type": "ivf_flat", "nprobe": 8},
+    {"index_type": "ivf_flat", "nprobe": 32},
+    {"index_type": "ivf_pq", "nprobe": 8},
+    {"index_type": "ivf_pq", "nprobe": 32},
+    {"index_type": "hnsw", "ef_search": 16},
+    {"index_type": "hnsw", "ef_search": 64},
+    {"index_type": "hnsw", "ef_search": 256},
+]
+
+BUILD_KEYS = ("nlist", "pq_m", "pq_nbits", "hnsw_m", "hnsw_ef_construction", "train_size")
+
+
+def _latency(store: FaissStore, queries: np.ndarray, k: int) -> Dict[str, float]:
+    # one query per call, the way Retriever.retrieve hits the index
+    timings = []
+    for q in queries:
+        t0 = time.perf_counter()
+        store.search(q[None, :], k)
+        timings.append((time.perf_counter() - t0) * 1000)
+    timings = np.asarray(timings)
+    return {
+        "p50_ms": round(float(np.percentile(timings, 50)), 4),
+        "p95_ms": round(float(np.percentile(timings, 95)), 4),
+        "p99_ms": round(float(np.percentile(timings, 99)), 4),
+    }
+
+
+def recall_at_k(truth: np.ndarray, found: np.ndarray) -> float:
+    k = truth.shape[1]
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return hits / (len(truth) * k)
+
+
+def recall_latency_report(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    k: int = 10,
+    settings: Optional[List[Dict]] = None,
+) -> List[Dict]:
+    """
+    Compare ANN index settings against an exact flat index on the same
+    vectors: recall@k of the returned IDs and single-query latency.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    dim = vectors.shape[1]
+    empty_meta = [None] * len(vectors)
+
+    flat = FaissStore(dim)
+    flat.add(vectors, empty_meta)
+    _, truth = flat.search(queries, k)
+
+    rows = [{"index_type": "flat", "recall_at_k": 1.0, **_latency(flat, queries, k)}]
+
+    built: Dict[tuple, FaissStore] = {}
+    for setting in settings or DEFAULT_SETTINGS:
+        build = {key: setting[key] for key in BUILD_KEYS if key in setting}
+        cache_key = (setting["index_type"], tuple(sorted(build.items())))
+
+        store = built.get(cache_key)
+        build_s = 0.0
+        if store is None:
+            t0 = time.perf_counter()
+            store = FaissStore(dim, index_type=setting["index_type"], **build)
+            store.add(vectors, empty_meta)
+            store.train()
+            build_s = time.perf_counter() - t0
+            built[cache_key] = store
+
+        store.set_search_params(
+            nprobe=setting.get("nprobe"), ef_search=setting.get("ef_search")
+        )
+        _, found = store.search(queries, k)
+
+        row = {
+            **setting,
+            "recall_at_k": round(recall_at_k(truth, found), 4),
+            **_latency(store, queries, k),
+        }
+        if build_s:
+            row["build_s"] = round(build_s, 3)
+        rows.append(row)
+        logger.info(f"ANN report row: {row}")
+
+    return rows
@@ -1,23 +1,402 @@
-import faiss
+import itertools
+import json
+import os
 import pickle
+import shutil
+import numpy as np
 from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+from Reasona.utils.metrics import registry
+from Reasona.vectorstore.metadata_store import MetadataTable, SCHEMA_FILE
+from Reasona.vectorstore.filters import FilterIndex, FILTERS_FILE
+from Reasona.vectorstore.keyword_index import KeywordIndex, KEYWORDS_FILE
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# faiss warns below ~39 training points per centroid
+MIN_POINTS_PER_CENTROID = 39
+
+# process-wide, so no two store states ever share a version
+_versions = itertools.count(1)
+
+# rough in-memory cost of one metadata row (a small dict of short strings)
+METADATA_ROW_BYTES = 400
+
+
+def _mmap_flags(index_type: str) -> int:
+    """
+    read_index flags that map the index file instead of copying it:
+    IVF inverted lists map through IO_FLAG_MMAP, flat / HNSW storage
+    through IO_FLAG_MMAP_IFC (faiss >= 1.10; 0 falls back to a full read).
+    """
+    import faiss
+
+    if index_type in ("ivf_flat", "ivf_pq"):
+        return faiss.IO_FLAG_MMAP
+    return getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
 
 
 class FaissStore:
-    def __init__(self, dim: int):
-        self.index = faiss.IndexFlatL2(dim)
+    """
+    Vector index + per-vector metadata.
+
+    index_type:
+    - flat:     exact brute-force L2 search
+    - ivf_flat: inverted lists over full vectors (query knob: nprobe)
+    - ivf_pq:   inverted lists over product-quantized codes (query knob: nprobe)
+    - hnsw:     graph-based search (query knob: ef_search)
+
+    IVF indexes need training: vectors are buffered until `train_size` of
+    them have arrived, then the index is trained on that sample and the
+    buffer is flushed in insertion order.
+
+    With `keyword_index=True` the chunk texts passed to `add` also go
+    into a BM25 index (saved under `bm25/`) for `search_keywords`.
+
+    `version` changes whenever the searchable contents do (add, load),
+    so callers caching results can tell when they are stale.
+
+    `load(path, mmap=True)` maps the saved index instead of reading it, so
+    processes serving the same store share the page cache. Such a store
+    is read-only.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        index_type: str = "flat",
+        nlist: int = 1024,
+        pq_m: int = 16,
+        pq_nbits: int = 8,
+        hnsw_m: int = 32,
+        hnsw_ef_construction: int = 200,
+        train_size: Optional[int] = None,
+        filter_fields: Sequence[str] = (),
+        keyword_index: bool = False,
+    ):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index_type '{index_type}', expected one of {INDEX_TYPES}")
+
+        self.dim = dim
+        self.index_type = index_type
+        self.params = {
+            "nlist": nlist,
+            "pq_m": pq_m,
+            "pq_nbits": pq_nbits,
+            "hnsw_m": hnsw_m,
+            "hnsw_ef_construction": hnsw_ef_construction,
+            "train_size": train_size or nlist * MIN_POINTS_PER_CENTROID,
+        }
+
+        self.index = self._build_index(nlist)
         self.metadata = []
+        self.filters = FilterIndex(filter_fields)
+        self.keywords: Optional[KeywordIndex] = KeywordIndex() if keyword_index else None
+        self._pending = []
+        self.read_only = False
+        self.version = next(_versions)
+        self.snapshot: Optional[Dict[str, Any]] = None  # manifest, when loaded from a snapshot
+
+    @classmethod
+    def from_config(cls, dim: int, cfg) -> "FaissStore":
+        """
+        Build an empty store from an IndexingConfig.
+        """
+        return cls(
+            dim=dim,
+            index_type=cfg.index_type,
+            nlist=cfg.nlist,
+            pq_m=cfg.pq_m,
+            pq_nbits=cfg.pq_nbits,
+            hnsw_m=cfg.hnsw_m,
+            hnsw_ef_construction=cfg.hnsw_ef_construction,
+            train_size=cfg.train_size,
+            filter_fields=cfg.filter_fields,
+            keyword_index=cfg.keyword_index,
+        )
+
+    def _build_index(self, nlist: int):
+        import faiss
+
+        p = self.params
+        if self.index_type == "flat":
+            return faiss.IndexFlatL2(self.dim)
+        if self.index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(self.dim, p["hnsw_m"])
+            index.hnsw.efConstruction = p["hnsw_ef_construction"]
+            return index
+
+        quantizer = faiss.IndexFlatL2(self.dim)
+        if self.index_type == "ivf_flat":
+            return faiss.IndexIVFFlat(quantizer, self.dim, nlist)
+        return faiss.IndexIVFPQ(quantizer, self.dim, nlist, p["pq_m"], p["pq_nbits"])
+
+    def __len__(self) -> int:
+        return len(self.metadata)
 
-    def add(self, vectors, metadata):
-        self.index.add(vectors)
+    @property
+    def is_trained(self) -> bool:
+        return self.index.is_trained
+
+    @property
+    def has_keywords(self) -> bool:
+        return self.keywords is not None
+
+    def memory_bytes(self) -> int:
+        """
+        Estimated resident size of what `add` has accumulated: index
+        storage, buffered training vectors, metadata rows and keyword
+        postings. Mapped (loaded with mmap) parts are not counted.
+        """
+        n, p = self.index.ntotal, self.params
+        if self.read_only:
+            per_vector = 0
+        elif self.index_type == "flat":
+            per_vector = 4 * self.dim
+        elif self.index_type == "hnsw":
+            per_vector = 4 * self.dim + 8 * p["hnsw_m"] + 16
+        elif self.index_type == "ivf_flat":
+            per_vector = 4 * self.dim + 8
+        else:
+            per_vector = p["pq_m"] * p["pq_nbits"] // 8 + 8
+
+        total = n * per_vector + sum(v.nbytes for v in self._pending)
+        if isinstance(self.metadata, MetadataTable):
+            total += self.metadata.in_memory_rows * METADATA_ROW_BYTES
+        else:
+            total += len(self.metadata) * METADATA_ROW_BYTES
+        if self.keywords is not None:
+            total += self.keywords.memory_bytes()
+        return total
+
+    # ------------------------------------------------------------------
+    # Build
+    # ------------------------------------------------------------------
+    @registry.timed("faiss.add_ms")
+    def add(self, vectors, metadata, texts: Optional[Sequence[str]] = None):
+        """
+        texts: chunk texts for the keyword index (chunks without one are
+        indexed as empty).
+        """
+        if self.read_only:
+            # faiss aborts the process when resizing a mapped index
+            raise ValueError("Store was loaded with mmap=True and is read-only")
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
         self.metadata.extend(metadata)
+        self.filters.add(metadata)
+        if self.keywords is not None:
+            self.keywords.add(texts if texts is not None else [""] * len(metadata))
+        self.version = next(_versions)
+        registry.counter("faiss.vectors_added").inc(len(vectors))
+        registry.gauge("faiss.size").set(len(self.metadata))
+
+        if self.index.is_trained:
+            self.index.add(vectors)
+            return
+
+        self._pending.append(vectors)
+        if sum(len(v) for v in self._pending) >= self.params["train_size"]:
+            self.train()
+
+    def train(self) -> None:
+        """
+        Train on the buffered vectors (shrinking nlist for small corpora)
+        and flush them into the index.
+        """
+        if self.index.is_trained or not self._pending:
+            return
+
+        pending = np.concatenate(self._pending)
+        self._pending = []
+
+        nlist = min(self.params["nlist"], max(1, len(pending) // MIN_POINTS_PER_CENTROID))
+        nbits = self.params["pq_nbits"]
+        if self.index_type == "ivf_pq":
+            # PQ codebooks need at least 2**nbits training points
+            nbits = min(nbits, max(1, int(np.log2(len(pending)))))
+        if nlist != self.params["nlist"] or nbits != self.params["pq_nbits"]:
+            self.params["nlist"] = nlist
+            self.params["pq_nbits"] = nbits
+            self.index = self._build_index(nlist)
+
+        sample = pending
+        if len(pending) > self.params["train_size"]:
+            rng = np.random.default_rng(0)
+            sample = pending[rng.choice(len(pending), self.params["train_size"], replace=False)]
+
+        self.index.train(sample)
+        self.index.add(pending)
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+    def set_search_params(
+        self, nprobe: Optional[int] = None, ef_search: Optional[int] = None
+    ) -> None:
+        import faiss
+
+        if nprobe is not None and self.index_type in ("ivf_flat", "ivf_pq"):
+            faiss.extract_index_ivf(self.index).nprobe = nprobe
+        if ef_search is not None and self.index_type == "hnsw":
+            self.index.hnsw.efSearch = ef_search
+
+    def _search_params(self, selector, widen: int = 1):
+        import faiss
+
+        if self.index_type in ("ivf_flat", "ivf_pq"):
+            ivf = faiss.extract_index_ivf(self.index)
+            return faiss.SearchParametersIVF(
+                sel=selector, nprobe=min(ivf.nlist, ivf.nprobe * widen)
+            )
+        if self.index_type == "hnsw":
+            return faiss.SearchParametersHNSW(
+                sel=selector, efSearch=self.index.hnsw.efSearch * widen
+            )
+        return faiss.SearchParameters(sel=selector)
+
+    @registry.timed("faiss.search_ms")
+    def search(self, queries, k: int, filters: Optional[Dict[str, Any]] = None):
+        """
+        filters: {field: value or [values]} over fields listed in
+        filter_fields; restricts results to matching IDs inside FAISS.
+        """
+        self.train()
+        queries = np.ascontiguousarray(queries, dtype="float32")
+        registry.counter("faiss.queries").inc(len(queries))
+        if not filters:
+            return self.index.search(queries, k)
+
+        selector, matching = self.filters.selector(filters)
+        want = min(k, matching)
+
+        # approximate indexes may see fewer than k matches in the probed
+        # region; widen nprobe / efSearch until every query is filled
+        widen = 1
+        while True:
+            distances, indices = self.index.search(
+                queries, k, params=self._search_params(selector, widen)
+            )
+            filled = (indices[:, :want] != -1).all()
+            if filled or self.index_type == "flat" or widen >= 1024:
+                return distances, indices
+            widen *= 4
+
+    @registry.timed("keywords.search_ms")
+    def search_keywords(
+        self, queries: Sequence[str], k: int, filters: Optional[Dict[str, Any]] = None
+    ):
+        """
+        BM25 search over the chunk texts; same (scores, IDs) layout as
+        `search`, with higher scores better.
+        """
+        if self.keywords is None:
+            raise ValueError("Store has no keyword index (build with keyword_index=True)")
+        registry.counter("keywords.queries").inc(len(queries))
+        allowed = self.filters.bitmap(filters) if filters else None
+        return self.keywords.search(queries, k, allowed)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    @registry.timed("faiss.save_ms")
+    def save(self, path: Path, finalize: bool = True):
+        """
+        finalize=False keeps untrained vectors buffered (used by checkpoints,
+        so a resumed run trains on the same sample as an uninterrupted one).
+        """
+        import faiss
+
+        if finalize:
+            self.train()
+
+        # write-then-rename: processes still mapping the old file keep its inode
+        tmp_index = path / "index.faiss.tmp"
+        faiss.write_index(self.index, str(tmp_index))
+        os.replace(tmp_index, path / "index.faiss")
+
+        metadata = self.metadata
+        if not isinstance(metadata, MetadataTable):
+            metadata = MetadataTable(metadata)
+        metadata.save(path / "meta")
+
+        self.filters.save(path / "filters")
+
+        if self.keywords is not None:
+            self.keywords.save(path / "bm25")
+        else:
+            shutil.rmtree(path / "bm25", ignore_errors=True)
+
+        legacy_path = path / "meta.pkl"
+        if legacy_path.exists():
+            legacy_path.unlink()
+
+        pending_path = path / "pending.npy"
+        if self._pending:
+            np.save(pending_path, np.concatenate(self._pending))
+        elif pending_path.exists():
+            pending_path.unlink()
+
+        with open(path / "store.json", "w") as f:
+            json.dump(
+                {
+                    "index_type": self.index_type,
+                    "dim": self.dim,
+                    "count": len(self.metadata),
+                    "params": self.params,
+                },
+                f,
+                indent=2,
+            )
+
+    @registry.timed("faiss.load_ms")
+    def load(self, path: Path, mmap: bool = False):
+        """
+        mmap=True maps the index file (metadata, filter bitmaps and BM25
+        postings are always mapped) and makes the store read-only.
+        """
+        import faiss
+
+        info_path = path / "store.json"
+        info = None
+        if info_path.exists():
+            with open(info_path, "r") as f:
+                info = json.load(f)
+
+        pending_path = path / "pending.npy"
+        if mmap and pending_path.exists():
+            raise ValueError(f"{path} holds untrained vectors and cannot be loaded with mmap=True")
+
+        flags = _mmap_flags(info["index_type"] if info else "flat") if mmap else 0
+        self.index = faiss.read_index(str(path / "index.faiss"), flags)
+        self.read_only = mmap
+
+        if (path / "meta" / SCHEMA_FILE).exists():
+            self.metadata = MetadataTable.load(path / "meta")
+        else:
+            # stores written before the columnar format
+            with open(path / "meta.pkl", "rb") as f:
+                self.metadata = pickle.load(f)
+
+        if (path / "filters" / FILTERS_FILE).exists():
+            self.filters = FilterIndex.load(path / "filters")
+        else:
+            self.filters = FilterIndex()
+            self.filters.size = len(self.metadata)
+
+        if (path / "bm25" / KEYWORDS_FILE).exists():
+            self.keywords = KeywordIndex.load(path / "bm25")
+        else:
+            self.keywords = None
 
-    def save(self, path: Path):
-        faiss.write_index(self.index, str(path / "index.faiss"))
-        with open(path / "meta.pkl", "wb") as f:
-            pickle.dump(self.metadata, f)
+        # stores written before index types were configurable are flat
+        if info is not None:
+            self.index_type = info["index_type"]
+            self.params.update(info["params"])
+        else:
+            self.index_type = "flat"
+        self.dim = self.index.d
+        self.version = next(_versions)
+        registry.gauge("faiss.size").set(len(self.metadata))
 
-    def load(self, path: Path):
-        self.index = faiss.read_index(str(path / "index.faiss"))
-        with open(path / "meta.pkl", "rb") as f:
-            self.metadata = pickle.load(f)
+        self._pending = [np.load(pending_path)] if pending_path.exists() else []
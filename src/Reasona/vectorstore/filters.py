@@ -0,0 +1,147 @@
+import json
+import os
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+FILTERS_FILE = "filters.json"
+
+
+def _key(value: Any) -> str:
+    return json.dumps(value, sort_keys=True)
+
+
+def _popcount(bitmap: np.ndarray) -> int:
+    return int(np.unpackbits(bitmap).sum())
+
+
+class FilterIndex:
+    """
+    Per-field inverted ID sets over chunk metadata, served as packed
+    bitmaps for FAISS ID selectors.
+
+    Meant for low-cardinality fields (`lang`, `source`): each distinct
+    value costs one n/8-byte bitmap on disk.
+    """
+
+    def __init__(self, fields: Sequence[str] = ()):
+        self.fields = list(fields)
+        self.size = 0
+        self._ids: Dict[str, Dict[str, array]] = {f: {} for f in self.fields}
+        self._bitmaps: Dict[str, Dict[str, np.ndarray]] = {f: {} for f in self.fields}
+        self._bitmap_size = 0
+
+    # ------------------------------------------------------------------
+    # Build
+    # ------------------------------------------------------------------
+    def add(self, metadatas: List[Dict]) -> None:
+        if not self.fields:
+            self.size += len(metadatas)
+            return
+
+        self._materialize()
+        for offset, meta in enumerate(metadatas, start=self.size):
+            for field in self.fields:
+                value_key = _key(meta.get(field))
+                self._ids[field].setdefault(value_key, array("q")).append(offset)
+        self.size += len(metadatas)
+
+    def _materialize(self) -> None:
+        # bitmaps loaded from disk become ID lists again before appending
+        for field in self.fields:
+            for value_key, bitmap in self._bitmaps[field].items():
+                if value_key not in self._ids[field]:
+                    ids = np.flatnonzero(np.unpackbits(bitmap, bitorder="little")[: self.size])
+                    self._ids[field][value_key] = array("q", ids.tolist())
+
+    def _bitmap(self, field: str, value: Any) -> Optional[np.ndarray]:
+        value_key = _key(value)
+        if self._bitmap_size != self.size:
+            self._bitmaps = {f: {} for f in self.fields}
+            self._bitmap_size = self.size
+
+        bitmap = self._bitmaps[field].get(value_key)
+        if bitmap is None:
+            ids = self._ids[field].get(value_key)
+            if ids is None:
+                return None
+            bits = np.zeros(self.size, dtype=bool)
+            bits[np.frombuffer(ids, dtype=np.int64)] = True
+            bitmap = np.packbits(bits, bitorder="little")
+            self._bitmaps[field][value_key] = bitmap
+        return bitmap
+
+    # ------------------------------------------------------------------
+    # Query
+    # ------------------------------------------------------------------
+    def bitmap(self, filters: Dict[str, Any]) -> np.ndarray:
+        """
+        AND across fields, OR across the values listed for one field.
+        """
+        result = None
+        for field, wanted in filters.items():
+            if field not in self._ids:
+                raise KeyError(f"Field '{field}' is not indexed for filtering")
+            values = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+
+            field_bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+            for value in values:
+                bm = self._bitmap(field, value)
+                if bm is not None:
+                    field_bits |= bm
+
+            result = field_bits if result is None else result & field_bits
+
+        if result is None:
+            result = np.packbits(np.ones(self.size, dtype=bool), bitorder="little")
+        return result
+
+    def selector(self, filters: Dict[str, Any]):
+        """
+        Return (faiss selector, number of matching IDs).
+        """
+        import faiss
+
+        bitmap = self.bitmap(filters)
+        return faiss.IDSelectorBitmap(bitmap), _popcount(bitmap)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        layout = {"size": self.size, "fields": {}}
+        for field_no, field in enumerate(self.fields):
+            value_keys = sorted(set(self._ids[field]) | set(self._bitmaps[field]))
+            stacked = np.stack(
+                [self._bitmap(field, json.loads(v)) for v in value_keys]
+            ) if value_keys else np.zeros((0, (self.size + 7) // 8), dtype=np.uint8)
+
+            name = f"f{field_no}.npy"
+            with open(path / (name + ".tmp"), "wb") as f:
+                np.save(f, stacked)
+            os.replace(path / (name + ".tmp"), path / name)
+            layout["fields"][field] = {"file": name, "values": value_keys}
+
+        with open(path / FILTERS_FILE, "w") as f:
+            json.dump(layout, f, indent=2)
+
+    @classmethod
+    def load(cls, path: Path) -> "FilterIndex":
+        path = Path(path)
+        with open(path / FILTERS_FILE, "r") as f:
+            layout = json.load(f)
+
+        index = cls(list(layout["fields"]))
+        index.size = layout["size"]
+        index._bitmap_size = index.size
+        for field, entry in layout["fields"].items():
+            stacked = np.load(path / entry["file"], mmap_mode="r")
+            index._bitmaps[field] = {
+                value_key: stacked[row] for row, value_key in enumerate(entry["values"])
+            }
+        return index
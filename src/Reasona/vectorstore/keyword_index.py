@@ -0,0 +1,328 @@
+import hashlib
+import json
+import os
+import re
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+KEYWORDS_FILE = "bm25.json"
+
+_TOKEN = re.compile(r"\w+")
+
+# buffered postings are merged into the CSR arrays once they reach this
+# many (or a quarter of the merged postings, so merging stays amortized O(n))
+_COMPACT_POSTINGS = 4_000_000
+_HASH_CACHE_SIZE = 1_000_000
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def term_hash(term: str) -> int:
+    digest = hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def top_k(ids: np.ndarray, scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the k best scores, best first, ties towards the lower ID.
+    """
+    if len(ids) > k:
+        # everything tied with the k-th score competes on ID
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        candidates = np.flatnonzero(scores >= kth)
+        return candidates[np.lexsort((ids[candidates], -scores[candidates]))][:k]
+    return np.lexsort((ids, -scores))
+
+
+def _save_npy(path: Path, array_: np.ndarray) -> None:
+    # write-then-rename: an index still mapping the old file keeps its inode
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, array_)
+    os.replace(tmp, path)
+
+
+def _decode(deltas: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Absolute doc IDs of every posting list at once: a running sum that
+    restarts at each list's first (absolute) entry.
+    """
+    total = np.cumsum(deltas, dtype=np.int64)
+    starts = offsets[:-1]
+    lengths = np.diff(offsets)
+    nonempty = lengths > 0
+    before = total[starts[nonempty]] - deltas[starts[nonempty]]
+    return total - np.repeat(before, lengths[nonempty])
+
+
+class KeywordIndex:
+    """
+    BM25 inverted index over chunk texts; doc IDs are FaissStore IDs.
+
+    Postings are kept in CSR form as flat numpy arrays (all memory-mapped
+    after `load`):
+    - terms:       uint64 term hashes, sorted; a query term is found by
+                   binary search, so no vocabulary dict is ever loaded
+    - offsets:     int64, postings of terms[t] are [offsets[t], offsets[t+1])
+    - doc_deltas:  uint32 doc IDs, delta-encoded within each posting list
+    - tfs:         uint16 term frequencies (clipped)
+    - doc_lengths: uint32 tokens per chunk
+
+    Terms are lowercased `\\w+` runs. Chunks added since the last merge
+    are buffered as (term, doc, tf) arrays; since their IDs are larger
+    than any merged ID, merging only inserts them at the end of each
+    term's list.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+        self.terms = np.zeros(0, dtype=np.uint64)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.doc_deltas = np.zeros(0, dtype=np.uint32)
+        self.tfs = np.zeros(0, dtype=np.uint16)
+        self.doc_lengths = np.zeros(0, dtype=np.uint32)
+        self.total_tokens = 0
+
+        self._tail: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        self._tail_postings = 0
+        self._tail_lengths = array("I")
+        self._hashes: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths) + len(self._tail_lengths)
+
+    @property
+    def postings(self) -> int:
+        return len(self.tfs) + self._tail_postings
+
+    # ------------------------------------------------------------------
+    # Build
+    # ------------------------------------------------------------------
+    def _hash(self, term: str) -> int:
+        h = self._hashes.get(term)
+        if h is None:
+            if len(self._hashes) >= _HASH_CACHE_SIZE:
+                self._hashes.clear()
+            h = self._hashes[term] = term_hash(term)
+        return h
+
+    def add(self, texts: Sequence[str]) -> None:
+        """
+        Index `texts` as the next len(texts) doc IDs.
+        """
+        terms: List[int] = []
+        docs: List[int] = []
+        tfs: List[int] = []
+        for doc, text in enumerate(texts, start=len(self)):
+            tokens = tokenize(text or "")
+            self._tail_lengths.append(len(tokens))
+            self.total_tokens += len(tokens)
+            counts = Counter(tokens)
+            terms.extend(self._hash(t) for t in counts)
+            tfs.extend(counts.values())
+            docs.extend([doc] * len(counts))
+
+        if not terms:
+            return
+        self._tail.append(
+            (
+                np.asarray(terms, dtype=np.uint64),
+                np.asarray(docs, dtype=np.int64),
+                np.minimum(np.asarray(tfs, dtype=np.int64), np.iinfo(np.uint16).max),
+            )
+        )
+        self._tail_postings += len(terms)
+        if self._tail_postings >= max(_COMPACT_POSTINGS, len(self.tfs) // 4):
+            self.compact()
+
+    def compact(self) -> None:
+        """
+        Merge buffered postings into the CSR arrays.
+        """
+        if self._tail_lengths:
+            self.doc_lengths = np.concatenate(
+                [self.doc_lengths, np.frombuffer(self._tail_lengths, dtype=np.uint32)]
+            )
+            self._tail_lengths = array("I")
+        if not self._tail:
+            return
+
+        terms = np.concatenate([t for t, _, _ in self._tail])
+        docs = np.concatenate([d for _, d, _ in self._tail])
+        tfs = np.concatenate([f for _, _, f in self._tail])
+        self._tail, self._tail_postings = [], 0
+        order = np.lexsort((docs, terms))
+        terms, docs, tfs = terms[order], docs[order], tfs[order]
+
+        # new docs go after the existing postings of the same term
+        base_terms = np.repeat(self.terms, np.diff(self.offsets))
+        at = np.searchsorted(base_terms, terms, side="right")
+        all_terms = np.insert(base_terms, at, terms)
+        all_docs = np.insert(_decode(self.doc_deltas, self.offsets), at, docs)
+        all_tfs = np.insert(np.asarray(self.tfs), at, tfs.astype(np.uint16))
+
+        first = np.ones(len(all_terms), dtype=bool)
+        first[1:] = all_terms[1:] != all_terms[:-1]
+        deltas = np.diff(all_docs, prepend=0)
+        deltas[first] = all_docs[first]
+
+        self.terms = all_terms[first]
+        self.offsets = np.append(np.flatnonzero(first), len(all_terms)).astype(np.int64)
+        self.doc_deltas = deltas.astype(np.uint32)
+        self.tfs = all_tfs
+
+    # ------------------------------------------------------------------
+    # Query
+    # ------------------------------------------------------------------
+    def _postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        h = np.uint64(term_hash(term))
+        t = int(np.searchsorted(self.terms, h))
+        if t == len(self.terms) or self.terms[t] != h:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint16)
+        start, end = self.offsets[t], self.offsets[t + 1]
+        return np.cumsum(self.doc_deltas[start:end], dtype=np.int64), self.tfs[start:end]
+
+    def document_frequencies(self, terms: Sequence[str]) -> Dict[str, int]:
+        self.compact()
+        return {term: len(self._postings(term)[0]) for term in terms}
+
+    def score(
+        self,
+        query: str,
+        allowed: Optional[np.ndarray] = None,
+        stats: Optional[Tuple[int, int, Dict[str, int]]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (doc IDs, BM25 scores) of every chunk sharing a term with `query`.
+        `allowed` is a packed little-endian bitmap of eligible IDs.
+        `stats` = (docs, total tokens, {term: document frequency}) of a
+        larger corpus this index is part of, so a segment scores exactly
+        as the whole corpus would.
+        """
+        self.compact()
+        if stats is None:
+            n, total_tokens, dfs = len(self.doc_lengths), self.total_tokens, None
+        else:
+            n, total_tokens, dfs = stats
+        avgdl = total_tokens / n if n else 0.0
+
+        all_docs, all_scores = [], []
+        for term in set(tokenize(query)):
+            docs, tfs = self._postings(term)
+            if not len(docs):
+                continue
+            df = len(docs) if dfs is None else dfs[term]
+            idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            tf = tfs.astype(np.float32)
+            norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths[docs] / avgdl)
+            all_docs.append(docs)
+            all_scores.append(idf * tf * (self.k1 + 1.0) / (tf + norm))
+
+        if not all_docs:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        docs = np.concatenate(all_docs)
+        scores = np.concatenate(all_scores)
+        if allowed is not None:
+            keep = (allowed[docs >> 3] >> (docs & 7).astype(np.uint8)) & 1
+            docs, scores = docs[keep.astype(bool)], scores[keep.astype(bool)]
+
+        ids, inverse = np.unique(docs, return_inverse=True)
+        return ids, np.bincount(inverse, weights=scores).astype(np.float32)
+
+    def search(
+        self,
+        queries: Sequence[str],
+        k: int,
+        allowed: Optional[np.ndarray] = None,
+        stats: Optional[List[Tuple[int, int, Dict[str, int]]]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (scores, IDs) of shape (len(queries), k), best first, padded with
+        -1 like a FAISS search. Ties break towards the lower ID.
+        `stats` holds per-query corpus statistics (see `score`).
+        """
+        scores = np.zeros((len(queries), k), dtype=np.float32)
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        for row, query in enumerate(queries):
+            ids, query_scores = self.score(query, allowed, stats[row] if stats else None)
+            top = top_k(ids, query_scores, k)
+            scores[row, : len(top)] = query_scores[top]
+            indices[row, : len(top)] = ids[top]
+        return scores, indices
+
+    def memory_bytes(self) -> int:
+        """
+        Approximate size of the in-memory postings (buffered triples
+        cost 24 bytes each until merged).
+        """
+        arrays = (self.terms, self.offsets, self.doc_deltas, self.tfs, self.doc_lengths)
+        in_memory = sum(a.nbytes for a in arrays if not isinstance(a, np.memmap))
+        return in_memory + 24 * self._tail_postings + 4 * len(self._tail_lengths)
+
+    @classmethod
+    def concat(cls, indexes: Sequence["KeywordIndex"]) -> "KeywordIndex":
+        """
+        One index over `indexes` laid end to end (doc IDs of each are
+        shifted past the previous ones), without re-tokenizing.
+        """
+        merged = cls(k1=indexes[0].k1, b=indexes[0].b) if indexes else cls()
+        for index in indexes:
+            index.compact()
+            if len(index.tfs):
+                merged._tail.append(
+                    (
+                        np.repeat(np.asarray(index.terms), np.diff(index.offsets)),
+                        _decode(index.doc_deltas, index.offsets) + len(merged),
+                        np.asarray(index.tfs, dtype=np.int64),
+                    )
+                )
+                merged._tail_postings += len(index.tfs)
+            merged._tail_lengths.extend(np.asarray(index.doc_lengths).tolist())
+            merged.total_tokens += index.total_tokens
+        merged.compact()
+        return merged
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        self.compact()
+
+        for name in ("terms", "offsets", "doc_deltas", "tfs", "doc_lengths"):
+            _save_npy(path / f"{name}.npy", np.asarray(getattr(self, name)))
+
+        with open(path / KEYWORDS_FILE, "w") as f:
+            json.dump(
+                {
+                    "k1": self.k1,
+                    "b": self.b,
+                    "docs": len(self),
+                    "postings": self.postings,
+                    "total_tokens": self.total_tokens,
+                },
+                f,
+                indent=2,
+            )
+
+    @classmethod
+    def load(cls, path: Path) -> "KeywordIndex":
+        path = Path(path)
+        with open(path / KEYWORDS_FILE, "r") as f:
+            info = json.load(f)
+
+        index = cls(k1=info["k1"], b=info["b"])
+        index.total_tokens = info["total_tokens"]
+        for name in ("terms", "offsets", "doc_deltas", "tfs", "doc_lengths"):
+            setattr(index, name, np.load(path / f"{name}.npy", mmap_mode="r"))
+        return index
@@ -0,0 +1,193 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+SCHEMA_FILE = "schema.json"
+
+
+def _column_kind(values: List[Any]) -> str:
+    types = {type(v) for v in values if v is not None}
+    if not types:
+        return "str"
+    if types == {bool}:
+        return "bool"
+    if types <= {int}:
+        return "int"
+    if types <= {int, float}:
+        return "float"
+    if types == {str}:
+        return "str"
+    return "json"
+
+
+def _save_npy(path: Path, array: np.ndarray) -> None:
+    # write-then-rename: a table still mapping the old file keeps its inode
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+
+def _write_strings(path: Path, name: str, strings: List[str]) -> None:
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    _save_npy(path / f"{name}.offsets.npy", offsets)
+    _save_npy(path / f"{name}.bytes.npy", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+
+class _StringColumn:
+    """
+    Variable-length strings as (offsets, bytes), decoded one row at a time.
+    """
+
+    def __init__(self, path: Path, name: str):
+        self.offsets = np.load(path / f"{name}.offsets.npy", mmap_mode="r")
+        self.data = np.load(path / f"{name}.bytes.npy", mmap_mode="r")
+
+    def __getitem__(self, i: int) -> str:
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.data[start:end].tobytes().decode("utf-8")
+
+
+class MetadataTable:
+    """
+    Columnar, lazily loaded per-chunk metadata.
+
+    On disk every column is a memory-mapped .npy file:
+    - int / float / bool: fixed-width values + null mask
+    - str:  int32 codes into a string dictionary (repeated values such as
+            `source` / `lang` are stored once)
+    - json: per-row JSON strings, for anything else
+
+    Loading maps the files without reading rows; `table[i]` decodes only
+    row i. Rows appended after loading are kept in memory until the next
+    save. Keys missing from a row read back as None.
+    """
+
+    def __init__(self, rows: Optional[List[Dict]] = None):
+        self._n_base = 0
+        self._columns: List[Dict[str, Any]] = []
+        self._tail: List[Dict] = list(rows or [])
+
+    # ------------------------------------------------------------------
+    # List-like access
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return self._n_base + len(self._tail)
+
+    @property
+    def in_memory_rows(self) -> int:
+        """
+        Rows appended since the last load, held as dicts.
+        """
+        return len(self._tail)
+
+    def __getitem__(self, i: int) -> Dict:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        if i >= self._n_base:
+            return self._tail[i - self._n_base]
+        return self._row(i)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def extend(self, rows: List[Dict]) -> None:
+        self._tail.extend(rows)
+
+    def append(self, row: Dict) -> None:
+        self._tail.append(row)
+
+    def column(self, name: str) -> List[Any]:
+        return [row.get(name) for row in self]
+
+    def _row(self, i: int) -> Dict:
+        row = {}
+        for col in self._columns:
+            kind = col["kind"]
+            if kind == "str":
+                code = int(col["codes"][i])
+                row[col["name"]] = None if code < 0 else col["dictionary"][code]
+            elif kind == "json":
+                row[col["name"]] = json.loads(col["values"][i])
+            elif col["nulls"][i]:
+                row[col["name"]] = None
+            else:
+                row[col["name"]] = col["values"][i].item()
+        return row
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        rows = list(self)
+        names: Dict[str, None] = {}
+        for row in rows:
+            names.update(dict.fromkeys(row))
+
+        schema = {"rows": len(rows), "columns": []}
+        for idx, name in enumerate(names):
+            values = [row.get(name) for row in rows]
+            kind = _column_kind(values)
+            stem = f"c{idx}"
+
+            if kind == "str":
+                dictionary: Dict[str, int] = {}
+                codes = np.fromiter(
+                    (-1 if v is None else dictionary.setdefault(v, len(dictionary)) for v in values),
+                    dtype=np.int32,
+                    count=len(values),
+                )
+                _save_npy(path / f"{stem}.codes.npy", codes)
+                _write_strings(path, f"{stem}.dict", list(dictionary))
+            elif kind == "json":
+                _write_strings(path, f"{stem}.json", [json.dumps(v) for v in values])
+            else:
+                dtype = {"int": np.int64, "float": np.float64, "bool": np.bool_}[kind]
+                nulls = np.fromiter((v is None for v in values), dtype=np.bool_, count=len(values))
+                data = np.fromiter(
+                    (0 if v is None else v for v in values), dtype=dtype, count=len(values)
+                )
+                _save_npy(path / f"{stem}.values.npy", data)
+                _save_npy(path / f"{stem}.nulls.npy", nulls)
+
+            schema["columns"].append({"name": name, "kind": kind, "stem": stem})
+
+        tmp = path / (SCHEMA_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(schema, f, indent=2)
+        os.replace(tmp, path / SCHEMA_FILE)
+
+    @classmethod
+    def load(cls, path: Path) -> "MetadataTable":
+        path = Path(path)
+        with open(path / SCHEMA_FILE, "r") as f:
+            schema = json.load(f)
+
+        table = cls()
+        table._n_base = schema["rows"]
+
+        for col in schema["columns"]:
+            stem, kind = col["stem"], col["kind"]
+            entry = {"name": col["name"], "kind": kind}
+            if kind == "str":
+                entry["codes"] = np.load(path / f"{stem}.codes.npy", mmap_mode="r")
+                entry["dictionary"] = _StringColumn(path, f"{stem}.dict")
+            elif kind == "json":
+                entry["values"] = _StringColumn(path, f"{stem}.json")
+            else:
+                entry["values"] = np.load(path / f"{stem}.values.npy", mmap_mode="r")
+                entry["nulls"] = np.load(path / f"{stem}.nulls.npy", mmap_mode="r")
+            table._columns.append(entry)
+
+        return table
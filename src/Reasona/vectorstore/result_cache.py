@@ -0,0 +1,236 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from Reasona.utils.metrics import registry
+
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    return _SPACE.sub(" ", query).strip().lower()
+
+
+@dataclass
+class _Entry:
+    k: int
+    hits: List[Dict]
+    created: float
+    slot: Optional[int] = None  # row in the semantic tier, if embedded
+
+
+class ResultCache:
+    """
+    Two-level cache of retrieval results.
+
+    - exact:    keyed on the normalized query text (+ filters and mode)
+    - semantic: a new query whose embedding has cosine similarity >=
+                `semantic_threshold` with a cached query's embedding
+                reuses that query's hits (same filters and mode)
+
+    Entries are shared by both tiers: at most `max_entries`, evicted
+    least recently used, and dropped after `ttl_s` seconds. Hits cached
+    for k serve any request for k' <= k. Everything is dropped when the
+    store version passed to `validate` changes.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_s: Optional[float] = None,
+        semantic_threshold: Optional[float] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.semantic_threshold = semantic_threshold
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, Hashable], _Entry]" = OrderedDict()
+        self._version: Any = None
+
+        # semantic tier: unit vectors of embedded entries, one row per slot
+        self._vectors: Optional[np.ndarray] = None
+        self._slot_keys: List[Optional[Tuple[str, Hashable]]] = []
+        self._free_slots: List[int] = []
+
+        self.hits = {"exact": 0, "semantic": 0}
+        self.misses = 0
+
+    @property
+    def semantic(self) -> bool:
+        return self.semantic_threshold is not None
+
+    @staticmethod
+    def group(filters: Optional[Dict[str, Any]], mode: str) -> str:
+        return json.dumps([filters or None, mode], sort_keys=True)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ------------------------------------------------------------------
+    # Invalidation
+    # ------------------------------------------------------------------
+    def validate(self, version: Any) -> None:
+        """
+        Drop everything if `version` differs from the one the cached
+        hits were computed against.
+        """
+        with self._lock:
+            if version == self._version:
+                return
+            if self._entries:
+                registry.counter("result_cache.invalidations").inc()
+            self._version = version
+            self._entries.clear()
+            self._vectors = None
+            self._slot_keys, self._free_slots = [], []
+            registry.gauge("result_cache.size").set(0)
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return self.ttl_s is not None and now - entry.created > self.ttl_s
+
+    def _drop(self, key: Tuple[str, Hashable]) -> None:
+        entry = self._entries.pop(key)
+        if entry.slot is not None:
+            self._slot_keys[entry.slot] = None
+            self._free_slots.append(entry.slot)
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+    def _hit(self, key: Tuple[str, Hashable], k: int, now: float) -> Optional[List[Dict]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._expired(entry, now):
+            self._drop(key)
+            return None
+        # fewer hits than asked for means there were no more to find
+        if entry.k < k and len(entry.hits) == entry.k:
+            return None
+        self._entries.move_to_end(key)
+        return entry.hits[:k]
+
+    def get(self, query: str, k: int, group: Hashable) -> Optional[List[Dict]]:
+        with self._lock:
+            hits = self._hit((normalize_query(query), group), k, time.monotonic())
+        if hits is not None:
+            self._record("exact")
+        return hits
+
+    def get_similar(self, vector: np.ndarray, k: int, group: Hashable) -> Optional[List[Dict]]:
+        """
+        Hits of the most similar cached query above the threshold.
+        """
+        hits = None
+        with self._lock:
+            if self._vectors is not None and len(self._slot_keys):
+                n = len(self._slot_keys)
+                sims = self._vectors[:n] @ _unit(vector)
+                now = time.monotonic()
+                for slot in np.argsort(-sims):
+                    if sims[slot] < self.semantic_threshold:
+                        break
+                    key = self._slot_keys[slot]
+                    if key is None or key[1] != group:
+                        continue
+                    hits = self._hit(key, k, now)
+                    if hits is not None:
+                        break
+        if hits is not None:
+            self._record("semantic")
+        return hits
+
+    def _record(self, tier: str) -> None:
+        registry.counter(f"result_cache.{tier}_hits").inc()
+        with self._lock:
+            self.hits[tier] += 1
+        self._update_hit_rate()
+
+    def record_miss(self, n: int = 1) -> None:
+        """
+        Count queries that missed every tier and went to the index.
+        """
+        registry.counter("result_cache.misses").inc(n)
+        with self._lock:
+            self.misses += n
+        self._update_hit_rate()
+
+    def _update_hit_rate(self) -> None:
+        registry.gauge("result_cache.hit_rate").set(self.stats()["hit_rate"])
+
+    # ------------------------------------------------------------------
+    # Insert
+    # ------------------------------------------------------------------
+    def put(
+        self,
+        query: str,
+        k: int,
+        group: Hashable,
+        hits: List[Dict],
+        version: Any,
+        vector: Optional[np.ndarray] = None,
+    ) -> None:
+        """
+        Cache `hits` computed against store `version`; ignored if the
+        store has changed since.
+        """
+        if self.max_entries <= 0:
+            return
+        key = (normalize_query(query), group)
+        with self._lock:
+            if version != self._version:
+                return
+            if key in self._entries:
+                self._drop(key)
+            entry = _Entry(k=k, hits=hits, created=time.monotonic())
+            if vector is not None and self.semantic:
+                entry.slot = self._store_vector(key, vector)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+            registry.gauge("result_cache.size").set(len(self._entries))
+
+    def _store_vector(self, key: Tuple[str, Hashable], vector: np.ndarray) -> int:
+        unit = _unit(vector)
+        if self._vectors is None:
+            self._vectors = np.zeros((min(self.max_entries, 64), len(unit)), dtype=np.float32)
+
+        if self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            slot = len(self._slot_keys)
+            self._slot_keys.append(None)
+            if slot >= len(self._vectors):
+                rows = min(self.max_entries + 1, 2 * len(self._vectors))
+                grown = np.zeros((rows, len(unit)), dtype=np.float32)
+                grown[: len(self._vectors)] = self._vectors
+                self._vectors = grown
+
+        self._vectors[slot] = unit
+        self._slot_keys[slot] = key
+        return slot
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = sum(self.hits.values())
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.hits["exact"],
+                "semantic_hits": self.hits["semantic"],
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
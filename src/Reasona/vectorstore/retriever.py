@@ -1,15 +1,261 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
 import numpy as np
 
+from Reasona.utils.metrics import registry, SIZE_BUCKETS
+from Reasona.vectorstore.result_cache import ResultCache
+
+MODES = ("dense", "sparse", "hybrid")
+
 
 class Retriever:
-    def __init__(self, store, embedder):
+    """
+    Retrieval modes:
+    - dense:  embed the queries, FAISS search
+    - sparse: BM25 over the store's keyword index; never calls the encoder
+    - hybrid: both rankings (`hybrid_depth` hits each) fused by reciprocal
+              rank: score = sum over rankings of 1 / (rrf_k + rank)
+
+    With `result_cache_size > 0`, hit lists are cached per normalized
+    query (and, given `semantic_threshold`, reused for queries whose
+    embedding is that close in cosine similarity); the cache empties
+    itself whenever the store version changes.
+    """
+
+    def __init__(
+        self,
+        store,
+        embedder,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        query_cache_size: int = 1024,
+        mode: str = "dense",
+        rrf_k: int = 60,
+        hybrid_depth: int = 50,
+        result_cache_size: int = 0,
+        result_cache_ttl_s: Optional[float] = None,
+        semantic_threshold: Optional[float] = None,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}', expected one of {MODES}")
+        if mode != "dense" and not store.has_keywords:
+            raise ValueError(f"Retrieval mode '{mode}' needs a store built with a keyword index")
+
         self.store = store
         self.embedder = embedder
+        self.mode = mode
+        self.rrf_k = rrf_k
+        self.hybrid_depth = hybrid_depth
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.store.set_search_params(nprobe=nprobe, ef_search=ef_search)
 
-    def retrieve(self, query: str, k: int = 5):
-        q_vec = self.embedder.embed([query])
-        distances, indices = self.store.index.search(
-            np.array(q_vec).astype("float32"), k
+        # LRU of query text -> embedding, so repeated queries skip the encoder
+        self.query_cache_size = query_cache_size
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        self.result_cache: Optional[ResultCache] = (
+            ResultCache(result_cache_size, result_cache_ttl_s, semantic_threshold)
+            if result_cache_size > 0
+            else None
         )
+        self.reloader = None  # SnapshotReloader, when serving with hot reload
+
+    def swap_store(self, store) -> None:
+        """
+        Serve from `store` from now on. Calls already running finish on
+        the old store; the result cache sees the new store version and
+        empties itself.
+        """
+        if self.mode != "dense" and not store.has_keywords:
+            raise ValueError(f"Retrieval mode '{self.mode}' needs a store built with a keyword index")
+        store.set_search_params(nprobe=self.nprobe, ef_search=self.ef_search)
+        self.store = store
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        vectors: List[Optional[np.ndarray]] = [None] * len(queries)
+        missing: Dict[str, List[int]] = {}
+
+        with self._cache_lock:
+            for i, query in enumerate(queries):
+                cached = self._query_cache.get(query)
+                if cached is None:
+                    missing.setdefault(query, []).append(i)
+                else:
+                    self._query_cache.move_to_end(query)
+                    vectors[i] = cached
+
+        pending = sum(len(positions) for positions in missing.values())
+        registry.counter("retriever.query_cache_hits").inc(len(queries) - pending)
+        registry.counter("retriever.query_cache_misses").inc(len(missing))
+
+        if missing:
+            texts = list(missing)
+            encoded = np.asarray(self.embedder.embed(texts), dtype="float32")
+
+            with self._cache_lock:
+                for text, vec in zip(texts, encoded):
+                    for i in missing[text]:
+                        vectors[i] = vec
+                    if self.query_cache_size > 0:
+                        self._query_cache[text] = vec
+                        self._query_cache.move_to_end(text)
+                while len(self._query_cache) > self.query_cache_size:
+                    self._query_cache.popitem(last=False)
+
+        return np.stack(vectors).astype("float32", copy=False)
+
+    @registry.timed("retriever.latency_ms")
+    def retrieve_many(
+        self,
+        queries: List[str],
+        k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+        mode: Optional[str] = None,
+    ) -> List[List[Dict]]:
+        """
+        Encode all queries in one batch and search them in one matrix call.
+        Returns, per query, hits as {"id", "distance", "metadata"}; sparse
+        hits carry a BM25 "score" instead of "distance", hybrid hits the
+        fused "score" plus whichever of "distance" / "bm25" they got.
+        `filters` ({"lang": "en"}) restricts hits to matching metadata.
+        `mode` overrides the retriever's default mode for this call.
+        """
+        if not queries:
+            return []
+
+        mode = mode or self.mode
+        if mode not in MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}', expected one of {MODES}")
+
+        registry.counter("retriever.queries").inc(len(queries))
+        registry.counter(f"retriever.{mode}_queries").inc(len(queries))
+        registry.histogram("retriever.batch_size", SIZE_BUCKETS).observe(len(queries))
+
+        cache = self.result_cache
+        if cache is None:
+            return self._search(queries, k, filters, mode)
+
+        store, group = self.store, ResultCache.group(filters, mode)
+        version = store.version
+        cache.validate(version)
+
+        results: List[Optional[List[Dict]]] = [cache.get(q, k, group) for q in queries]
+        todo = [i for i, hits in enumerate(results) if hits is None]
+
+        # the semantic tier needs embeddings, which a dense / hybrid
+        # search would compute anyway; sparse lookups stay exact-only
+        q_vecs = None
+        if todo and cache.semantic and mode != "sparse":
+            q_vecs = self.embed_queries([queries[i] for i in todo])
+            similar = [cache.get_similar(vec, k, group) for vec in q_vecs]
+            for i, hits in zip(todo, similar):
+                results[i] = hits
+            q_vecs = q_vecs[[hits is None for hits in similar]]
+            todo = [i for i in todo if results[i] is None]
+
+        if todo:
+            cache.record_miss(len(todo))
+            searched = self._search(
+                [queries[i] for i in todo], k, filters, mode, q_vecs=q_vecs, store=store
+            )
+            for j, (i, hits) in enumerate(zip(todo, searched)):
+                results[i] = hits
+                cache.put(
+                    queries[i], k, group, hits, version,
+                    vector=q_vecs[j] if q_vecs is not None else None,
+                )
+
+        return [list(hits) for hits in results]
+
+    def _search(
+        self,
+        queries: List[str],
+        k: int,
+        filters: Optional[Dict[str, Any]],
+        mode: str,
+        q_vecs: Optional[np.ndarray] = None,
+        store=None,
+    ) -> List[List[Dict]]:
+        store = self.store if store is None else store
+        if mode == "sparse":
+            scores, indices = store.search_keywords(queries, k, filters=filters)
+            return [
+                [
+                    {"id": int(i), "score": float(s), "metadata": store.metadata[i]}
+                    for s, i in zip(row_scores, row_ids)
+                    if i != -1
+                ]
+                for row_scores, row_ids in zip(scores, indices)
+            ]
+        if mode == "hybrid":
+            return self._retrieve_hybrid(queries, k, filters, q_vecs, store)
+
+        if q_vecs is None:
+            q_vecs = self.embed_queries(queries)
+        distances, indices = store.search(q_vecs, k, filters=filters)
+
+        results = []
+        for row_dist, row_ids in zip(distances, indices):
+            # ANN indexes pad with -1 when fewer than k candidates are found
+            results.append(
+                [
+                    {
+                        "id": int(i),
+                        "distance": float(d),
+                        "metadata": store.metadata[i],
+                    }
+                    for d, i in zip(row_dist, row_ids)
+                    if i != -1
+                ]
+            )
+        return results
+
+    def _retrieve_hybrid(
+        self,
+        queries: List[str],
+        k: int,
+        filters: Optional[Dict[str, Any]],
+        q_vecs: Optional[np.ndarray],
+        store,
+    ) -> List[List[Dict]]:
+        depth = max(k, self.hybrid_depth)
+        bm25, sparse_ids = store.search_keywords(queries, depth, filters=filters)
+        if q_vecs is None:
+            q_vecs = self.embed_queries(queries)
+        distances, dense_ids = store.search(q_vecs, depth, filters=filters)
+
+        results = []
+        for q in range(len(queries)):
+            fused: Dict[int, Dict[str, Any]] = {}
+            for field, values, ids in (
+                ("distance", distances[q], dense_ids[q]),
+                ("bm25", bm25[q], sparse_ids[q]),
+            ):
+                for rank, (value, i) in enumerate(zip(values, ids), start=1):
+                    if i == -1:
+                        break
+                    hit = fused.setdefault(int(i), {"id": int(i), "score": 0.0})
+                    hit["score"] += 1.0 / (self.rrf_k + rank)
+                    hit[field] = float(value)
+
+            top = sorted(fused.values(), key=lambda h: (-h["score"], h["id"]))[:k]
+            for hit in top:
+                hit["metadata"] = store.metadata[hit["id"]]
+            results.append(top)
+        return results
 
-        return [self.store.metadata[i] for i in indices[0]]
+    def retrieve(
+        self,
+        query: str,
+        k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+        mode: Optional[str] = None,
+    ):
+        return [
+            hit["metadata"]
+            for hit in self.retrieve_many([query], k, filters=filters, mode=mode)[0]
+        ]
@@ -0,0 +1,581 @@
+import json
+import os
+import shutil
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from Reasona.utils.logger import setup_logger
+from Reasona.utils.metrics import registry
+from Reasona.vectorstore.faiss_store import FaissStore, _versions
+from Reasona.vectorstore.keyword_index import KeywordIndex, tokenize, top_k
+
+logger = setup_logger(__name__, "logs/vectorstore/segmented_store.json")
+
+SEGMENTS_FILE = "segments.json"
+SEGMENTS_DIR = "segments"
+# raw vectors kept next to IVF segments, whose codes cannot be decoded exactly
+VECTORS_FILE = "vectors.npy"
+
+# FaissStore constructor arguments recorded in segments.json
+STORE_FIELDS = (
+    "index_type", "nlist", "pq_m", "pq_nbits", "hnsw_m", "hnsw_ef_construction",
+    "train_size", "filter_fields", "keyword_index",
+)
+
+_PAD_DISTANCE = np.finfo(np.float32).max
+
+
+def _dir_bytes(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def _link_tree(src: Path, dst: Path) -> None:
+    """
+    Hard-link every file of `src` into `dst` (segments are immutable, so
+    sharing inodes is safe); copy where linking is not possible.
+    """
+    for path in src.rglob("*"):
+        target = dst / path.relative_to(src)
+        if path.is_dir():
+            target.mkdir(parents=True, exist_ok=True)
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(path, target)
+        except OSError:
+            shutil.copy2(path, target)
+
+
+@dataclass
+class Segment:
+    name: str
+    store: FaissStore          # loaded with mmap=True, read-only
+    nbytes: int                # on-disk size
+
+
+class _SegmentedMetadata:
+    """
+    Read-only list view over the metadata of consecutive stores.
+    """
+
+    def __init__(self, parts: List[Tuple[int, FaissStore]]):
+        self._offsets = [offset for offset, _ in parts]
+        self._tables = [store.metadata for _, store in parts]
+        self._size = parts[-1][0] + len(parts[-1][1]) if parts else 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, i: int) -> Dict:
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError(i)
+        part = int(np.searchsorted(self._offsets, i, side="right")) - 1
+        return self._tables[part][i - self._offsets[part]]
+
+    def __iter__(self) -> Iterator[Dict]:
+        for table in self._tables:
+            yield from table
+
+
+class SegmentedStore:
+    """
+    LSM-style FaissStore: one in-memory (active) segment plus immutable
+    segments on disk, each a saved FaissStore mapped read-only.
+
+    - `add` goes to the active segment; once its estimated size passes
+      `memory_budget_mb` it is saved under `<work_dir>/segments/` and
+      replaced by an empty one, so resident memory stays bounded
+      whatever the corpus size.
+    - Searches fan out over all segments (active included) and merge the
+      per-segment top-k by (distance, ID). Segment IDs are offset by the
+      sizes of the segments before them, so IDs match a single store
+      built from the same stream. With flat indexes results are
+      identical; ANN segments are searched with the same knobs but
+      each has its own graph / centroids.
+    - BM25 scores use corpus-wide document frequencies and lengths, so
+      keyword results match a single keyword index too.
+    - A background thread merges runs of `compaction_min_segments`
+      adjacent segments smaller than half of `max_segment_mb` (default
+      4x the budget) into one, keeping the fan-out short. A merge holds
+      one output segment in memory, so a build peaks at about
+      `memory_budget_mb + max_segment_mb` plus per-segment bookkeeping.
+
+    Without a `work_dir` the store is read-only (serving a saved one).
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        work_dir: Optional[Path] = None,
+        memory_budget_mb: float = 1024,
+        max_segment_mb: Optional[float] = None,
+        compaction_min_segments: int = 4,
+        background_compaction: bool = True,
+        **store_kwargs,
+    ):
+        unknown = set(store_kwargs) - set(STORE_FIELDS)
+        if unknown:
+            raise TypeError(f"Unknown store arguments: {sorted(unknown)}")
+
+        self.dim = dim
+        self.store_kwargs = dict(store_kwargs)
+        self.index_type = self.store_kwargs.get("index_type", "flat")
+        self.memory_budget = int(memory_budget_mb * 2**20)
+        self.max_segment_bytes = int((max_segment_mb or 4 * memory_budget_mb) * 2**20)
+        self.compaction_min_segments = max(2, compaction_min_segments)
+
+        self.work_dir = Path(work_dir) if work_dir is not None else None
+        self.read_only = self.work_dir is None
+        self.version = next(_versions)
+        self.snapshot: Optional[Dict[str, Any]] = None
+
+        self._lock = threading.RLock()          # segment list / active swap
+        self._write_lock = threading.Lock()     # one flush at a time
+        self._compact_lock = threading.Lock()   # one merge at a time
+        self._segments: List[Segment] = []
+        self._search_params: Dict[str, Optional[int]] = {}
+        self._next_id = 1
+        self._metadata_view: Optional[_SegmentedMetadata] = None
+
+        self._active = self._new_active()
+        self._active_vectors: List[np.ndarray] = []
+
+        self._compact_wanted = threading.Event()
+        self._closed = threading.Event()
+        self._compactor: Optional[threading.Thread] = None
+        if not self.read_only:
+            # a fresh build owns its work dir
+            shutil.rmtree(self.segments_dir, ignore_errors=True)
+            self.segments_dir.mkdir(parents=True)
+            if background_compaction:
+                self._compactor = threading.Thread(
+                    target=self._compact_loop, name="segment-compactor", daemon=True
+                )
+                self._compactor.start()
+
+    @classmethod
+    def from_config(cls, dim: int, cfg) -> "SegmentedStore":
+        """
+        Empty store for an IndexingConfig with `memory_budget_mb` set.
+        """
+        return cls(
+            dim,
+            work_dir=cfg.vector_store_dir / "building",
+            memory_budget_mb=cfg.memory_budget_mb,
+            max_segment_mb=cfg.max_segment_mb,
+            compaction_min_segments=cfg.compaction_min_segments,
+            index_type=cfg.index_type,
+            nlist=cfg.nlist,
+            pq_m=cfg.pq_m,
+            pq_nbits=cfg.pq_nbits,
+            hnsw_m=cfg.hnsw_m,
+            hnsw_ef_construction=cfg.hnsw_ef_construction,
+            train_size=cfg.train_size,
+            filter_fields=cfg.filter_fields,
+            keyword_index=cfg.keyword_index,
+        )
+
+    @property
+    def segments_dir(self) -> Path:
+        return self.work_dir / SEGMENTS_DIR
+
+    def _new_active(self) -> FaissStore:
+        store = FaissStore(self.dim, **self.store_kwargs)
+        store.set_search_params(**self._search_params)
+        return store
+
+    def _parts(self) -> List[Tuple[int, FaissStore]]:
+        """
+        (ID offset, store) of every segment, the active one last.
+        """
+        with self._lock:
+            stores = [s.store for s in self._segments]
+            if len(self._active):
+                stores.append(self._active)
+        parts, offset = [], 0
+        for store in stores:
+            parts.append((offset, store))
+            offset += len(store)
+        return parts
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(s.store) for s in self._segments) + len(self._active)
+
+    @property
+    def segments(self) -> List[Segment]:
+        with self._lock:
+            return list(self._segments)
+
+    @property
+    def metadata(self) -> _SegmentedMetadata:
+        # rebuilt after adds, flushes and merges; IDs never move between them
+        view = self._metadata_view
+        if view is None:
+            view = self._metadata_view = _SegmentedMetadata(self._parts())
+        return view
+
+    @property
+    def has_keywords(self) -> bool:
+        return bool(self.store_kwargs.get("keyword_index"))
+
+    def memory_bytes(self) -> int:
+        return self._active.memory_bytes() + sum(v.nbytes for v in self._active_vectors)
+
+    # ------------------------------------------------------------------
+    # Build
+    # ------------------------------------------------------------------
+    @registry.timed("segments.add_ms")
+    def add(self, vectors, metadata, texts: Optional[Sequence[str]] = None):
+        if self.read_only:
+            raise ValueError("SegmentedStore has no work_dir and is read-only")
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        self._active.add(vectors, metadata, texts)
+        self._metadata_view = None
+        if self.index_type in ("ivf_flat", "ivf_pq"):
+            self._active_vectors.append(vectors)
+        self.version = next(_versions)
+
+        active_bytes = self.memory_bytes()
+        registry.gauge("segments.active_bytes").set(active_bytes)
+        if active_bytes >= self.memory_budget:
+            self.flush()
+
+    def _write_segment(self, store: FaissStore, vectors: Optional[np.ndarray]) -> Segment:
+        with self._lock:
+            name = f"seg-{self._next_id:06d}"
+            self._next_id += 1
+        tmp = self.segments_dir / f".{name}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        store.save(tmp)
+        if vectors is not None:
+            np.save(tmp / VECTORS_FILE, vectors)
+        os.rename(tmp, self.segments_dir / name)
+        return self._open_segment(self.segments_dir / name)
+
+    def _open_segment(self, path: Path) -> Segment:
+        store = FaissStore(dim=self.dim)
+        store.load(path, mmap=True)
+        store.set_search_params(**self._search_params)
+        return Segment(name=path.name, store=store, nbytes=_dir_bytes(path))
+
+    def flush(self) -> None:
+        """
+        Seal the active segment to disk (no-op when it is empty).
+        """
+        with self._write_lock:
+            if not len(self._active):
+                return
+            vectors = np.concatenate(self._active_vectors) if self._active_vectors else None
+            segment = self._write_segment(self._active, vectors)
+
+            # the sealed copy answers exactly like the active one did
+            with self._lock:
+                self._segments.append(segment)
+                self._active = self._new_active()
+                self._active_vectors = []
+                self._metadata_view = None
+                self._write_manifest(self.work_dir)
+
+        registry.counter("segments.flushes").inc()
+        registry.gauge("segments.count").set(len(self._segments))
+        logger.info(
+            f"Flushed segment {segment.name} | vectors={len(segment.store)}, "
+            f"bytes={segment.nbytes}, segments={len(self._segments)}"
+        )
+        if self._compactor is not None:
+            self._compact_wanted.set()
+
+    # ------------------------------------------------------------------
+    # Compaction
+    # ------------------------------------------------------------------
+    def _pick_merge(self) -> Optional[List[Segment]]:
+        small = self.max_segment_bytes // 2
+        segments = self.segments
+        i = 0
+        while i < len(segments):
+            if segments[i].nbytes >= small:
+                i += 1
+                continue
+            run, total = [segments[i]], segments[i].nbytes
+            j = i + 1
+            while (
+                j < len(segments)
+                and segments[j].nbytes < small
+                and total + segments[j].nbytes <= self.max_segment_bytes
+            ):
+                run.append(segments[j])
+                total += segments[j].nbytes
+                j += 1
+            if len(run) >= self.compaction_min_segments:
+                return run
+            i = j
+        return None
+
+    def _segment_vectors(self, segment: Segment) -> np.ndarray:
+        path = self.segments_dir / segment.name / VECTORS_FILE
+        if path.exists():
+            return np.load(path, mmap_mode="r")
+        index = segment.store.index
+        return index.reconstruct_n(0, index.ntotal)
+
+    def _merge(self, run: List[Segment]) -> Segment:
+        kwargs = {**self.store_kwargs, "keyword_index": False}
+        merged = FaissStore(self.dim, **kwargs)
+        keep_vectors = self.index_type in ("ivf_flat", "ivf_pq")
+        raw = []
+        for segment in run:
+            vectors = np.ascontiguousarray(self._segment_vectors(segment), dtype="float32")
+            merged.add(vectors, list(segment.store.metadata))
+            if keep_vectors:
+                raw.append(vectors)
+        if self.has_keywords:
+            merged.keywords = KeywordIndex.concat([s.store.keywords for s in run])
+        return self._write_segment(merged, np.concatenate(raw) if raw else None)
+
+    def compact(self) -> int:
+        """
+        Run merges until none is due. Returns the number of merges.
+        """
+        merges = 0
+        while not self._closed.is_set():
+            # flushes keep running during the merge: they only append, and
+            # only a merge removes segments, so the run stays in place
+            with self._compact_lock:
+                run = self._pick_merge()
+                if run is None:
+                    return merges
+                with registry.timer("segments.merge_ms"):
+                    merged = self._merge(run)
+                with self._lock:
+                    start = next(i for i, s in enumerate(self._segments) if s is run[0])
+                    self._segments[start:start + len(run)] = [merged]
+                    self._metadata_view = None
+                    self._write_manifest(self.work_dir)
+                    # ANN segments rebuilt from the merged vectors can rank differently
+                    self.version = next(_versions)
+
+            # nothing links these any more; open mappings keep their inodes
+            for segment in run:
+                shutil.rmtree(self.segments_dir / segment.name, ignore_errors=True)
+            merges += 1
+            registry.counter("segments.merges").inc()
+            registry.gauge("segments.count").set(len(self._segments))
+            logger.info(
+                f"Merged {[s.name for s in run]} into {merged.name} | "
+                f"vectors={len(merged.store)}, bytes={merged.nbytes}"
+            )
+        return merges
+
+    def _compact_loop(self) -> None:
+        while not self._closed.is_set():
+            self._compact_wanted.wait()
+            self._compact_wanted.clear()
+            try:
+                self.compact()
+            except Exception as exc:
+                registry.counter("segments.merge_errors").inc()
+                logger.error(f"Segment compaction failed: {exc}")
+
+    def close(self, remove_work_dir: bool = False) -> None:
+        """
+        Stop background compaction (a merge in progress finishes first).
+        `remove_work_dir` then deletes the segments once they have been
+        saved elsewhere; mapped segments keep serving and the store
+        becomes read-only.
+        """
+        self._closed.set()
+        self._compact_wanted.set()
+        if self._compactor is not None and self._compactor.is_alive():
+            self._compactor.join()
+        if remove_work_dir and self.work_dir is not None:
+            self.read_only = True
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+    def set_search_params(
+        self, nprobe: Optional[int] = None, ef_search: Optional[int] = None
+    ) -> None:
+        if nprobe is not None:
+            self._search_params["nprobe"] = nprobe
+        if ef_search is not None:
+            self._search_params["ef_search"] = ef_search
+        for _, store in self._parts():
+            store.set_search_params(nprobe=nprobe, ef_search=ef_search)
+
+    @registry.timed("segments.search_ms")
+    def search(self, queries, k: int, filters: Optional[Dict[str, Any]] = None):
+        queries = np.ascontiguousarray(queries, dtype="float32")
+        parts = self._parts()
+        if not parts:
+            return (
+                np.full((len(queries), k), _PAD_DISTANCE, dtype=np.float32),
+                np.full((len(queries), k), -1, dtype=np.int64),
+            )
+
+        distances, indices = [], []
+        for offset, store in parts:
+            d, i = store.search(queries, k, filters=filters)
+            missing = i < 0
+            distances.append(np.where(missing, np.inf, d))
+            indices.append(np.where(missing, -1, i + offset))
+        distances = np.concatenate(distances, axis=1)
+        indices = np.concatenate(indices, axis=1)
+
+        order = np.lexsort((indices, distances), axis=1)[:, :k]
+        distances = np.take_along_axis(distances, order, axis=1)
+        indices = np.take_along_axis(indices, order, axis=1)
+        return np.where(np.isinf(distances), _PAD_DISTANCE, distances).astype(np.float32), indices
+
+    @registry.timed("keywords.search_ms")
+    def search_keywords(
+        self, queries: Sequence[str], k: int, filters: Optional[Dict[str, Any]] = None
+    ):
+        """
+        BM25 over all segments with corpus-wide statistics.
+        """
+        if not self.has_keywords:
+            raise ValueError("Store has no keyword index (build with keyword_index=True)")
+        registry.counter("keywords.queries").inc(len(queries))
+        parts = self._parts()
+
+        docs = sum(len(store.keywords) for _, store in parts)
+        tokens = sum(store.keywords.total_tokens for _, store in parts)
+        stats = []
+        for query in queries:
+            terms = set(tokenize(query))
+            dfs = dict.fromkeys(terms, 0)
+            for _, store in parts:
+                for term, df in store.keywords.document_frequencies(terms).items():
+                    dfs[term] += df
+            stats.append((docs, tokens, dfs))
+
+        scores, indices = [], []
+        for offset, store in parts:
+            allowed = store.filters.bitmap(filters) if filters else None
+            s, i = store.keywords.search(queries, k, allowed, stats)
+            scores.append(s)
+            indices.append(np.where(i < 0, -1, i + offset))
+
+        out_scores = np.zeros((len(queries), k), dtype=np.float32)
+        out_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for row in range(len(queries)):
+            ids = np.concatenate([i[row] for i in indices]) if indices else np.zeros(0, np.int64)
+            row_scores = np.concatenate([s[row] for s in scores]) if scores else np.zeros(0)
+            valid = ids >= 0
+            ids, row_scores = ids[valid], row_scores[valid]
+            top = top_k(ids, row_scores, k)
+            out_scores[row, : len(top)] = row_scores[top]
+            out_ids[row, : len(top)] = ids[top]
+        return out_scores, out_ids
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def _write_manifest(self, path: Path) -> None:
+        info = {
+            "dim": self.dim,
+            "count": sum(len(s.store) for s in self._segments),
+            "store": {
+                k: list(v) if isinstance(v, tuple) else v for k, v in self.store_kwargs.items()
+            },
+            "segments": [
+                {"name": s.name, "count": len(s.store), "bytes": s.nbytes} for s in self._segments
+            ],
+        }
+        tmp = path / (SEGMENTS_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(info, f, indent=2)
+        os.replace(tmp, path / SEGMENTS_FILE)
+
+    @registry.timed("segments.save_ms")
+    def save(self, path: Path, finalize: bool = True):
+        """
+        Flush the active segment and link every segment into `path`
+        (files are shared, not copied). `finalize` is accepted for
+        FaissStore compatibility; segments are always trained.
+        """
+        path = Path(path)
+        if not self.read_only:
+            self.flush()
+        with self._lock:
+            target = path / SEGMENTS_DIR
+            target.mkdir(parents=True, exist_ok=True)
+            for segment in self._segments:
+                source = self.segments_dir / segment.name if self.work_dir else None
+                if source is None or source.resolve() == (target / segment.name).resolve():
+                    continue
+                _link_tree(source, target / segment.name)
+            self._write_manifest(path)
+
+    @classmethod
+    def load_from(cls, path: Path, work_dir: Optional[Path] = None, **options) -> "SegmentedStore":
+        """
+        Open a saved store. With `work_dir` its segments are linked there
+        and the store accepts further adds (resuming a build); without,
+        it is read-only.
+        """
+        path = Path(path)
+        with open(path / SEGMENTS_FILE, "r") as f:
+            info = json.load(f)
+
+        store_kwargs = dict(info["store"])
+        if "filter_fields" in store_kwargs:
+            store_kwargs["filter_fields"] = tuple(store_kwargs["filter_fields"])
+        store = cls(info["dim"], work_dir=work_dir, **options, **store_kwargs)
+        if store.read_only:
+            store.work_dir = path
+
+        for entry in info["segments"]:
+            source = path / SEGMENTS_DIR / entry["name"]
+            if work_dir is not None:
+                _link_tree(source, store.segments_dir / entry["name"])
+                source = store.segments_dir / entry["name"]
+            store._segments.append(store._open_segment(source))
+            store._metadata_view = None
+            store._next_id = max(store._next_id, int(entry["name"].split("-")[1]) + 1)
+
+        store.version = next(_versions)
+        return store
+
+
+def create_store(dim: int, cfg):
+    """
+    Empty store for an IndexingConfig: segmented when a memory budget is
+    configured, a single in-memory FaissStore otherwise.
+    """
+    if cfg.memory_budget_mb:
+        return SegmentedStore.from_config(dim, cfg)
+    return FaissStore.from_config(dim, cfg)
+
+
+def load_store(path: Path, mmap: bool = False, cfg=None):
+    """
+    Open a saved FaissStore or SegmentedStore directory. Given an
+    IndexingConfig, a segmented store is reopened in its work dir so
+    the build can continue.
+    """
+    path = Path(path)
+    if (path / SEGMENTS_FILE).exists():
+        if cfg is None or not cfg.memory_budget_mb:
+            return SegmentedStore.load_from(path)
+        return SegmentedStore.load_from(
+            path,
+            work_dir=cfg.vector_store_dir / "building",
+            memory_budget_mb=cfg.memory_budget_mb,
+            max_segment_mb=cfg.max_segment_mb,
+            compaction_min_segments=cfg.compaction_min_segments,
+        )
+
+    store = FaissStore(dim=1)
+    store.load(path, mmap=mmap)
+    return store
@@ -0,0 +1,340 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from Reasona.utils.logger import setup_logger
+from Reasona.utils.metrics import registry
+
+logger = setup_logger(__name__, "logs/vectorstore/snapshots.json")
+
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+SNAPSHOTS_DIR = "snapshots"
+
+_SNAPSHOT_NAME = re.compile(r"^v(\d{6,})$")
+
+
+def _sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _fsync_dir(path: Path) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class SnapshotManager:
+    """
+    Immutable, versioned store snapshots under one root:
+
+        root/
+          CURRENT                 name of the live snapshot ("v000003")
+          snapshots/v000001/      a saved store + manifest.json
+          snapshots/v000002/
+          ...
+
+    `publish` saves into a temp directory, writes the manifest (version,
+    embedding model, dim, count, per-file size + sha256) and renames the
+    directory into place; only then is CURRENT swapped, itself by
+    write-then-rename. Readers therefore see either the old snapshot or
+    the new one, never a partial write, and a snapshot is never modified
+    after it is published.
+
+    A root without CURRENT is read as a plain store directory (the
+    layout written by `FaissStore.save` / `SegmentedStore.save`).
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.snapshots_dir = self.root / SNAPSHOTS_DIR
+
+    # ------------------------------------------------------------------
+    # Layout
+    # ------------------------------------------------------------------
+    def versions(self) -> List[int]:
+        if not self.snapshots_dir.exists():
+            return []
+        found = []
+        for entry in self.snapshots_dir.iterdir():
+            match = _SNAPSHOT_NAME.match(entry.name)
+            if match and (entry / MANIFEST_FILE).exists():
+                found.append(int(match.group(1)))
+        return sorted(found)
+
+    @staticmethod
+    def name(version: int) -> str:
+        return f"v{version:06d}"
+
+    def path(self, version: int) -> Path:
+        return self.snapshots_dir / self.name(version)
+
+    def current(self) -> Optional[int]:
+        try:
+            name = (self.root / CURRENT_FILE).read_text().strip()
+        except FileNotFoundError:
+            return None
+        match = _SNAPSHOT_NAME.match(name)
+        if not match:
+            raise ValueError(f"Malformed {CURRENT_FILE} in {self.root}: {name!r}")
+        return int(match.group(1))
+
+    def resolve(self) -> Path:
+        """
+        Directory of the live store: the current snapshot, or the root
+        itself for stores saved without snapshots.
+        """
+        version = self.current()
+        return self.root if version is None else self.path(version)
+
+    def manifest(self, version: int) -> Dict[str, Any]:
+        with open(self.path(version) / MANIFEST_FILE, "r") as f:
+            return json.load(f)
+
+    # ------------------------------------------------------------------
+    # Publish
+    # ------------------------------------------------------------------
+    @registry.timed("snapshots.publish_ms")
+    def publish(self, store, embedding_model: Optional[str] = None) -> int:
+        """
+        Save `store` as the next snapshot and make it current. Returns
+        its version.
+        """
+        self.snapshots_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.snapshots_dir / f".tmp-{os.getpid()}-{threading.get_ident()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+
+        try:
+            store.save(tmp)
+            files = {
+                str(p.relative_to(tmp)): {"size": p.stat().st_size, "sha256": _sha256(p)}
+                for p in sorted(tmp.rglob("*"))
+                if p.is_file()
+            }
+            manifest = {
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "embedding_model": embedding_model,
+                "dim": store.dim,
+                "count": len(store),
+                "index_type": getattr(store, "index_type", None),
+                "files": files,
+            }
+
+            # another publisher may take the same number; retry with the next
+            version = (self.versions() or [0])[-1] + 1
+            while True:
+                manifest["version"] = version
+                with open(tmp / MANIFEST_FILE, "w") as f:
+                    json.dump(manifest, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                try:
+                    os.rename(tmp, self.path(version))
+                    break
+                except OSError:
+                    if not self.path(version).exists():
+                        raise
+                    version += 1
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+        _fsync_dir(self.snapshots_dir)
+        self._set_current(version)
+        registry.gauge("snapshots.current_version").set(version)
+        logger.info(
+            f"Published snapshot | version={version}, count={manifest['count']}, "
+            f"files={len(files)}, dir={self.path(version)}"
+        )
+        return version
+
+    def _set_current(self, version: int) -> None:
+        tmp = self.root / f"{CURRENT_FILE}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp, "w") as f:
+            f.write(self.name(version) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.root / CURRENT_FILE)
+        _fsync_dir(self.root)
+
+    def rollback(self, version: int) -> None:
+        """
+        Point CURRENT back at an older (still present) snapshot.
+        """
+        self.verify(version, checksums=False)
+        self._set_current(version)
+        logger.info(f"CURRENT set to snapshot {version}")
+
+    # ------------------------------------------------------------------
+    # Load / verify
+    # ------------------------------------------------------------------
+    def verify(self, version: int, checksums: bool = True) -> Dict[str, Any]:
+        """
+        Check every manifest file exists with the recorded size (and,
+        with `checksums`, sha256). Returns the manifest.
+        """
+        manifest = self.manifest(version)
+        base = self.path(version)
+        for rel, entry in manifest["files"].items():
+            path = base / rel
+            if not path.exists() or path.stat().st_size != entry["size"]:
+                raise ValueError(f"Snapshot {version} is damaged: {rel} is missing or resized")
+            if checksums and _sha256(path) != entry["sha256"]:
+                raise ValueError(f"Snapshot {version} is damaged: {rel} checksum mismatch")
+        return manifest
+
+    def load(self, version: Optional[int] = None, mmap: bool = False, checksums: bool = False):
+        """
+        Store for `version` (default: current): a FaissStore, or a
+        read-only SegmentedStore if one was published. The store's
+        `snapshot` attribute holds the manifest, or None for a plain
+        store directory.
+        """
+        from Reasona.vectorstore.segmented_store import load_store
+
+        if version is None:
+            version = self.current()
+
+        if version is None:
+            store = load_store(self.root, mmap=mmap)
+            store.snapshot = None
+            return store
+
+        manifest = self.verify(version, checksums=checksums)
+        store = load_store(self.path(version), mmap=mmap)
+        store.snapshot = manifest
+        return store
+
+    # ------------------------------------------------------------------
+    # Garbage collection
+    # ------------------------------------------------------------------
+    def gc(self, keep: int = 3) -> List[int]:
+        """
+        Delete all but the newest `keep` snapshots; the current one is
+        always kept. Readers that already mapped a deleted snapshot keep
+        working (the files live on until unmapped). Returns the deleted
+        versions.
+        """
+        current = self.current()
+        versions = self.versions()
+        doomed = [v for v in versions[: max(0, len(versions) - keep)] if v != current]
+        for version in doomed:
+            # rename first so a half-deleted snapshot never looks valid
+            trash = self.snapshots_dir / f".gc-{self.name(version)}-{os.getpid()}"
+            os.rename(self.path(version), trash)
+            shutil.rmtree(trash, ignore_errors=True)
+
+        for leftover in self.snapshots_dir.glob(".tmp-*") if self.snapshots_dir.exists() else ():
+            # temp dirs of crashed publishers; live ones are at most minutes old
+            if time.time() - leftover.stat().st_mtime > 3600:
+                shutil.rmtree(leftover, ignore_errors=True)
+
+        if doomed:
+            registry.counter("snapshots.deleted").inc(len(doomed))
+            logger.info(f"Snapshot GC | deleted={doomed}, kept={self.versions()}")
+        return doomed
+
+
+class SnapshotReloader:
+    """
+    Background thread that watches CURRENT and hot-swaps the retriever's
+    store when it moves.
+
+    The new snapshot is loaded off the serving path; the swap itself is a single
+    reference assignment, so queries are never blocked: those already
+    running finish on the old store, later ones use the new one. A
+    snapshot built with a different embedding model is refused.
+    """
+
+    def __init__(
+        self,
+        retriever,
+        manager: SnapshotManager,
+        interval_s: float = 10.0,
+        mmap: bool = False,
+        expected_model: Optional[str] = None,
+        checksums: bool = False,
+    ):
+        self.retriever = retriever
+        self.manager = manager
+        self.interval_s = interval_s
+        self.mmap = mmap
+        self.expected_model = expected_model
+        self.checksums = checksums
+
+        snapshot = getattr(retriever.store, "snapshot", None)
+        self.version: Optional[int] = snapshot["version"] if snapshot else None
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="snapshot-reloader", daemon=True)
+
+    def start(self) -> "SnapshotReloader":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def check(self) -> bool:
+        """
+        Swap to the current snapshot if it changed. Returns True on swap.
+        """
+        version = self.manager.current()
+        if version is None or version == self.version:
+            return False
+
+        manifest = self.manager.manifest(version)
+        built_with = manifest.get("embedding_model")
+        if self.expected_model and built_with and built_with != self.expected_model:
+            logger.error(
+                f"Not loading snapshot {version}: built with "
+                f"{built_with}, serving {self.expected_model}"
+            )
+            self.version = version
+            return False
+
+        t0 = time.perf_counter()
+        store = self.manager.load(version, mmap=self.mmap, checksums=self.checksums)
+        self.retriever.swap_store(store)
+        self.version = version
+
+        elapsed_ms = (time.perf_counter() - t0) * 1000.0
+        registry.counter("snapshots.reloads").inc()
+        registry.histogram("snapshots.reload_ms").observe(elapsed_ms)
+        registry.gauge("snapshots.current_version").set(version)
+        logger.info(
+            f"Swapped to snapshot {version} | vectors={len(store)}, load_ms={elapsed_ms:.0f}"
+        )
+        return True
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.check()
+            except Exception as exc:
+                # keep serving the old snapshot; retry on the next tick
+                registry.counter("snapshots.reload_errors").inc()
+                logger.error(f"Snapshot reload failed: {exc}")
@@ -0,0 +1,304 @@
+import numpy as np
+
+from Reasona.data.embedding_cache import EmbeddingCache, cache_key
+
+MODEL = "test-model"
+
+
+def _vectors(texts, dim=8):
+    seeds = [int.from_bytes(cache_key(MODEL, t)[:4], "little") for t in texts]
+    return np.stack([np.random.default_rng(s).random(dim, dtype=np.float32) for s in seeds])
+
+
+def _keys(texts):
+    return [cache_key(MODEL, t) for t in texts]
+
+
+def test_embedding_cache_roundtrip(tmp_path):
+    texts = [f"text {i}" for i in range(5)]
+    cache = EmbeddingCache(tmp_path, MODEL, max_entries=10)
+    cache.put_many(_keys(texts), _vectors(texts))
+    cache.save()
+
+    reopened = EmbeddingCache(tmp_path, MODEL, max_entries=10)
+    vectors, hit = reopened.get_many(_keys(texts))
+    assert hit.all()
+    np.testing.assert_array_equal(vectors, _vectors(texts))
+
+
+def test_embedding_cache_reopen_after_unsaved_eviction(tmp_path):
+    old = [f"old {i}" for i in range(4)]
+    new = [f"new {i}" for i in range(4)]
+
+    cache = EmbeddingCache(tmp_path, MODEL, max_entries=4)
+    cache.put_many(_keys(old), _vectors(old))
+    cache.save()
+    # evicts every old entry and reuses its row, then "crashes" before save()
+    cache.put_many(_keys(new), _vectors(new))
+    assert cache.evictions == 4
+    del cache
+
+    reopened = EmbeddingCache(tmp_path, MODEL, max_entries=4)
+    vectors, hit = reopened.get_many(_keys(old))
+    assert not hit.any()
+    assert len(reopened.slots) == 0
+
+    # the released rows are reused without clobbering each other
+    extra = [f"extra {i}" for i in range(4)]
+    reopened.put_many(_keys(extra), _vectors(extra))
+    vectors, hit = reopened.get_many(_keys(extra))
+    assert hit.all()
+    np.testing.assert_array_equal(vectors, _vectors(extra))
+
+
+def test_embedding_cache_lru_eviction(tmp_path):
+    texts = [f"text {i}" for i in range(6)]
+    cache = EmbeddingCache(tmp_path, MODEL, max_entries=4)
+    cache.put_many(_keys(texts[:4]), _vectors(texts[:4]))
+    cache.get_many(_keys(texts[:2]))  # 2 and 3 are now least recently used
+    cache.put_many(_keys(texts[4:]), _vectors(texts[4:]))
+
+    vectors, hit = cache.get_many(_keys(texts))
+    assert hit.tolist() == [True, True, False, False, True, True]
+    np.testing.assert_array_equal(vectors[hit], _vectors([texts[i] for i in (0, 1, 4, 5)]))
+
+
+def test_checkpoint_recovers_from_crash_between_renames(tmp_path):
+    from Reasona.pipeline.checkpoint import IndexCheckpoint
+    from Reasona.vectorstore.faiss_store import FaissStore
+
+    store = FaissStore(dim=4)
+    store.add(np.eye(4, dtype=np.float32), [{"text": str(i)} for i in range(4)])
+    checkpoint = IndexCheckpoint(tmp_path / "checkpoint", every_samples=1)
+    checkpoint.save(store, {"split": "train", "samples_consumed": 4})
+
+    # the previous checkpoint was moved aside, the new one never moved in
+    (tmp_path / "checkpoint").rename(tmp_path / "checkpoint.old")
+
+    restored, state = IndexCheckpoint(tmp_path / "checkpoint").load()
+    assert state["samples_consumed"] == 4
+    assert len(restored) == 4
+
+    checkpoint.save(store, {"split": "train", "samples_consumed": 8})
+    assert not (tmp_path / "checkpoint.old").exists()
+
+
+def test_local_loader_readers_exit_when_consumer_stops(tmp_path):
+    import json
+    import threading
+    import time
+
+    from Reasona.data.local_loader import LocalShardedDatasetProcessor
+
+    for shard in range(3):
+        with open(tmp_path / f"train-{shard}.jsonl", "w") as f:
+            f.write(json.dumps({"query": f"q{shard}"}) + "\n")
+
+    before = threading.active_count()
+    loader = LocalShardedDatasetProcessor(tmp_path, num_readers=3, batch_size=1, prefetch=1)
+    stream = loader.stream_batches("train")
+    next(stream)
+    # every other reader is now blocked handing over its end-of-shard marker
+    time.sleep(0.3)
+    stream.close()
+
+    deadline = time.monotonic() + 2.0
+    while threading.active_count() > before and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert threading.active_count() == before
+
+
+class StubEmbedder:
+    """
+    Deterministic stand-in for the sentence-transformers model.
+    """
+
+    def embed(self, texts, batch_size=None, show_progress_bar=True):
+        return _vectors(texts)
+
+
+def _dedup_corpus(path):
+    import json
+
+    rng = np.random.default_rng(0)
+    words = [f"w{i}" for i in range(500)]
+    samples = []
+    for i in range(90):
+        if i % 6 == 5:
+            # exact and near duplicates of earlier samples
+            text = samples[i - 3] if i % 12 == 5 else samples[i - 4] + " tail"
+        else:
+            text = " ".join(rng.choice(words, 40))
+        samples.append(text)
+    with open(path / "train-0.jsonl", "w") as f:
+        for text in samples:
+            f.write(json.dumps({"query": text, "lang": "en"}) + "\n")
+
+
+def _dedup_pipeline(tmp_path, **indexing):
+    from Reasona.entities.config_entity import IndexingConfig, PreprocessConfig
+    from Reasona.pipeline.indexing_pipeline import IndexingPipeline
+
+    preprocess = PreprocessConfig(
+        source="local",
+        local_dir=tmp_path / "data",
+        num_readers=1,
+        read_batch_size=16,
+        schema_path=tmp_path / "no-schema.yaml",
+        dedup=True,
+        dedup_threshold=0.7,
+    )
+    pipeline = IndexingPipeline(
+        preprocess,
+        IndexingConfig(chunk_size=16, chunk_overlap=0, embed_batch_size=8, **indexing),
+    )
+    pipeline.embedder = StubEmbedder()
+    return pipeline
+
+
+def test_dedup_resume_matches_uninterrupted_run(tmp_path):
+    (tmp_path / "data").mkdir()
+    _dedup_corpus(tmp_path / "data")
+
+    full = _dedup_pipeline(tmp_path, vector_store_dir=tmp_path / "full")
+    full.run()
+    assert full.dedup.stats["samples_dropped"] > 0
+
+    # checkpoints fall in the middle of 16-sample read batches
+    interrupted = _dedup_pipeline(
+        tmp_path, vector_store_dir=tmp_path / "resumed", checkpoint_every_samples=10
+    )
+    index_batch, calls = interrupted._index_batch, [0]
+
+    def crash_midway(*args):
+        calls[0] += 1
+        if calls[0] == 25:
+            raise RuntimeError("simulated crash")
+        index_batch(*args)
+
+    interrupted._index_batch = crash_midway
+    try:
+        interrupted.run()
+    except RuntimeError:
+        pass
+    assert (tmp_path / "resumed" / "checkpoint").exists()
+
+    resumed = _dedup_pipeline(
+        tmp_path, vector_store_dir=tmp_path / "resumed", checkpoint_every_samples=10
+    )
+    resumed.run(resume=True)
+
+    assert list(resumed.store.metadata) == list(full.store.metadata)
+    assert resumed.dedup.stats["samples_dropped"] == full.dedup.stats["samples_dropped"]
+
+
+def test_dedup_finds_near_duplicate_behind_bucket_collision():
+    from Reasona.data.dedup import StreamDeduplicator
+
+    dedup = StreamDeduplicator(threshold=0.7, num_perm=64)
+    assert (dedup.bands, dedup.rows) == (8, 8)
+
+    a = np.arange(64, dtype=np.uint32)
+    # shares only band 0 with a, far below the threshold
+    b = a.copy()
+    b[8:] += 1000
+    # differs from a in one row of every band but band 0: similarity 57/64
+    c = a.copy()
+    c[8::8] += 2000
+
+    assert not dedup.seen((b"a" * 16, a))
+    assert not dedup.seen((b"b" * 16, b))
+    assert dedup.seen((b"c" * 16, c))
+    assert dedup.stats["near_duplicates"] == 1
+
+
+def test_worker_metrics_merge_into_parent_registry():
+    from Reasona.utils.metrics import MetricsRegistry
+
+    parent, worker = MetricsRegistry(), MetricsRegistry()
+    parent.counter("chunker.texts").inc(2)
+    for _ in range(2):
+        worker.counter("chunker.texts").inc(3)
+        worker.histogram("chunker.latency_ms").observe(4.0)
+        worker.gauge("chunker.workers").set(1)
+        # each call hands over only what was recorded since the last one
+        parent.merge(worker.drain())
+
+    snapshot = parent.snapshot()["chunker"]
+    assert snapshot["texts"]["total"] == 8
+    assert snapshot["latency_ms"]["count"] == 2
+    assert snapshot["latency_ms"]["mean"] == 4.0
+    assert snapshot["workers"] == 1
+    assert worker.snapshot() == {}
+
+
+def test_formatter_row_and_batch_paths_agree():
+    import pyarrow as pa
+
+    from Reasona.data.formatter import DataFormatter
+
+    rows = [
+        {"query": "what is 2+2", "synthetic_answer": "4", "language": ["en", "fr"], "extra": 1},
+        {"prompt": 42, "completion": "", "output": "x", "lang": "", "language": 7, "extra": "x"},
+        {"instruction": "", "query": "fallback", "input": None, "synthetic_reasoning": 1.5},
+        {"extra": {"nested": True}},
+        {"query": "t", "lang": True, "synthetic_answer": ["a", "b"]},
+    ]
+    formatter = DataFormatter(schema_path=None)
+
+    expected = [formatter.format_sample(row) for row in rows]
+    assert expected[0]["metadata"]["lang"] == "['en', 'fr']"
+    assert expected[1]["instruction"] == "42" and expected[1]["metadata"]["lang"] == "7"
+    assert expected[3]["text"] == ""
+
+    def as_rows(batch):
+        return [{key: batch[key][i] for key in batch} for i in range(len(rows))]
+
+    assert as_rows(formatter.format_batch(rows)) == expected
+
+    # real Arrow batches (consistently typed, but not all strings) agree too
+    typed = [
+        {"query": "q", "prompt": None, "language": ["en"], "synthetic_reasoning": 1.5},
+        {"query": None, "prompt": "p", "language": [], "synthetic_reasoning": None},
+    ]
+    batch = formatter.format_batch(pa.RecordBatch.from_pylist(typed))
+    assert [{key: batch[key][i] for key in batch} for i in range(2)] == [
+        formatter.format_sample(row) for row in typed
+    ]
+
+
+def test_sharded_cache_misses_reach_the_cache(tmp_path):
+    import json
+
+    from Reasona.data.embedding_cache import CachedEmbedder
+    from Reasona.entities.config_entity import IndexingConfig
+    from Reasona.pipeline.sharded_indexing import SHARD_FILE, fill_embedding_cache
+
+    cfg = IndexingConfig(embedding_model=MODEL, embedding_cache_dir=tmp_path / "cache")
+    texts = [f"text {i}" for i in range(6)]
+
+    # a worker: read-only cache, misses appended to its shard directory
+    shard_dirs = []
+    for worker, part in enumerate((texts[:4], texts[2:])):
+        shard_dir = tmp_path / f"shard_{worker}"
+        shard_dir.mkdir()
+        with open(shard_dir / "cache_keys.u8", "wb") as keys_f, open(
+            shard_dir / "cache_vectors.f32", "wb"
+        ) as vectors_f:
+            embedder = CachedEmbedder(
+                StubEmbedder(),
+                EmbeddingCache(tmp_path / "cache", MODEL, read_only=True),
+                on_miss=lambda keys, vectors: (
+                    keys_f.write(b"".join(keys)),
+                    vectors_f.write(vectors.astype(np.float32).tobytes()),
+                ),
+            )
+            embedder.embed(part)
+        with open(shard_dir / SHARD_FILE, "w") as f:
+            json.dump({"count": len(part), "dim": 8}, f)
+        shard_dirs.append(shard_dir)
+
+    assert fill_embedding_cache(shard_dirs, cfg) == 8
+    vectors, hit = EmbeddingCache(tmp_path / "cache", MODEL).get_many(_keys(texts))
+    assert hit.all()
+    np.testing.assert_array_equal(vectors, _vectors(texts))
@@ -0,0 +1,80 @@
+"""
+Import-time budget: importing the pipeline / config modules must stay
+cheap and must not pull in model or index libraries, start threads,
+create log files or install signal handlers. Heavy dependencies load
+on first real use.
+
+Each check runs in a fresh interpreter so earlier imports cannot hide
+a regression. REASONA_IMPORT_BUDGET_S overrides the time budget.
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+BUDGET_S = float(os.environ.get("REASONA_IMPORT_BUDGET_S", "1.0"))
+
+HEAVY_MODULES = (
+    "torch",
+    "transformers",
+    "sentence_transformers",
+    "datasets",
+    "faiss",
+    "pyarrow",
+    "pandas",
+    "joblib",
+)
+
+BASE_MODULES = (
+    "Reasona.config.config_manager",
+    "Reasona.pipeline.indexing_pipeline",
+    "Reasona.pipeline.training_pipeline",
+)
+
+PROBE = """
+import json, os, signal, sys, threading, time
+t0 = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t0
+print(json.dumps({{
+    "seconds": elapsed,
+    "heavy": [m for m in {heavy!r} if m in sys.modules],
+    "threads": threading.active_count(),
+    "logs_created": os.path.exists("logs"),
+    "sigterm_default": signal.getsignal(signal.SIGTERM) is signal.SIG_DFL,
+}}))
+"""
+
+
+def _probe(module: str, cwd: Path) -> dict:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(SRC), os.environ.get("PYTHONPATH", "")]))
+    # best of three: the first run also pays for writing .pyc files
+    runs = []
+    for _ in range(3):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=cwd,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return min(runs, key=lambda r: r["seconds"])
+
+
+@pytest.mark.parametrize("module", BASE_MODULES)
+def test_base_import_is_light(module, tmp_path):
+    result = _probe(module, tmp_path)
+
+    assert result["heavy"] == [], f"{module} imports {result['heavy']} eagerly"
+    assert result["threads"] == 1, f"{module} starts threads at import"
+    assert not result["logs_created"], f"{module} creates log files at import"
+    assert result["sigterm_default"], f"{module} installs a SIGTERM handler at import"
+    assert result["seconds"] < BUDGET_S, (
+        f"import {module} took {result['seconds']:.2f}s (budget {BUDGET_S:.2f}s)"
+    )
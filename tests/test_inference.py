@@ -0,0 +1,105 @@
+import threading
+
+import pytest
+
+from Reasona.entities.config_entity import ServerConfig
+from Reasona.inference.local_server import create_app
+from Reasona.utils.metrics import registry
+
+
+class _Store:
+    has_keywords = True
+    snapshot = None
+
+    def __len__(self):
+        return 3
+
+
+class _Retriever:
+    """
+    Answers every query with k fake hits and records each call.
+    """
+
+    def __init__(self):
+        self.store = _Store()
+        self.calls = []
+
+    def retrieve_many(self, queries, k, filters=None, mode=None):
+        self.calls.append({"queries": list(queries), "k": k, "filters": filters})
+        return [[{"id": i, "distance": float(i)} for i in range(k)] for _ in queries]
+
+
+@pytest.fixture
+def server():
+    retriever = _Retriever()
+    app = create_app(retriever, ServerConfig(max_k=20), default_k=5)
+    yield app.test_client(), retriever
+    app.config["BATCHER"].close()
+
+
+def test_retrieve_returns_k_hits(server):
+    client, retriever = server
+    response = client.post("/retrieve", json={"query": "q", "k": 3, "filters": {"lang": "en"}})
+    assert response.status_code == 200
+    assert [hit["id"] for hit in response.get_json()["results"]] == [0, 1, 2]
+    assert retriever.calls[0]["filters"] == {"lang": "en"}
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"query": "q", "k": "ten"},
+        {"query": "q", "k": 2.5},
+        {"query": "q", "k": True},
+        {"query": "q", "k": 0},
+        {"query": "q", "k": -1},
+        {"query": "q", "k": 21},
+        {"query": "q", "filters": ["lang", "en"]},
+        {"query": "q", "filters": "lang=en"},
+    ],
+)
+def test_retrieve_rejects_bad_k_and_filters(server, body):
+    client, retriever = server
+    response = client.post("/retrieve", json=body)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+    # rejected before reaching the batcher
+    assert retriever.calls == []
+
+
+class _BlockingRetriever(_Retriever):
+    """
+    Holds every call until `release` is set, so requests pile up in the queue.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def retrieve_many(self, queries, k, filters=None, mode=None):
+        self.entered.set()
+        self.release.wait(timeout=10)
+        return super().retrieve_many(queries, k, filters=filters, mode=mode)
+
+
+def test_overloaded_multi_query_request_is_dropped_whole():
+    retriever = _BlockingRetriever()
+    app = create_app(retriever, ServerConfig(max_batch_size=1, max_queue_size=2), default_k=2)
+    batcher = app.config["BATCHER"]
+    cancelled = registry.counter("server.cancelled").value
+
+    # the worker takes this one and blocks, leaving room for two more
+    first = batcher.submit("first", k=2)
+    assert retriever.entered.wait(timeout=10)
+
+    response = app.test_client().post("/retrieve", json={"queries": ["a", "b", "c"]})
+    assert response.status_code == 503
+
+    retriever.release.set()
+    assert len(first.result(timeout=10)) == 2
+    batcher.close()
+
+    # "a" and "b" fit in the queue but were cancelled, never searched
+    assert [call["queries"] for call in retriever.calls] == [["first"]]
+    assert registry.counter("server.cancelled").value == cancelled + 2
@@ -0,0 +1,241 @@
+import numpy as np
+
+from Reasona.training.collate import (
+    IGNORE_INDEX,
+    LengthBucketSampler,
+    PackedCollator,
+    block_causal_mask,
+    pack_examples,
+)
+
+PAD = 0
+
+
+def _examples(lengths, prompt_lengths):
+    # token IDs encode (example, position) so misplaced tokens show up
+    return [
+        {"input_ids": np.arange(1, n + 1) + 1000 * i, "prompt_length": p}
+        for i, (n, p) in enumerate(zip(lengths, prompt_lengths))
+    ]
+
+
+def test_pack_examples_places_every_index_once():
+    lengths = np.random.default_rng(0).integers(1, 300, size=500)
+    lengths[:5] = 900  # longer than a row: truncated, alone in its row
+    rows = pack_examples(lengths, seq_length=256, window=64)
+
+    placed = [i for row in rows for i in row]
+    assert sorted(placed) == list(range(len(lengths)))
+    assert all(sum(min(lengths[i], 256) for i in row) <= 256 for row in rows)
+    for i in range(5):
+        assert next(row for row in rows if i in row) == [i]
+
+
+def test_packed_collator_positions_and_labels():
+    examples = _examples([5, 3, 4], [2, 0, 4])
+    batch = PackedCollator(PAD, seq_length=16)([examples])
+    labels, positions = batch["labels"][0], batch["position_ids"][0]
+
+    assert positions[:12].tolist() == [0, 1, 2, 3, 4, 0, 1, 2, 0, 1, 2, 3]
+    assert batch["segment_ids"][0].tolist() == [0] * 5 + [1] * 3 + [2] * 4 + [-1] * 4
+    assert batch["attention_mask"][0].tolist() == [1] * 12 + [0] * 4
+    np.testing.assert_array_equal(
+        batch["input_ids"][0, :12], np.concatenate([e["input_ids"] for e in examples])
+    )
+
+    # example 0: prompt of 2 masked; example 1: no prompt, first token still
+    # masked; example 2: all prompt; padding masked
+    expected = [IGNORE_INDEX] * 16
+    expected[2:5] = [3, 4, 5]
+    expected[6:8] = [1002, 1003]
+    assert labels.tolist() == expected
+
+
+def test_packed_collator_truncates_the_last_example():
+    examples = _examples([6, 6], [1, 1])
+    batch = PackedCollator(PAD, seq_length=8)([examples])
+    assert batch["segment_ids"][0].tolist() == [0] * 6 + [1] * 2
+    assert batch["input_ids"][0, 6:].tolist() == [1001, 1002]
+
+
+def test_block_causal_mask_keeps_examples_apart():
+    segment_ids = np.array([[0, 0, 0, 1, 1, 2, -1, -1]])
+    mask = block_causal_mask(segment_ids)[0, 0]
+
+    for i, si in enumerate(segment_ids[0]):
+        for j, sj in enumerate(segment_ids[0]):
+            if si < 0:
+                # padding queries see only themselves
+                assert mask[i, j] == (i == j)
+            else:
+                assert mask[i, j] == (si == sj and j <= i), (i, j)
+
+
+def test_length_bucket_sampler_yields_every_index_once_per_epoch():
+    lengths = np.random.default_rng(1).integers(1, 500, size=203)
+    sampler = LengthBucketSampler(lengths, batch_size=8, bucket_multiplier=4)
+
+    epochs = []
+    for epoch in range(2):
+        sampler.set_epoch(epoch)
+        batches = list(sampler)
+        assert len(batches) == len(sampler)
+        assert all(len(b) <= 8 for b in batches)
+        assert sorted(i for b in batches for i in b) == list(range(len(lengths)))
+        epochs.append(batches)
+    assert epochs[0] != epochs[1]
+
+
+def _toy_attention(input_ids, position_ids, mask):
+    # one causal self-attention layer over token + position embeddings
+    rng = np.random.default_rng(0)
+    tokens, positions = rng.normal(size=(4000, 8)), rng.normal(size=(64, 8))
+    x = tokens[input_ids] + positions[position_ids]
+    scores = x @ x.T / np.sqrt(x.shape[1])
+    scores = np.where(mask, scores, -np.inf)
+    weights = np.exp(scores - scores.max(axis=1, keepdims=True))
+    return (weights / weights.sum(axis=1, keepdims=True)) @ x
+
+
+def test_packed_row_matches_separate_forward_passes():
+    examples = _examples([5, 3, 4], [2, 0, 1])
+    batch = PackedCollator(PAD, seq_length=16)([examples])
+    packed = _toy_attention(
+        batch["input_ids"][0], batch["position_ids"][0], block_causal_mask(batch["segment_ids"])[0, 0]
+    )
+
+    offset = 0
+    for example in examples:
+        n = len(example["input_ids"])
+        alone = _toy_attention(
+            example["input_ids"], np.arange(n), np.tril(np.ones((n, n), dtype=bool))
+        )
+        np.testing.assert_allclose(packed[offset:offset + n], alone, rtol=1e-6)
+        offset += n
+
+
+class StubTokenizer:
+    """
+    Whitespace tokenizer: BOS (1) when special tokens are added, then
+    one ID per word; EOS is 2.
+    """
+
+    eos_token_id = 2
+
+    def __init__(self, vocab_size):
+        self.vocab_size = vocab_size
+
+    def __len__(self):
+        return self.vocab_size
+
+    def encode(self, text, add_special_tokens):
+        ids = [3 + sum(w.encode()) * 7919 % (self.vocab_size - 3) for w in text.split()]
+        return ([1] if add_special_tokens else []) + ids
+
+    def __call__(self, texts, add_special_tokens=True, **kwargs):
+        return {"input_ids": [self.encode(t, add_special_tokens) for t in texts]}
+
+
+def _token_cache(tmp_path, vocab_size=1000, **kwargs):
+    from Reasona.model.registry import models
+    from Reasona.training.token_cache import TokenCache
+
+    name = f"stub-{vocab_size}"
+    stub = StubTokenizer(vocab_size)
+    models.get("tokenizer", name, lambda: stub)
+    return TokenCache(tmp_path / "cache", name, **kwargs), stub
+
+
+def _records(n):
+    return [
+        {
+            "instruction": f"question {i}",
+            "input": "context words" if i % 2 else None,
+            "reasoning": "think " * (i % 5),
+            "output": f"answer {i} done",
+        }
+        for i in range(n)
+    ]
+
+
+def _write_jsonl(path, records):
+    import json
+
+    with open(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def test_token_cache_examples_match_the_tokenizer(tmp_path):
+    from Reasona.training.token_cache import TokenizedDataset, split_example
+
+    cache, stub = _token_cache(tmp_path, max_seq_length=12, batch_size=3)
+    records = _records(10)
+    dataset = TokenizedDataset(cache.build(records, "src"))
+
+    assert len(dataset) == 10
+    for i, record in enumerate(records):
+        prompt, completion = split_example(record)
+        prompt_ids = stub.encode(prompt, True)
+        ids = (prompt_ids + stub.encode(completion, False) + [stub.eos_token_id])[:12]
+        assert dataset[i]["input_ids"].tolist() == ids
+        assert dataset[i]["prompt_length"] == min(len(prompt_ids), 12)
+    assert dataset.lengths.max() == 12
+    assert dataset.eos_token_id == 2
+
+
+def test_token_cache_reuses_only_matching_builds(tmp_path):
+    import os
+
+    from Reasona.utils.metrics import registry
+
+    source = tmp_path / "train.jsonl"
+    _write_jsonl(source, _records(6))
+    cache, _ = _token_cache(tmp_path, max_seq_length=32)
+
+    def build(c):
+        misses = registry.counter("token_cache.misses").value
+        path = c.build_from_jsonl(source)
+        return path, registry.counter("token_cache.misses").value > misses
+
+    first, missed = build(cache)
+    assert missed
+    assert build(cache) == (first, False)
+
+    # a different max_seq_length is a different cache
+    shorter, _ = _token_cache(tmp_path, max_seq_length=8)
+    path, missed = build(shorter)
+    assert missed and path != first
+
+    # so is an edited source (same size, new mtime)
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    path, missed = build(cache)
+    assert missed and path != first
+
+    _write_jsonl(source, _records(7))
+    path, missed = build(cache)
+    assert missed and path != first
+
+
+def test_token_cache_shards_and_dtype(tmp_path):
+    from Reasona.training.token_cache import SHARD, TokenizedDataset
+
+    small, _ = _token_cache(tmp_path, vocab_size=1000, shard_tokens=20)
+    dataset = TokenizedDataset(small.build(_records(10), "src"))
+    assert dataset.meta["dtype"] == "uint16"
+    assert len(dataset.meta["shards"]) > 1
+    # a shard is closed once it holds shard_tokens; examples never span shards
+    shard_sizes = [len(s) for s in dataset.shards]
+    assert all(size - 20 < dataset.lengths.max() for size in shard_sizes)
+    assert sum(shard_sizes) == dataset.lengths.sum()
+    assert np.all(np.diff(dataset.index[:, SHARD]) >= 0)
+
+    # IDs past the uint16 range survive in uint32 shards
+    large, stub = _token_cache(tmp_path, vocab_size=70_000)
+    records = _records(10)
+    dataset = TokenizedDataset(large.build(records, "src"))
+    assert dataset.meta["dtype"] == "uint32"
+    ids = [dataset[i]["input_ids"].tolist() for i in range(len(dataset))]
+    assert max(max(row) for row in ids) >= 1 << 16
+    assert ids[0][:3] == stub.encode("question 0", True)
@@ -0,0 +1,454 @@
+import threading
+
+import numpy as np
+import pytest
+
+from Reasona.vectorstore.segmented_store import SegmentedStore
+
+DIM = 8
+
+
+def _rows(n, start=0):
+    rng = np.random.default_rng(start)
+    vectors = rng.random((n, DIM), dtype=np.float32)
+    metadata = [{"text": f"doc {i}", "lang": ("en", "de")[i % 2]} for i in range(start, start + n)]
+    return vectors, metadata
+
+
+def test_flush_is_not_blocked_by_a_running_merge(tmp_path):
+    store = SegmentedStore(
+        DIM,
+        work_dir=tmp_path / "work",
+        memory_budget_mb=1,
+        compaction_min_segments=2,
+        background_compaction=False,
+    )
+    for start in (0, 10):
+        store.add(*_rows(10, start))
+        store.flush()
+
+    merge, started, release = store._merge, threading.Event(), threading.Event()
+
+    def slow_merge(run):
+        started.set()
+        release.wait(5)
+        return merge(run)
+
+    store._merge = slow_merge
+    compactor = threading.Thread(target=store.compact)
+    compactor.start()
+    assert started.wait(5)
+
+    flushed = threading.Thread(target=lambda: (store.add(*_rows(10, 20)), store.flush()))
+    flushed.start()
+    flushed.join(2)
+    assert not flushed.is_alive(), "flush waited for the merge"
+    assert len(store.segments) == 3
+
+    release.set()
+    compactor.join(5)
+    # the merged run is swapped in ahead of the segment flushed meanwhile
+    assert [m["text"] for m in store.metadata] == [f"doc {i}" for i in range(30)]
+    store.close()
+
+
+WORDS = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu".split()
+QUERIES = ["alpha beta", "kappa mu mu", "zeta", "nothing", "eta theta iota"]
+
+
+def _corpus(n=3000):
+    rng = np.random.default_rng(0)
+    vectors = rng.random((n, DIM), dtype=np.float32)
+    texts = [" ".join(rng.choice(WORDS, rng.integers(3, 20))) for _ in range(n)]
+    metadata = [{"text": t, "lang": ("en", "de")[i % 2]} for i, t in enumerate(texts)]
+    return vectors, metadata, texts
+
+
+def _assert_same_results(expected, actual):
+    queries = np.random.default_rng(1).random((10, DIM), dtype=np.float32)
+    for filters in (None, {"lang": "de"}):
+        d1, i1 = expected.search(queries, 10, filters=filters)
+        d2, i2 = actual.search(queries, 10, filters=filters)
+        np.testing.assert_array_equal(i1, i2)
+        np.testing.assert_allclose(d1, d2, rtol=1e-5)
+
+        s1, k1 = expected.search_keywords(QUERIES, 10, filters)
+        s2, k2 = actual.search_keywords(QUERIES, 10, filters)
+        np.testing.assert_array_equal(k1, k2)
+        np.testing.assert_allclose(s1, s2, rtol=1e-5)
+    assert len(actual) == len(expected)
+    assert list(actual.metadata) == list(expected.metadata)
+
+
+def test_segmented_store_matches_single_store(tmp_path):
+    from Reasona.vectorstore.faiss_store import FaissStore
+    from Reasona.vectorstore.segmented_store import load_store
+
+    vectors, metadata, texts = _corpus()
+    kwargs = {"filter_fields": ("lang",), "keyword_index": True}
+    single = FaissStore(DIM, **kwargs)
+    segmented = SegmentedStore(
+        DIM,
+        work_dir=tmp_path / "work",
+        memory_budget_mb=0.2,
+        max_segment_mb=2,
+        compaction_min_segments=2,
+        background_compaction=False,
+        **kwargs,
+    )
+    for lo in range(0, len(vectors), 100):
+        batch = slice(lo, lo + 100)
+        single.add(vectors[batch], metadata[batch], texts[batch])
+        segmented.add(vectors[batch], metadata[batch], texts[batch])
+
+    # several sealed segments plus a non-empty active one
+    assert len(segmented.segments) > 2 and len(segmented._active)
+    _assert_same_results(single, segmented)
+
+    before = len(segmented.segments)
+    assert segmented.compact() > 0
+    assert len(segmented.segments) < before
+    _assert_same_results(single, segmented)
+
+    segmented.save(tmp_path / "saved")
+    segmented.close()
+    reloaded = load_store(tmp_path / "saved")
+    assert isinstance(reloaded, SegmentedStore) and reloaded.read_only
+    _assert_same_results(single, reloaded)
+
+
+def _bm25_brute_force(texts, query, k1=1.2, b=0.75):
+    from collections import Counter
+
+    from Reasona.vectorstore.keyword_index import tokenize
+
+    docs = [Counter(tokenize(t)) for t in texts]
+    lengths = np.array([sum(d.values()) for d in docs], dtype=np.float64)
+    avgdl = lengths.mean()
+    scores = np.zeros(len(docs))
+    for term in set(tokenize(query)):
+        df = sum(term in d for d in docs)
+        idf = np.log(1.0 + (len(docs) - df + 0.5) / (df + 0.5))
+        for i, d in enumerate(docs):
+            tf = d.get(term, 0)
+            if tf:
+                scores[i] += idf * tf * (k1 + 1.0) / (tf + k1 * (1.0 - b + b * lengths[i] / avgdl))
+    return scores
+
+
+def test_bm25_matches_brute_force(tmp_path):
+    from Reasona.vectorstore.keyword_index import KeywordIndex
+
+    _, _, texts = _corpus(600)
+    built = KeywordIndex()
+    for lo in range(0, len(texts), 50):
+        built.add(texts[lo:lo + 50])
+        if lo % 200 == 0:
+            # exercise merging buffered postings into the CSR arrays
+            built.compact()
+    built.save(tmp_path / "bm25")
+    halves = [KeywordIndex(), KeywordIndex()]
+    halves[0].add(texts[:250])
+    halves[1].add(texts[250:])
+
+    indexes = {
+        "built": built,
+        "loaded": KeywordIndex.load(tmp_path / "bm25"),
+        "concat": KeywordIndex.concat(halves),
+    }
+    even = np.zeros(len(texts), dtype=bool)
+    even[::2] = True
+    allowed = np.packbits(even, bitorder="little")
+
+    for query in QUERIES + ["Alpha, ALPHA!"]:
+        expected = _bm25_brute_force(texts, query)
+        for name, index in indexes.items():
+            ids, scores = index.score(query)
+            dense = np.zeros(len(texts))
+            dense[ids] = scores
+            np.testing.assert_allclose(dense, expected, rtol=1e-5, err_msg=name)
+
+            top_scores, top_ids = index.search([query], 10, allowed)
+            candidates = np.flatnonzero(even & (expected > 0))
+            best = candidates[np.lexsort((candidates, -expected[candidates].astype(np.float32)))][:10]
+            assert top_ids[0, : len(best)].tolist() == best.tolist(), name
+            assert (top_ids[0, len(best):] == -1).all()
+
+
+def test_snapshot_publish_rollback_and_gc(tmp_path):
+    from Reasona.vectorstore.faiss_store import FaissStore
+    from Reasona.vectorstore.snapshots import SnapshotManager, SnapshotReloader
+
+    class Retriever:
+        def __init__(self, store):
+            self.store = store
+
+        def swap_store(self, store):
+            self.store = store
+
+    manager = SnapshotManager(tmp_path / "store")
+    assert manager.current() is None
+    for n in (10, 20, 30):
+        store = FaissStore(DIM)
+        store.add(*_rows(n))
+        manager.publish(store, embedding_model="model-a")
+
+    assert manager.versions() == [1, 2, 3]
+    assert manager.current() == 3
+    live = manager.load()
+    assert len(live) == 30 and live.snapshot["version"] == 3
+    assert manager.verify(3)["count"] == 30
+
+    retriever = Retriever(live)
+    reloader = SnapshotReloader(retriever, manager, expected_model="model-a")
+    manager.rollback(1)
+    assert reloader.check()
+    assert len(retriever.store) == 10 and retriever.store.snapshot["version"] == 1
+    assert not reloader.check()
+
+    # the current snapshot survives gc even when it is the oldest
+    assert manager.gc(keep=1) == [2]
+    assert manager.versions() == [1, 3]
+    assert len(manager.load(3)) == 30
+
+    damaged = next(p for p in manager.path(3).rglob("*") if p.is_file() and p.name != "manifest.json")
+    damaged.write_bytes(damaged.read_bytes()[:-1] + b"\0")
+    with pytest.raises(ValueError, match="damaged"):
+        manager.verify(3)
+
+    # a snapshot built with another model is never swapped in
+    store = FaissStore(DIM)
+    store.add(*_rows(5))
+    manager.publish(store, embedding_model="model-b")
+    assert not reloader.check()
+    assert len(retriever.store) == 10
+
+
+def _hits(n, tag=""):
+    return [{"id": i, "distance": float(i), "tag": tag} for i in range(n)]
+
+
+def _near(vector, cosine):
+    # a unit vector at exactly `cosine` from `vector`'s direction
+    unit = np.asarray(vector, dtype=np.float64) / np.linalg.norm(vector)
+    other = np.zeros_like(unit)
+    other[np.argmin(np.abs(unit))] = 1.0
+    other -= other @ unit * unit
+    other /= np.linalg.norm(other)
+    return (cosine * unit + np.sqrt(1 - cosine**2) * other).astype(np.float32)
+
+
+def test_result_cache_exact_hits_and_k():
+    from Reasona.vectorstore.result_cache import ResultCache
+
+    cache = ResultCache(max_entries=8)
+    group = ResultCache.group({"lang": "en"}, "dense")
+    cache.validate(1)
+    cache.put("What  is BM25?", 5, group, _hits(5), version=1)
+
+    assert cache.get("  what is\tbm25? ", 5, group) == _hits(5)
+    assert cache.get("what is bm25?", 3, group) == _hits(3)
+    # five hits for k=5 says nothing about a sixth
+    assert cache.get("what is bm25?", 6, group) is None
+    assert cache.get("what is bm25?", 5, ResultCache.group(None, "dense")) is None
+
+    # a short list means there were no more matches, so it serves any k
+    cache.put("rare", 10, group, _hits(2), version=1)
+    assert cache.get("rare", 50, group) == _hits(2)
+
+
+def test_result_cache_semantic_threshold_and_groups():
+    from Reasona.vectorstore.result_cache import ResultCache
+
+    cache = ResultCache(max_entries=8, semantic_threshold=0.9)
+    en, de = ResultCache.group({"lang": "en"}, "dense"), ResultCache.group({"lang": "de"}, "dense")
+    cache.validate(1)
+    vector = np.array([1.0, 2.0, 3.0, 4.0], dtype=np.float32)
+    cache.put("first", 5, en, _hits(5, "first"), version=1, vector=vector)
+
+    assert cache.get_similar(_near(vector, 0.9), 5, en) == _hits(5, "first")
+    assert cache.get_similar(_near(vector, 0.899), 5, en) is None
+    assert cache.get_similar(vector * 3, 5, de) is None
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_result_cache_lru_reuses_semantic_slots():
+    from Reasona.vectorstore.result_cache import ResultCache
+
+    cache = ResultCache(max_entries=100, semantic_threshold=0.99)
+    group = ResultCache.group(None, "dense")
+    cache.validate(1)
+    vectors = np.eye(128, dtype=np.float32)
+
+    # past the initial 64 rows the vector table grows
+    for i in range(100):
+        cache.put(f"q{i}", 5, group, _hits(5, str(i)), version=1, vector=vectors[i])
+    assert len(cache._vectors) > 64
+    assert cache.get("q0", 5, group) is not None  # q0 is now most recent
+
+    for i in range(100, 128):
+        cache.put(f"q{i}", 5, group, _hits(5, str(i)), version=1, vector=vectors[i])
+    assert len(cache) == 100
+    # evicted entries hand their slots on: the new vector is stored before
+    # the eviction, so the table never needs more than max_entries + 1 rows
+    assert len(cache._vectors) == len(cache._slot_keys) == 101
+    assert len(cache._free_slots) == 1
+
+    assert cache.get("q0", 5, group) is not None
+    for i in range(1, 29):
+        assert cache.get(f"q{i}", 5, group) is None
+        assert cache.get_similar(vectors[i], 5, group) is None
+    for i in (29, 100, 127):
+        assert cache.get_similar(vectors[i], 5, group) == _hits(5, str(i))
+
+
+def test_result_cache_ttl_and_versions(monkeypatch):
+    from types import SimpleNamespace
+
+    from Reasona.vectorstore import result_cache
+    from Reasona.vectorstore.result_cache import ResultCache
+
+    now = [100.0]
+    monkeypatch.setattr(result_cache, "time", SimpleNamespace(monotonic=lambda: now[0]))
+
+    cache = ResultCache(max_entries=8, ttl_s=10)
+    group = ResultCache.group(None, "dense")
+    cache.validate("v1")
+    cache.put("q", 5, group, _hits(5), version="v1")
+    now[0] += 10
+    assert cache.get("q", 5, group) is not None
+    now[0] += 0.1
+    assert cache.get("q", 5, group) is None
+    assert len(cache) == 0
+
+    cache.put("q", 5, group, _hits(5), version="v1")
+    cache.validate("v2")
+    assert cache.get("q", 5, group) is None
+    # computed against the old store: not cached
+    cache.put("q", 5, group, _hits(5), version="v1")
+    assert len(cache) == 0
+    cache.put("q", 5, group, _hits(5), version="v2")
+    assert cache.get("q", 5, group) is not None
+
+
+def test_retriever_result_cache_follows_the_store():
+    from Reasona.vectorstore.faiss_store import FaissStore
+    from Reasona.vectorstore.retriever import Retriever
+
+    class Embedder:
+        def __init__(self):
+            self.calls = 0
+
+        def embed(self, texts):
+            self.calls += 1
+            return np.stack([_rows(1, start=len(t))[0][0] for t in texts])
+
+    store = FaissStore(DIM)
+    store.add(*_rows(50))
+    embedder = Embedder()
+    retriever = Retriever(store, embedder, query_cache_size=0, result_cache_size=16)
+
+    first = retriever.retrieve_many(["hello world", "abc"], k=5)
+    assert embedder.calls == 1
+    again = retriever.retrieve_many(["Hello   World", "abc"], k=3)
+    assert embedder.calls == 1
+    assert again == [hits[:3] for hits in first]
+
+    # adding to the store bumps its version and empties the cache
+    store.add(*_rows(5, start=50))
+    retriever.retrieve_many(["hello world"], k=3)
+    assert embedder.calls == 2
+    assert retriever.result_cache.stats()["exact_hits"] == 2
+
+
+ANN_KWARGS = {"nlist": 8, "pq_m": 4, "pq_nbits": 4, "hnsw_m": 8, "train_size": 400}
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "ivf_pq", "hnsw"])
+def test_mmap_load_matches_regular_load(tmp_path, index_type):
+    from Reasona.vectorstore.faiss_store import FaissStore
+
+    vectors, metadata, texts = _corpus(1000)
+    store = FaissStore(
+        DIM, index_type=index_type, filter_fields=("lang",), keyword_index=True, **ANN_KWARGS
+    )
+    store.add(vectors, metadata, texts)
+    store.save(tmp_path)
+
+    regular, mapped = FaissStore(dim=1), FaissStore(dim=1)
+    regular.load(tmp_path)
+    mapped.load(tmp_path, mmap=True)
+    for loaded in (regular, mapped):
+        loaded.set_search_params(nprobe=4, ef_search=32)
+    _assert_same_results(regular, mapped)
+
+    assert mapped.read_only and not regular.read_only
+    with pytest.raises(ValueError, match="read-only"):
+        mapped.add(vectors[:1], metadata[:1], texts[:1])
+    regular.add(vectors[:1], metadata[:1], texts[:1])
+    assert len(regular) == 1001
+
+
+def test_mmap_load_refuses_untrained_vectors(tmp_path):
+    from Reasona.vectorstore.faiss_store import FaissStore
+
+    store = FaissStore(DIM, index_type="ivf_flat", **ANN_KWARGS)
+    store.add(*_rows(100))
+    # checkpoints keep vectors below train_size buffered in pending.npy
+    store.save(tmp_path, finalize=False)
+    assert (tmp_path / "pending.npy").exists()
+
+    with pytest.raises(ValueError, match="untrained"):
+        FaissStore(dim=1).load(tmp_path, mmap=True)
+    resumed = FaissStore(dim=1)
+    resumed.load(tmp_path)
+    assert len(resumed) == 100
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat"])
+def test_filtered_search_returns_only_matches_and_fills_k(tmp_path, index_type):
+    from Reasona.vectorstore.faiss_store import FaissStore
+
+    rng = np.random.default_rng(2)
+    vectors = rng.random((2000, DIM), dtype=np.float32)
+    metadata = [{"source": f"s{i % 100}", "lang": ("en", "de")[i % 3 == 0]} for i in range(2000)]
+    store = FaissStore(
+        DIM, index_type=index_type, nlist=32, train_size=2000, filter_fields=("source", "lang")
+    )
+    store.add(vectors, metadata)
+    store.save(tmp_path)
+    loaded = FaissStore(dim=1)
+    loaded.load(tmp_path)
+    queries = rng.random((5, DIM), dtype=np.float32)
+
+    def matching(filters):
+        return {
+            i for i, m in enumerate(metadata)
+            if all(m[f] in (v if isinstance(v, list) else [v]) for f, v in filters.items())
+        }
+
+    cases = [
+        ({"source": "s7"}, 10),                   # 20 matches out of 2000
+        ({"source": "s7"}, 50),                   # fewer matches than k
+        ({"source": ["s1", "s2"]}, 30),           # OR over values
+        ({"source": ["s1", "s2"], "lang": "de"}, 30),
+        ({"source": "missing"}, 5),
+    ]
+    for s in (store, loaded):
+        s.set_search_params(nprobe=1)
+        for filters, k in cases:
+            allowed = matching(filters)
+            distances, indices = s.search(queries, k, filters=filters)
+            want = min(k, len(allowed))
+            for row in indices:
+                assert set(row[:want].tolist()) <= allowed, filters
+                assert (row[want:] == -1).all(), filters
+            if index_type == "flat":
+                # exact: the nearest matching vectors
+                for q, row in zip(queries, indices):
+                    ids = np.array(sorted(allowed), dtype=np.int64)
+                    nearest = ids[np.argsort(((vectors[ids] - q) ** 2).sum(axis=1))[:want]]
+                    assert set(row[:want].tolist()) == set(nearest.tolist())
+
+    with pytest.raises(KeyError):
+        store.search(queries, 5, filters={"topic": "x"})